@@ -0,0 +1,217 @@
+"""
+
+Headless render benchmarks for the engine.
+
+Builds parameterised synthetic scenes, renders them along camera paths and records frames per second and the time
+spent in each stage of Scene.draw(). Results are written as JSON so runs of different versions can be compared:
+
+    python benchmark.py --output before.json
+    python benchmark.py --output after.json --compare before.json
+
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+from math import sin, cos, pi, sqrt
+from time import perf_counter
+
+import numpy as np
+import pygame
+
+from engine import *
+
+
+def gridScene(count):
+    """
+
+    A square grid of points above the camera, like the demo's.
+
+    """
+    side = max(round(sqrt(count)), 1)
+    return [Point(x, 2.5, z - side / 2) for x in range(side) for z in range(side)]
+
+
+def triangleScene(count):
+    objs = []
+    for _ in range(count):
+        centre = [random.uniform(0, 20), random.uniform(-5, 5), random.uniform(-10, 10)]
+        objs.append(Triangle(*[Point(*[centre[y] + random.uniform(-0.5, 0.5) for y in range(3)]) for _ in range(3)],
+                             col=(random.randrange(256), random.randrange(256), random.randrange(256)),
+                             lines=(False, None), corners=(False, None)))
+
+    return objs
+
+
+def cubeScene(count):
+    side = max(round(count ** (1 / 3)), 1)
+    return [Cube(Point(2 * x, 2 * y - side, 2 * z - side), Point(2 * x, 2 * y - side, 2 * z - side + 1),
+                 Point(2 * x, 2 * y - side - 1, 2 * z - side), col=(255, 0, 0))
+            for x in range(side) for y in range(side) for z in range(side)]
+
+
+def sphereScene(count):
+    return [Sphere(random.uniform(0, 20), random.uniform(-5, 5), random.uniform(-10, 10), random.uniform(0.1, 1),
+                   col=(random.randrange(256), 0, 155)) for _ in range(count)]
+
+
+def meshScene(count):
+    """
+
+    One rippled sheet of about count triangles in front of the camera, for large meshes.
+
+    """
+    side = max(round(sqrt(count / 2)), 1) + 1
+    y, z = np.meshgrid(np.linspace(-5, 5, side), np.linspace(-10, 10, side), indexing='ij')
+    vertices = np.stack([10 + 0.5 * np.sin(y * 2) * np.cos(z), y, z], axis=2).reshape(-1, 3)
+
+    corners = (np.arange(side - 1)[:, None] * side + np.arange(side - 1)).ravel()
+    faces = np.concatenate([np.stack([corners, corners + 1, corners + side], axis=1),
+                            np.stack([corners + 1, corners + side + 1, corners + side], axis=1)])
+
+    return [Mesh(vertices, faces, col=(0, 155, 255), lines=(False, None), corners=(False, None))]
+
+
+def roomScene(count):
+    """
+
+    About count cubes shut inside a box that hides them from the outside, for occlusion culling.
+
+    """
+    side = max(round(count ** (1 / 3)), 1)
+    xs, ys, zs = np.linspace(4, 16, side), np.linspace(-4, 4, side), np.linspace(-6, 6, side)
+    objs = [Cube(Point(x, y, z), Point(x, y, z + 0.5), Point(x, y - 0.5, z), col=(255, 0, 0))
+            for x in xs.tolist() for y in ys.tolist() for z in zs.tolist()]
+
+    vertices = np.array([(x, y, z) for x in (3, 17) for y in (-5, 5) for z in (-7, 7)], dtype=float)
+    faces = [(0, 3, 1), (0, 2, 3), (4, 7, 6), (4, 5, 7), (0, 5, 4), (0, 1, 5),
+             (2, 7, 3), (2, 6, 7), (0, 6, 2), (0, 4, 6), (1, 7, 5), (1, 3, 7)]
+
+    return objs + [Mesh(vertices, faces, col=(90, 90, 90), lines=(False, None), corners=(False, None))]
+
+
+SCENES = {'grid': gridScene, 'triangles': triangleScene, 'cubes': cubeScene, 'spheres': sphereScene,
+          'mesh': meshScene, 'room': roomScene}
+
+
+def orbitPath(frames):
+    """
+
+    Turntable around the middle of the synthetic scenes, always looking inwards.
+
+    """
+    poses = []
+    for i in range(frames):
+        angle = 2 * pi * i / frames
+        poses.append(([10 - 15 * cos(angle), 0.0, -15 * sin(angle)], [angle, 0.0]))
+
+    return poses
+
+
+def flyPath(frames):
+    """
+
+    Flying forwards through the scenes while turning slowly.
+
+    """
+    return [([-5 + 25 * i / frames, 0.0, 0.0], [0.5 * sin(2 * pi * i / frames), 0.2]) for i in range(frames)]
+
+
+PATHS = {'orbit': orbitPath, 'fly': flyPath}
+
+
+def runCase(scene, path, count, frames, dim, mode, occlusion=False):
+    random.seed(0)
+    s = Scene(*SCENES[scene](count), screenDim=dim, headless=True, depthBuffer=mode == 'depth', batch=mode == 'batch',
+              occlusion=occlusion)
+    s.stats = FrameStats()
+
+    start = perf_counter()
+    for _ in s.renderFrames(PATHS[path](frames)):
+        pass
+    seconds = perf_counter() - start
+
+    return {'scene': scene, 'path': path, 'count': count, 'objects': len(s.objs), 'frames': frames, 'dim': dim,
+            'depthBuffer': mode == 'depth', 'mode': mode, 'occlusion': occlusion, 'fps': frames / seconds,
+            'stages': s.stats.averages(), 'counts': s.stats.totalCounts}
+
+
+def caseMode(case):
+    return case.get('mode', 'depth' if case['depthBuffer'] else 'paint')  # Older results only record depthBuffer
+
+
+def caseKey(case):
+    return case['scene'], case['path'], case['count'], case['dim'], caseMode(case), case.get('occlusion', False)
+
+
+def compare(results, baseline, threshold):
+    """
+
+    Print the change in frames per second against a baseline run and return the number of regressions beyond
+    threshold, a fraction.
+
+    """
+    old = {caseKey(x): x for x in baseline['results']}
+    regressions = 0
+
+    for case in results:
+        if caseKey(case) not in old:
+            continue
+
+        ratio = case['fps'] / old[caseKey(case)]['fps']
+        flag = ''
+        if ratio < 1 - threshold:
+            flag = '  REGRESSION'
+            regressions += 1
+
+        print('{:>10} {:>6} {:>7} {:>5}  {:8.2f} -> {:8.2f} fps ({:+.1%}){}'.format(
+            case['scene'], case['path'], case['count'], caseMode(case),
+            old[caseKey(case)]['fps'], case['fps'], ratio - 1, flag))
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenes', nargs='+', default=list(SCENES), choices=list(SCENES))
+    parser.add_argument('--paths', nargs='+', default=list(PATHS), choices=list(PATHS))
+    parser.add_argument('--counts', nargs='+', type=int, default=[100, 1000])
+    parser.add_argument('--frames', type=int, default=30)
+    parser.add_argument('--dim', type=int, default=400)
+    parser.add_argument('--modes', nargs='+', default=['paint', 'depth', 'batch'], choices=['paint', 'depth', 'batch'])
+    parser.add_argument('--occlusion', action='store_true', help='cull objects hidden behind nearer ones')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.1, help='slowdown counted as a regression')
+    args = parser.parse_args(argv)
+
+    results = []
+    for scene in args.scenes:
+        for path in args.paths:
+            for count in args.counts:
+                for mode in args.modes:
+                    case = runCase(scene, path, count, args.frames, args.dim, mode, args.occlusion)
+                    results.append(case)
+
+                    print('{:>10} {:>6} {:>7} {:>5}  {:8.2f} fps  '.format(scene, path, count, mode, case['fps']) +
+                          '  '.join('{} {:.2f}ms'.format(x, t * 1000) for x, t in case['stages'].items()))
+
+    report = {'python': platform.python_version(), 'numpy': np.__version__, 'pygame': pygame.version.ver,
+              'machine': platform.machine(), 'results': results}
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            if compare(results, json.load(f), args.threshold):
+                return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
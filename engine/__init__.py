@@ -6,13 +6,29 @@ To get started, create a Scene object with some other objects in it, such as Poi
 Create a Camera object to create a screen.
 Instead of drawing each shape individually on the screen, call scene.draw().
 Adjust scene.offset and scene.rot to make the camera move and rotate respectively.
+Move objects without rebuilding them by giving them a 4x4 model matrix with setModel().
+Create the Scene with light=Light(direction) to shade the faces of Meshes, flat or with Gouraud shading.
+Create the Scene with headless=True to render without a display, and use scene.renderFrames() to render a list of
+camera poses.
 
-Does not work with overlapping objects.
+Does not work with overlapping objects, unless the Scene is created with depthBuffer=True.
 
 """
 
+from engine._drawlist import *
 from engine._obj import *
+from engine._camera import *
+from engine._light import *
+from engine._occlusion import *
 from engine._scene import *
+from engine._parallel import *
+from engine._stats import *
+from engine._lod import *
+from engine._loop import *
+from engine._instance import *
+from engine._timeline import *
+from engine._loader import *
+from engine._scenefile import *
 
 
 def __test():
@@ -26,8 +42,6 @@ def __test():
     pygame.init()
     i = pygame.display.Info()
 
-    grab = False
-
     pList = []
 
     for x in range(0, 10):
@@ -43,50 +57,22 @@ def __test():
                   Sphere(5, 2.5, 2, 2, col=(255, 0, 155)),
 
                   Cube(Point(5, 0, 0), Point(5, 0, 1), Point(5, -1, 0), col=(255, 0, 0)),
-                  screenDim=min(i.current_w, i.current_h) - 50)
-
-    clock = pygame.time.Clock()
 
-    lastMouseMotion = (0, 0)
+                  # Row of cubes sharing one set of faces and edges
+                  Instances(Cube(Point(0, 0, 0), Point(0, 0, 0.5), Point(0, -0.5, 0), col=(0, 155, 255)),
+                            [(8, -1.5, z) for z in range(-5, 5)]),
+                  screenDim=min(i.current_w, i.current_h) - 50, light=Light((1, -2, 0.5)))
 
     scene.screen.fill((255, 255, 255))
 
-    while True:
-
-        dt = clock.tick()
-
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                sys.exit()
-
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_ESCAPE:
-                    pygame.event.set_grab(False)
-                    pygame.mouse.set_visible(True)
-                    grab = False
-
-            elif event.type == pygame.MOUSEBUTTONDOWN:
-                pygame.event.set_grab(True)
-                pygame.mouse.set_visible(False)
-                grab = True
-
-            elif event.type == pygame.MOUSEMOTION:
-                if event.rel != (-1 * lastMouseMotion[0], -1 * lastMouseMotion[1]) and grab:
-                    scene.adjustRotation(event.rel)
-                    pygame.mouse.set_pos(scene.dim / 2, scene.dim / 2)
-                    lastMouseMotion = event.rel
-
-        keys = pygame.key.get_pressed()
-        scene.adjustOffset(keys, dt)
-
-        scene.draw()
-
-        pygame.display.flip()
+    # Input is handled at a fixed rate while frames are drawn on a worker thread
+    RunLoop(scene).run()
+    sys.exit()
 
 
 # Clearing up namespace
 
-del ArgumentError
+del ArgumentError, FileFormatError
 
 
 if __name__ == '__main__':
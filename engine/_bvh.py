@@ -0,0 +1,170 @@
+import numpy as np
+
+LEAF_SIZE = 16
+
+
+class BoundingVolumeHierarchy:
+    def __init__(self, lo, hi):
+        """
+
+        Bounding volume hierarchy over axis aligned boxes, given as (n, 3) arrays of minimum and maximum corners.
+
+        Nodes are stored in flat arrays. Every node covers a contiguous range of self.order, the box indexes sorted
+        so that each subtree is in one block, which lets whole subtrees be accepted without visiting them.
+        Boxes appended with extend() are kept in a loose list that is tested directly until the tree is rebuilt.
+
+        """
+        self.lo = np.array(lo, dtype=float).reshape(-1, 3)
+        self.hi = np.array(hi, dtype=float).reshape(-1, 3)
+        self.__build()
+
+    def __len__(self):
+        return len(self.lo)
+
+    def __build(self):
+        count = len(self.lo)
+        order = np.arange(count)
+        centres = (self.lo + self.hi) / 2
+
+        start, end, left, right, depth = [], [], [], [], []
+        stack = [(0, count, -1, False, 0)]  # Range, parent, whether it is the right child, depth
+
+        while stack:
+            s, e, parent, isRight, d = stack.pop()
+            node = len(start)
+            start.append(s)
+            end.append(e)
+            left.append(-1)
+            right.append(-1)
+            depth.append(d)
+
+            if parent >= 0:
+                (right if isRight else left)[parent] = node
+
+            if e - s > LEAF_SIZE:
+                block = order[s:e]
+                extent = centres[block].max(axis=0) - centres[block].min(axis=0)
+                axis = int(extent.argmax())
+
+                mid = (e - s) // 2
+                order[s:e] = block[np.argpartition(centres[block, axis], mid)]
+
+                stack.append((s + mid, e, node, True, d + 1))
+                stack.append((s, s + mid, node, False, d + 1))
+
+        self.order = order
+        self.start = np.array(start, dtype=np.intp)
+        self.end = np.array(end, dtype=np.intp)
+        self.left = np.array(left, dtype=np.intp)
+        self.right = np.array(right, dtype=np.intp)
+
+        depth = np.array(depth)
+        self.levels = [np.flatnonzero((depth == d) & (self.left >= 0)) for d in range(depth.max(initial=0) + 1)]
+        self.leaves = np.flatnonzero(self.left < 0)
+        self.loose = np.arange(count, count)
+
+        self.nodeLo = np.empty((len(start), 3))
+        self.nodeHi = np.empty((len(start), 3))
+        self.refit()
+
+    def refit(self):
+        """
+
+        Recompute every node's box from the current object boxes, bottom up, without changing the tree's shape.
+
+        """
+        if len(self.order) == 0:
+            self.nodeLo[:] = np.inf
+            self.nodeHi[:] = -np.inf
+            return
+
+        leafStarts = self.start[self.leaves]
+        sortedStarts = np.argsort(leafStarts)
+        leafLo = np.minimum.reduceat(self.lo[self.order], leafStarts[sortedStarts], axis=0)
+        leafHi = np.maximum.reduceat(self.hi[self.order], leafStarts[sortedStarts], axis=0)
+        self.nodeLo[self.leaves[sortedStarts]] = leafLo
+        self.nodeHi[self.leaves[sortedStarts]] = leafHi
+
+        for nodes in reversed(self.levels):
+            self.nodeLo[nodes] = np.minimum(self.nodeLo[self.left[nodes]], self.nodeLo[self.right[nodes]])
+            self.nodeHi[nodes] = np.maximum(self.nodeHi[self.left[nodes]], self.nodeHi[self.right[nodes]])
+
+    def update(self, indexes, lo, hi):
+        """
+
+        Move the boxes at the given indexes and refit the tree around them.
+
+        """
+        self.lo[indexes] = lo
+        self.hi[indexes] = hi
+        self.refit()
+
+    def extend(self, lo, hi):
+        """
+
+        Append boxes to the hierarchy. They are tested directly in queries, and the tree is rebuilt once the loose
+        boxes make up more than an eighth of the total.
+
+        """
+        count = len(self.lo)
+        self.lo = np.concatenate([self.lo, np.reshape(lo, (-1, 3))])
+        self.hi = np.concatenate([self.hi, np.reshape(hi, (-1, 3))])
+
+        if len(self.lo) - len(self.order) > max(LEAF_SIZE, len(self.lo) // 8):
+            self.__build()
+
+        else:
+            self.loose = np.concatenate([self.loose, np.arange(count, len(self.lo))])
+
+    @staticmethod
+    def __classify(lo, hi, normals, offsets):
+        """
+
+        Test (m, 3) boxes against the half spaces normals . p + offsets >= 0.
+        Returns masks of the boxes completely outside any plane, and of the boxes completely inside all of them.
+
+        """
+        positive = normals >= 0
+        far = np.where(positive, hi[:, None], lo[:, None])
+        near = np.where(positive, lo[:, None], hi[:, None])
+
+        outside = ((far * normals).sum(axis=2) + offsets < 0).any(axis=1)
+        inside = ((near * normals).sum(axis=2) + offsets >= 0).all(axis=1)
+
+        return outside, inside
+
+    def query(self, normals, offsets):
+        """
+
+        Return the sorted indexes of the boxes intersecting the convex volume normals . p + offsets >= 0.
+
+        Each level of the tree is tested in one vectorised pass. Subtrees completely outside are dropped, subtrees
+        completely inside are accepted whole, and only boxes in leaves crossing a plane are tested individually.
+
+        """
+        normals = np.asarray(normals, dtype=float)
+        offsets = np.asarray(offsets, dtype=float)
+
+        partial = []
+        frontier = np.zeros(1 if len(self.order) else 0, dtype=np.intp)
+        marks = np.zeros(len(self.order) + 1, dtype=np.intp)
+
+        while frontier.size:
+            outside, inside = self.__classify(self.nodeLo[frontier], self.nodeHi[frontier], normals, offsets)
+
+            whole = frontier[inside & ~outside]
+            np.add.at(marks, self.start[whole], 1)
+            np.add.at(marks, self.end[whole], -1)
+
+            crossing = frontier[~inside & ~outside]
+            isLeaf = self.left[crossing] < 0
+
+            for leaf in crossing[isLeaf].tolist():
+                partial.append(self.order[self.start[leaf]:self.end[leaf]])
+
+            frontier = np.concatenate([self.left[crossing[~isLeaf]], self.right[crossing[~isLeaf]]])
+
+        candidates = np.concatenate(partial + [self.loose])
+        outside = self.__classify(self.lo[candidates], self.hi[candidates], normals, offsets)[0]
+
+        return np.sort(np.concatenate([self.order[np.cumsum(marks[:-1]) > 0], candidates[~outside]]))
@@ -0,0 +1,179 @@
+from math import sin, cos, pi
+
+import numpy as np
+
+from engine._clip import NEAR_PLANE
+from engine._error import *
+from engine._lazy import pygame
+from engine._transform import Frame, rotationMatrix, projectVertices, frustumPlanes
+
+
+class Camera:
+    def __init__(self, offset=(0.0, 0.0, 0.0), rot=(0.0, 0.0), dim=0, near=NEAR_PLANE, far=None):
+        """
+
+        The viewpoint a scene is drawn from. offset is the camera's position in world coordinates and rot its yaw and
+        pitch in radians, and both may be changed in place between frames. dim is the width of the square screen in
+        pixels, and near and far are the depths of the clipping planes, with far None for no far plane.
+
+        The view, projection and combined view-projection matrices are built once per pose and cached until offset,
+        rot or dim change, so each frame's vertices are transformed with one matrix product.
+
+        """
+        if near <= 0 or far is not None and far <= near:
+            raise ArgumentError('Clipping planes must satisfy 0 < near < far')
+
+        self.offset = list(offset)
+        self.rot = list(rot)
+        self.dim = dim
+        self.near = near
+        self.far = far
+
+        self.__key = None
+        self.__rotation = self.__view = self.__projection = self.__viewProjection = None
+
+    def __update(self):
+        """
+
+        Build the matrices again if the pose or the screen has changed since they were last built.
+
+        """
+        key = (tuple(self.offset), tuple(self.rot), self.dim)
+
+        if key == self.__key:
+            return
+
+        rotation = rotationMatrix(self.rot)
+        view = np.identity(4)
+        view[:3, :3] = rotation
+        view[:3, 3] = -rotation @ np.asarray(self.offset, dtype=float)
+
+        # Homogeneous camera space (depth, vertical, horizontal, 1) to (x * w, y * w, depth, w) in pixels, with w the
+        # depth, matching projectVertices()
+        half = self.dim / 2
+        projection = np.array([[half, 0.0, half, 0.0],
+                               [half, -half, 0.0, 0.0],
+                               [1.0, 0.0, 0.0, 0.0],
+                               [1.0, 0.0, 0.0, 0.0]])
+
+        self.__rotation, self.__view, self.__projection = rotation, view, projection
+        self.__viewProjection = projection @ view
+        self.__key = key
+
+    @property
+    def rotation(self):
+        self.__update()
+        return self.__rotation
+
+    @property
+    def view(self):
+        """
+
+        4x4 matrix taking homogeneous world coordinates into camera space.
+
+        """
+        self.__update()
+        return self.__view
+
+    @property
+    def projection(self):
+        """
+
+        4x4 matrix taking homogeneous camera space coordinates to homogeneous pixel coordinates.
+
+        """
+        self.__update()
+        return self.__projection
+
+    @property
+    def viewProjection(self):
+        self.__update()
+        return self.__viewProjection
+
+    def transform(self, vertices):
+        """
+
+        Move an (n, 3) array of world coordinates into camera space, where index 0 is the depth along the view
+        direction, index 1 is vertical and index 2 is horizontal.
+
+        """
+        return (vertices - np.asarray(self.offset, dtype=float)) @ self.rotation.T
+
+    def frame(self, vertices):
+        """
+
+        Transform and project an (n, 3) array of world coordinates into a Frame.
+
+        """
+        camera = self.transform(vertices)
+        screen, valid = projectVertices(camera, self.dim, self.near)
+
+        return Frame(camera, screen, valid, self.dim, self.near, self.far, eye=np.array(self.offset, dtype=float))
+
+    def project(self, points):
+        """
+
+        Return the pixel coordinates and depths of an (n, 3) array of world coordinates, with the combined matrix.
+        Coordinates of points behind the camera are meaningless.
+
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 3)
+        clip = points @ self.viewProjection[:, :3].T + self.viewProjection[:, 3]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return clip[:, :2] / clip[:, 3:], clip[:, 3]
+
+    def frustum(self, margin=0.0):
+        """
+
+        Planes bounding the camera's view, as returned by frustumPlanes().
+
+        """
+        return frustumPlanes(self.offset, self.rot, margin, self.near, self.far)
+
+    def adjustOffset(self, keys, dt):
+        """
+
+        Allows the camera to free fly around - q is vertically up, e is vertically down.
+        Arrow keys move relative to the camera's rotation.
+
+        """
+        t = dt / 100
+        if keys[pygame.K_UP]:
+            self.offset[0] += t * cos(self.rot[0]) * cos(self.rot[1])
+            self.offset[1] -= t * sin(self.rot[1])
+            self.offset[2] += t * sin(self.rot[0]) * cos(self.rot[1])
+
+        if keys[pygame.K_DOWN]:
+            self.offset[0] -= t * cos(self.rot[0]) * cos(self.rot[1])
+            self.offset[1] += t * sin(self.rot[1])
+            self.offset[2] -= t * sin(self.rot[0]) * cos(self.rot[1])
+
+        if keys[pygame.K_RIGHT]:
+            self.offset[0] += t * cos(self.rot[0] + pi / 2)
+            self.offset[2] += t * sin(self.rot[0] + pi / 2)
+            
+        if keys[pygame.K_LEFT]:
+            self.offset[0] -= t * cos(self.rot[0] + pi / 2)
+            self.offset[2] -= t * sin(self.rot[0] + pi / 2)
+
+        if keys[pygame.K_q]:
+            self.offset[1] += t
+
+        if keys[pygame.K_e]:
+            self.offset[1] -= t
+
+    def adjustRotation(self, motion):
+        """
+
+        Given a list motion = [a, b], adjust the camera's rotation.
+
+        """
+        self.rot[0] += motion[0] / 100
+        self.rot[1] += motion[1] / 100
+
+        if self.rot[1] < - pi / 2:  # Fixing vertical rotation to stop camera flipping around
+            self.rot[1] = - pi / 2
+
+        if self.rot[1] > pi / 2:
+            self.rot[1] = pi / 2
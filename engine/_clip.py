@@ -0,0 +1,79 @@
+import numpy as np
+
+NEAR_PLANE = 0.01  # Default depth of the near clipping plane in front of the camera
+GUARD_BAND = 1.0  # Screen widths primitives may reach past each edge of the screen before they are clipped in 2D
+
+
+def clipPolygons(points, counts, axis, bound, below=False):
+    """
+
+    Clip a batch of convex polygons against the plane where channel axis of their points equals bound, keeping the
+    side above it, or below it if below is True, with the Sutherland-Hodgman method. Every channel of the points is
+    interpolated linearly where an edge crosses the plane.
+
+    points is an (m, n, d) array holding counts[k] points for polygon k, padded to n. Returns an (m, n + 1, d) array
+    and the new counts, which fall below 3 for polygons clipped away.
+
+    """
+    m, n, d = points.shape
+    distance = points[:, :, axis] - bound
+    if below:
+        distance = -distance
+
+    index = np.arange(n)
+    present = index < counts[:, None]
+    following = np.where(index + 1 < counts[:, None], index + 1, 0)
+    nextPoints = np.take_along_axis(points, following[:, :, None], axis=1)
+    nextDistance = np.take_along_axis(distance, following, axis=1)
+
+    # Points on the plane count as outside, so an edge ending on it adds that point once rather than twice
+    inside = distance > 0
+    crossing = present & (inside != (nextDistance > 0))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = np.where(crossing, distance / (distance - nextDistance), 0)
+
+    crossings = points + t[:, :, None] * (nextPoints - points)
+
+    # Each edge emits its first point if inside and then its crossing, if any; the survivors are packed to the front
+    candidates = np.stack([points, crossings], axis=2).reshape(m, 2 * n, d)
+    keep = np.stack([present & inside, crossing], axis=2).reshape(m, 2 * n)
+    order = np.argsort(~keep, axis=1, kind='stable')[:, :n + 1]
+
+    return np.take_along_axis(candidates, order[:, :, None], axis=1), keep.sum(axis=1)
+
+
+def clipSegments(points, axis, bound, below=False):
+    """
+
+    Clip an (m, 2, d) array of line segments against a plane in the same way as clipPolygons(), returning the clipped
+    segments and a mask of those with anything left.
+
+    """
+    distance = points[:, :, axis] - bound
+    if below:
+        distance = -distance
+
+    inside = distance >= 0
+
+    # Segments wholly outside get meaningless crossings, which the mask discards
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = distance[:, 0] / (distance[:, 0] - distance[:, 1])
+        crossing = points[:, 0] + t[:, None] * (points[:, 1] - points[:, 0])
+    clipped = np.where(inside[:, :, None], points, crossing[:, None])
+
+    return clipped, inside.any(axis=1)
+
+
+def fanTriangles(polygons, counts):
+    """
+
+    Split convex polygons, as returned by clipPolygons(), into triangles sharing each polygon's first point.
+    Returns the (k, 3, d) triangles and the index of the polygon each came from.
+
+    """
+    steps = np.arange(1, polygons.shape[1] - 1)
+    owners, step = np.nonzero(steps < counts[:, None] - 1)
+    step += 1
+
+    return np.stack([polygons[owners, 0], polygons[owners, step], polygons[owners, step + 1]], axis=1), owners
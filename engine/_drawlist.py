@@ -0,0 +1,493 @@
+import numpy as np
+
+from engine._lazy import pygame
+
+FRAGMENT_BUDGET = 1 << 20  # Pixels written per vectorised pass of render(), bounding the memory it uses
+
+TRIANGLES, LINES, CIRCLES, PIXELS, CALLS = range(5)
+
+
+def _colours(col, count):
+    """
+
+    Broadcast one colour, or a sequence of count colours, to a (count, 3) uint8 array. An empty sequence is read as no
+    colours rather than as one.
+
+    """
+    col = np.asarray(col, dtype=np.uint8)
+
+    return np.broadcast_to(col if col.size else col.reshape(0, 3), (count, 3))
+
+
+def _average(corners):
+    """
+
+    Average an (m, 3, 3) array of triangles' corner colours into an (m, 3) array.
+
+    """
+    return np.rint(corners.mean(axis=1)).astype(np.uint8)
+
+
+def _rows(minY, heights):
+    """
+
+    Enumerate the rows of a batch of bounding boxes, returning the index of the box each row belongs to and the row's
+    y coordinate, box by box in order.
+
+    """
+    entry = np.repeat(np.arange(len(heights)), heights)
+    local = np.arange(len(entry)) - np.repeat(np.cumsum(heights) - heights, heights)
+
+    return entry, minY[entry] + local
+
+
+def _spans(entry, ys, starts, stops):
+    """
+
+    Enumerate the pixels of horizontal spans from starts to stops inclusive, returning the index of the primitive
+    each pixel belongs to and the pixel's coordinates. Empty spans, where stops < starts, produce nothing.
+
+    """
+    lengths = np.maximum(stops - starts + 1, 0)
+    offsets = np.repeat(np.cumsum(lengths) - lengths - starts, lengths)
+
+    return np.repeat(entry, lengths), np.arange(len(offsets)) - offsets, np.repeat(ys, lengths)
+
+
+def _clipLines(points, left, right, top, bottom):
+    """
+
+    Clip an (m, 2, 2) array of line ends to a rectangle with the Liang-Barsky method, returning the clipped ends and a
+    mask of the lines that reach into the rectangle at all.
+
+    """
+    p0, d = points[:, 0], points[:, 1] - points[:, 0]
+    tMin, tMax = np.zeros(len(points)), np.ones(len(points))
+    keep = np.ones(len(points), dtype=bool)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for axis, lo, hi in ((0, left, right), (1, top, bottom)):
+            flat = d[:, axis] == 0
+            keep &= ~flat | ((p0[:, axis] >= lo) & (p0[:, axis] <= hi))
+
+            t0 = (lo - p0[:, axis]) / d[:, axis]
+            t1 = (hi - p0[:, axis]) / d[:, axis]
+            tMin = np.where(flat, tMin, np.maximum(tMin, np.minimum(t0, t1)))
+            tMax = np.where(flat, tMax, np.minimum(tMax, np.maximum(t0, t1)))
+
+    keep &= tMin <= tMax
+    clipped = np.stack([p0 + tMin[:, None] * d, p0 + tMax[:, None] * d], axis=1)
+
+    return np.where(keep[:, None, None], clipped, 0), keep
+
+
+class DrawList:
+    def __init__(self):
+        """
+
+        Draw list stage for painter's algorithm drawing. Primitives are gathered into typed buffers, each with a key,
+        and drawn in order of increasing key, in the order they were added where keys are equal.
+
+        render() rasterizes everything into the surface's pixels with NumPy in a few vectorised passes, so the cost per
+        primitive stays out of Python. replay() submits the primitives one at a time through pygame.draw instead,
+        with antialiased lines, exactly as the objects' own draw() methods do. Functions added with call() are run in
+        their place in the order by either.
+
+        """
+        self.clear()
+
+    def clear(self):
+        self.__kinds = []  # Kind of each block of primitives, in the order added
+        self.__keys = []  # Array of keys for each block
+        self.__blocks = {kind: [] for kind in (TRIANGLES, LINES, CIRCLES, PIXELS, CALLS)}
+
+    def __len__(self):
+        return sum(len(x) for x in self.__keys)
+
+    def __add(self, kind, key, count, block):
+        if count:
+            self.__kinds.append(kind)
+            self.__keys.append(np.broadcast_to(np.asarray(key, dtype=float), (count,)))
+            self.__blocks[kind].append(block)
+
+    def triangles(self, points, col, key=0.0):
+        """
+
+        Add filled triangles given an (m, 3, 2) array of pixel coordinates. col is one colour, an (m, 3) array, or an
+        (m, 3, 3) array of the colours at each corner, which render() blends across the triangle and replay() averages.
+        key is one key or an (m,) array.
+
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 3, 2)
+        col = np.asarray(col, dtype=np.uint8)
+        corners = col if col.ndim == 3 else np.broadcast_to(_colours(col, len(points))[:, None], (len(points), 3, 3))
+        self.__add(TRIANGLES, key, len(points), (points, corners))
+
+    def lines(self, points, col, key=0.0):
+        """
+
+        Add one pixel wide lines given an (m, 2, 2) array of pixel coordinates.
+
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2, 2)
+        self.__add(LINES, key, len(points), (points, _colours(col, len(points))))
+
+    def circles(self, centres, radii, col, key=0.0, width=0):
+        """
+
+        Add discs of the given pixel radii, or rings if width is non-zero, like pygame.draw.circle.
+
+        """
+        centres = np.asarray(centres, dtype=float).reshape(-1, 2)
+        count = len(centres)
+        self.__add(CIRCLES, key, count, (centres, np.broadcast_to(np.asarray(radii, dtype=float), (count,)),
+                                         np.broadcast_to(np.asarray(width, dtype=float), (count,)),
+                                         _colours(col, count)))
+
+    def pixels(self, xs, ys, col, key=0.0):
+        """
+
+        Add a block of single pixels at integer coordinates, written in the order given, with one key for the block.
+
+        """
+        xs, ys = np.asarray(xs, dtype=np.intp), np.asarray(ys, dtype=np.intp)
+        self.__add(PIXELS, key, 1 if len(xs) else 0, (xs, ys, _colours(col, len(xs))))
+
+    def call(self, function, *args, key=0.0):
+        """
+
+        Add a call to function(screen, *args), for anything drawn without a draw list.
+
+        """
+        self.__add(CALLS, key, 1, (function, args))
+
+    def extend(self, other, key=None):
+        """
+
+        Add every primitive of another DrawList. If key is given, they are all added with that key, in the order the
+        other list would draw them.
+
+        """
+        if key is None:
+            for kind, keys, block in other.__chunks():
+                self.__add(kind, keys, len(keys), block)
+
+            return
+
+        kinds, local, merged = other.__compile()
+
+        # Runs of primitives of one kind are added as blocks, so their order survives the equal keys
+        for run in np.split(np.arange(len(kinds)), np.flatnonzero(np.diff(kinds)) + 1):
+            if not len(run):
+                continue
+
+            kind, index = int(kinds[run[0]]), local[run]
+
+            if kind in (TRIANGLES, LINES, CIRCLES):
+                self.__add(kind, key, len(index), tuple(x[index] for x in merged[kind]))
+
+            else:
+                for x in index.tolist():
+                    self.__add(kind, key, 1, merged[kind][x])
+
+    def __chunks(self):
+        counters = {kind: 0 for kind in self.__blocks}
+
+        for kind, keys in zip(self.__kinds, self.__keys):
+            yield kind, keys, self.__blocks[kind][counters[kind]]
+            counters[kind] += 1
+
+    def __compile(self):
+        """
+
+        Join the blocks of each kind and return the kind of every primitive and its index among primitives of that
+        kind, in drawing order, and the joined data for each kind.
+
+        """
+        counts = [len(x) for x in self.__keys]
+        kinds = np.repeat(np.array(self.__kinds, dtype=np.intp), counts)
+        keys = np.concatenate(self.__keys) if self.__keys else np.empty(0)
+
+        local = np.empty(len(kinds), dtype=np.intp)
+        for kind in self.__blocks:
+            chosen = kinds == kind
+            local[chosen] = np.arange(np.count_nonzero(chosen))
+
+        merged = {CALLS: self.__blocks[CALLS], PIXELS: self.__blocks[PIXELS]}
+        for kind in (TRIANGLES, LINES, CIRCLES):
+            blocks = self.__blocks[kind]
+            merged[kind] = tuple(np.concatenate(x) for x in zip(*blocks)) if blocks else None
+
+        order = np.argsort(keys, kind='stable')
+
+        return kinds[order], local[order], merged
+
+    def replay(self, screen):
+        """
+
+        Draw every primitive in order with individual pygame.draw calls, returning the results of any calls.
+
+        """
+        kinds, local, merged = self.__compile()
+        results = []
+
+        lists = {}
+        for kind in (TRIANGLES, LINES, CIRCLES):
+            if merged[kind] is not None:
+                lists[kind] = [x.tolist() for x in merged[kind]]
+
+        if TRIANGLES in lists:  # pygame fills polygons in one colour
+            lists[TRIANGLES][1] = _average(merged[TRIANGLES][1]).tolist()
+
+        for kind, x in zip(kinds.tolist(), local.tolist()):
+            if kind == TRIANGLES:
+                points, col = lists[kind][0][x], lists[kind][1][x]
+                try:
+                    pygame.draw.polygon(screen, col, [(round(a), round(b)) for a, b in points])
+
+                except (ValueError, TypeError):
+                    pass
+
+            elif kind == LINES:
+                ((a, b), (c, d)), col = lists[kind][0][x], lists[kind][1][x]
+                pygame.draw.aaline(screen, col, (round(a), round(b)), (round(c), round(d)))
+
+            elif kind == CIRCLES:
+                (a, b), radius, width, col = (y[x] for y in lists[kind])
+                pygame.draw.circle(screen, col, (round(a), round(b)), round(radius), round(width))
+
+            elif kind == PIXELS:
+                self.__writePixels(screen, *merged[kind][x])
+
+            else:
+                function, args = merged[kind][x]
+                results.append(function(screen, *args))
+
+        return results
+
+    @staticmethod
+    def __writePixels(screen, xs, ys, col):
+        left, top, width, height = screen.get_clip()
+        inside = (xs >= left) & (xs < left + width) & (ys >= top) & (ys < top + height)
+
+        pixels = pygame.surfarray.pixels3d(screen)
+        pixels[xs[inside], ys[inside]] = col[inside]
+        del pixels  # Unlocks the surface
+
+    def render(self, screen):
+        """
+
+        Rasterize every primitive into the screen with NumPy, respecting its clip rectangle, and return the results of
+        any calls. Primitives between calls are drawn in vectorised passes of about FRAGMENT_BUDGET pixels each.
+
+        Coordinates are rounded to whole pixels as pygame.draw does, but lines are not antialiased.
+
+        """
+        kinds, local, merged = self.__compile()
+        results = []
+
+        calls = np.flatnonzero(kinds == CALLS).tolist()
+        start = 0
+
+        for stop in calls + [len(kinds)]:
+            if stop > start:
+                self.__rasterize(screen, kinds[start:stop], local[start:stop], merged)
+
+            if stop < len(kinds):
+                function, args = merged[CALLS][local[stop]]
+                results.append(function(screen, *args))
+
+            start = stop + 1
+
+        return results
+
+    def __rasterize(self, screen, kinds, local, merged):
+        left, top, width, height = screen.get_clip()
+        right, bottom = left + width - 1, top + height - 1
+
+        if width <= 0 or height <= 0:
+            return
+
+        shapes = {}  # For each kind, the ranks of its primitives and what is needed to produce their fragments
+        costs = np.zeros(len(kinds), dtype=np.intp)
+
+        flat = (np.empty(0, dtype=np.intp), np.empty((0, 2, 2)), np.empty((0, 3), dtype=np.uint8))
+
+        for kind in (TRIANGLES, LINES, CIRCLES, PIXELS):
+            ranks = np.flatnonzero(kinds == kind)
+            if not len(ranks) and not (kind == LINES and len(flat[0])):
+                continue
+
+            index = local[ranks]
+
+            if kind == TRIANGLES:
+                points = np.rint(merged[kind][0][index])
+                lo, hi = points.min(axis=1), points.max(axis=1)
+                area = (points[:, 1, 0] - points[:, 0, 0]) * (points[:, 2, 1] - points[:, 0, 1]) - \
+                    (points[:, 2, 0] - points[:, 0, 0]) * (points[:, 1, 1] - points[:, 0, 1])
+                box = self.__box(lo, hi, left, right, top, bottom, area != 0)
+                corners = merged[kind][1][index]
+                shapes[kind] = (ranks, points, area, corners, (corners != corners[:, :1]).any(axis=(1, 2)), box)
+                costs[ranks] = box[2] * box[3]
+
+                # Like pygame.draw.polygon, triangles seen edge on are drawn as a line between their furthest corners
+                degenerate = np.flatnonzero(area == 0)
+                pairs = np.array([[0, 1], [1, 2], [2, 0]])[:, :, None]
+                ends = points[degenerate][:, pairs[:, :, 0]]
+                longest = np.abs(ends[:, :, 1] - ends[:, :, 0]).max(axis=2).argmax(axis=1)
+                flat = (ranks[degenerate], ends[np.arange(len(degenerate)), longest], _average(corners[degenerate]))
+
+            elif kind == LINES:
+                ranks = np.concatenate([ranks, flat[0]])
+                points = np.concatenate([np.rint(merged[kind][0][index]) if len(index) else flat[1][:0], flat[1]])
+                col = np.concatenate([merged[kind][1][index] if len(index) else flat[2][:0], flat[2]])
+
+                points, keep = _clipLines(points, left, right, top, bottom)
+                samples = np.where(keep, np.abs(points[:, 1] - points[:, 0]).max(axis=1).astype(np.intp) + 1, 0)
+                shapes[kind] = (ranks, points, samples, col)
+                costs[ranks] += samples
+
+            elif kind == CIRCLES:
+                centres, radii, widths, col = (x[index] for x in merged[kind])
+                centres, radii = np.rint(centres), np.rint(radii)
+                box = self.__box(centres - radii[:, None], centres + radii[:, None], left, right, top, bottom,
+                                 radii > 0)
+                shapes[kind] = (ranks, centres, radii, np.rint(widths), col, box)
+                costs[ranks] = box[2] * box[3]
+
+            else:
+                shapes[kind] = (ranks, [merged[kind][x] for x in index.tolist()])
+                costs[ranks] = [len(merged[kind][x][0]) for x in index.tolist()]
+
+        # Split the primitives into runs of consecutive ranks, each producing about FRAGMENT_BUDGET fragments
+        total = np.cumsum(costs)
+        edges = np.searchsorted(total, np.arange(FRAGMENT_BUDGET, total[-1] if len(total) else 0, FRAGMENT_BUDGET))
+        edges = np.unique(np.concatenate([[0], edges + 1, [len(kinds)]]).clip(0, len(kinds)))
+
+        for begin, end in zip(edges[:-1].tolist(), edges[1:].tolist()):
+            fragments = [self.__fragments(kind, shape, begin, end, left, right, top, bottom)
+                         for kind, shape in shapes.items()]
+            fragments = [x for x in fragments if x is not None and len(x[0])]
+
+            if not fragments:
+                continue
+
+            ranks, xs, ys, col = (np.concatenate(x) for x in zip(*fragments))
+            order = np.argsort(ranks, kind='stable')
+
+            pixels = pygame.surfarray.pixels3d(screen)
+            pixels[xs[order], ys[order]] = col[order]  # Later primitives are written last, so they win
+            del pixels  # Unlocks the surface
+
+    @staticmethod
+    def __box(lo, hi, left, right, top, bottom, keep):
+        """
+
+        Clip float bounding boxes to the clip rectangle, returning the corners, widths and heights in whole pixels.
+
+        """
+        minX = np.clip(np.floor(lo[:, 0]), left, right + 1).astype(np.intp)
+        minY = np.clip(np.floor(lo[:, 1]), top, bottom + 1).astype(np.intp)
+        maxX = np.clip(np.ceil(hi[:, 0]), left - 1, right).astype(np.intp)
+        maxY = np.clip(np.ceil(hi[:, 1]), top - 1, bottom).astype(np.intp)
+
+        widths = np.where(keep, np.maximum(maxX - minX + 1, 0), 0)
+        heights = np.where(keep, np.maximum(maxY - minY + 1, 0), 0)
+
+        return minX, minY, widths, heights
+
+    @staticmethod
+    def __fragments(kind, shape, begin, end, left, right, top, bottom):
+        """
+
+        Return the ranks, coordinates and colours of the pixels covered by the primitives of one kind whose ranks are
+        in [begin, end).
+
+        """
+        ranks = shape[0]
+        chosen = np.flatnonzero((ranks >= begin) & (ranks < end))
+
+        if not len(chosen):
+            return None
+
+        if kind == TRIANGLES:
+            _, points, area, corners, smooth, (minX, minY, widths, heights) = shape
+            rowEntry, rowY = _rows(minY[chosen], np.where(widths[chosen] > 0, heights[chosen], 0))
+            rowEntry = chosen[rowEntry]
+
+            # Each edge, oriented so the inside is on its left for either winding, bounds a row from one side. The
+            # vertices are whole pixels, so the bounds are exact and no pixel on an edge is lost to rounding.
+            starts, stops = minX[rowEntry], minX[rowEntry] + widths[rowEntry] - 1
+            sign = np.sign(area[rowEntry])
+            for a, b in ((1, 2), (2, 0), (0, 1)):
+                (xa, ya), (xb, yb) = points[rowEntry, a].T, points[rowEntry, b].T
+                slope = sign * (ya - yb)
+                offset = sign * ((xb - xa) * (rowY - ya) + (yb - ya) * xa)
+
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    bound = -offset / slope
+
+                starts = np.where(slope > 0, np.maximum(starts, np.ceil(bound)), starts)
+                stops = np.where(slope < 0, np.minimum(stops, np.floor(bound)), stops)
+                stops = np.where((slope == 0) & (offset < 0), starts - 1, stops)
+
+            entry, xs, ys = _spans(rowEntry, rowY, starts.astype(np.intp), stops.astype(np.intp))
+            col = corners[entry, 0]
+
+            # Corner colours are blended with the pixels' barycentric weights
+            blended = np.flatnonzero(smooth[entry])
+            if len(blended):
+                chosen = entry[blended]
+                x, y = xs[blended], ys[blended]
+                (x0, y0), (x1, y1), (x2, y2) = (points[chosen, k].T for k in range(3))
+                w0 = ((x2 - x1) * (y - y1) - (y2 - y1) * (x - x1)) / area[chosen]
+                w1 = ((x0 - x2) * (y - y2) - (y0 - y2) * (x - x2)) / area[chosen]
+                weights = np.stack([w0, w1, 1 - w0 - w1], axis=1).clip(0, 1)[:, :, None]
+                col = col.copy()
+                col[blended] = np.rint((weights * corners[chosen]).sum(axis=1)).clip(0, 255)
+
+            return ranks[entry], xs, ys, col
+
+        if kind == LINES:
+            _, points, samples, col = shape
+            counts = samples[chosen]
+            entry = chosen[np.repeat(np.arange(len(chosen)), counts)]
+            step = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            t = step / np.maximum(samples[entry] - 1, 1)
+
+            xs = np.rint(points[entry, 0, 0] + t * (points[entry, 1, 0] - points[entry, 0, 0])).astype(np.intp)
+            ys = np.rint(points[entry, 0, 1] + t * (points[entry, 1, 1] - points[entry, 0, 1])).astype(np.intp)
+            inside = (xs >= left) & (xs <= right) & (ys >= top) & (ys <= bottom)
+
+            return ranks[entry[inside]], xs[inside], ys[inside], col[entry[inside]]
+
+        if kind == CIRCLES:
+            _, centres, radii, widths, col, (minX, minY, w, h) = shape
+            rowEntry, rowY = _rows(minY[chosen], np.where(w[chosen] > 0, h[chosen], 0))
+            rowEntry = chosen[rowEntry]
+
+            # Half widths of the disc and of the hole in a ring on each row, with -1 for rows that miss the hole
+            cx, dy, r = centres[rowEntry, 0], rowY - centres[rowEntry, 1], radii[rowEntry]
+            inner = np.where(widths[rowEntry] > 0, r - widths[rowEntry], -1)
+            outer = np.floor(np.sqrt(r ** 2 - dy ** 2))
+            hole = np.where((inner >= 0) & (inner ** 2 >= dy ** 2), np.floor(np.sqrt(np.abs(inner ** 2 - dy ** 2))), -1)
+
+            # Every row is drawn as a left and a right span, which meet in the middle unless there is a hole
+            leftX, rightX = minX[rowEntry], minX[rowEntry] + w[rowEntry] - 1
+            starts = np.concatenate([np.maximum(cx - outer, leftX), np.maximum(cx + np.maximum(hole, 0) + 1, leftX)])
+            stops = np.concatenate([np.minimum(cx - np.maximum(hole, 0) - (hole >= 0), rightX),
+                                    np.minimum(cx + outer, rightX)])
+
+            entry, xs, ys = _spans(np.tile(rowEntry, 2), np.tile(rowY, 2), starts.astype(np.intp),
+                                   stops.astype(np.intp))
+
+            return ranks[entry], xs, ys, col[entry]
+
+        _, blocks = shape
+        parts = []
+        for x in chosen.tolist():
+            xs, ys, col = blocks[x]
+            inside = (xs >= left) & (xs <= right) & (ys >= top) & (ys <= bottom)
+            parts.append((np.full(np.count_nonzero(inside), ranks[x]), xs[inside], ys[inside], col[inside]))
+
+        return tuple(np.concatenate(x) for x in zip(*parts))
@@ -5,3 +5,12 @@ class ArgumentError(Exception):
 
     """
     pass
+
+
+class FileFormatError(Exception):
+    """
+
+    An error called when a model or scene file cannot be read.
+
+    """
+    pass
@@ -0,0 +1,115 @@
+import numpy as np
+
+from engine._error import *
+from engine._obj import Mesh
+
+
+class Instances(Mesh):
+    def __init__(self, mesh, offsets, matrices=None, col=None, lines=None, corners=None):
+        """
+
+        Draws many copies of one Mesh, such as a Cube placed thousands of times, as a single scene object.
+
+        offsets is an (k, 3) array moving each of the k copies, and matrices is an optional (k, 3, 3) array, or one
+        (3, 3) matrix for every copy, applied to the mesh's vertices before they are moved. col is either one colour or
+        a (k, 3) array with a colour for each copy. col, lines and corners default to those of the mesh.
+
+        The vertices of every copy are worked out in one batched pass when the scene gathers them, and are not stored.
+        The copies' faces and edges, indexes into those vertices, are built once and kept until the mesh, its topology
+        or the number of copies change. Copies spread far apart are better split into several Instances, so the scene
+        can cull them.
+
+        Call markChanged() after changing the offsets, the matrices or the mesh's vertices.
+
+        """
+        super(Mesh, self).__init__()
+
+        if not isinstance(mesh, Mesh) or isinstance(mesh, Instances):
+            raise ArgumentError('Instances need a Mesh to copy, not {}'.format(type(mesh).__name__))
+
+        self.mesh = mesh
+        self.offsets = np.asarray(offsets, dtype=float).reshape(-1, 3)
+
+        if len(self.offsets) == 0:
+            raise ArgumentError('No copies specified for Instances')
+
+        if matrices is not None:
+            matrices = np.asarray(matrices, dtype=float)
+
+            if matrices.shape not in ((3, 3), (len(self.offsets), 3, 3)):
+                raise ArgumentError('Expected one matrix or one per copy for Instances, not shape {}'.format(
+                    matrices.shape))
+
+            matrices = np.broadcast_to(matrices, (len(self.offsets), 3, 3))
+
+        self.matrices = matrices
+
+        self.col = mesh.col if col is None else col
+        self.colours = np.broadcast_to(np.asarray(self.col, dtype=np.uint8), (len(self.offsets), 3))
+
+        if len(self.offsets) == 1:  # Drawn like any other Mesh, with one colour
+            self.col = tuple(self.colours[0].tolist())
+
+        self.linesInfo = mesh.linesInfo if lines is None else lines
+        self.cornersInfo = mesh.cornersInfo if corners is None else corners
+        self.__repeated = {}  # 'faces' or 'edges' to the mesh, indexes and counts they were built from, and the result
+
+    @property
+    def copies(self):
+        return len(self.offsets)
+
+    @property
+    def vertexCount(self):
+        return len(self.offsets) * len(self.mesh.vertices)
+
+    @property
+    def vertices(self):
+        """
+
+        The vertices of every copy in turn, transformed from the mesh's in one batch.
+
+        """
+        vertices = self.mesh.vertices
+
+        if self.matrices is not None:
+            vertices = np.matmul(vertices, self.matrices.transpose(0, 2, 1))
+
+        return (vertices + self.offsets[:, None]).reshape(-1, 3)
+
+    @property
+    def faces(self):
+        return self.__repeat('faces')
+
+    @property
+    def edges(self):
+        return self.__repeat('edges')
+
+    def __repeat(self, name):
+        """
+
+        Return the mesh's faces or edges, as name says, offset to the vertex indexes of each copy in turn. They are
+        only built again when the mesh or its indexes are replaced, the mesh is marked as changed or the number of
+        vertices or copies changes, rather than every time the scene reads them.
+
+        """
+        indexes = getattr(self.mesh, name)
+        counts = (self.mesh.version, len(self.mesh.vertices), len(self.offsets))
+        cached = self.__repeated.get(name)
+
+        if cached is not None and cached[0] is self.mesh and cached[1] is indexes and cached[2] == counts:
+            return cached[3]
+
+        steps = np.arange(len(self.offsets), dtype=np.intp) * len(self.mesh.vertices)
+        repeated = (indexes[None] + steps[:, None, None]).reshape(-1, indexes.shape[1])
+        repeated.flags.writeable = False
+        self.__repeated[name] = (self.mesh, indexes, counts, repeated)
+
+        return repeated
+
+    def centroid(self):
+        centre = self.mesh.vertices.mean(axis=0)
+
+        if self.matrices is not None:
+            centre = self.matrices @ centre
+
+        return (centre + self.offsets).mean(axis=0).tolist()
@@ -0,0 +1,30 @@
+import importlib
+
+
+class LazyModule:
+    def __init__(self, name, purpose):
+        """
+
+        Stands in for the module called name, importing it the first time one of its attributes is used. Modules only
+        needed for purpose, such as drawing, are then never imported by programs that don't do it.
+
+        """
+        self.__name = name
+        self.__purpose = purpose
+        self.__module = None
+
+    def __getattr__(self, attr):
+        if self.__module is None:
+            try:
+                self.__module = importlib.import_module(self.__name)
+
+            except ImportError as error:
+                raise ImportError('{} is needed for {}'.format(self.__name, self.__purpose)) from error
+
+        return getattr(self.__module, attr)
+
+    def __repr__(self):
+        return '<lazily imported module {!r}>'.format(self.__name)
+
+
+pygame = LazyModule('pygame', 'drawing and displaying scenes')
@@ -0,0 +1,61 @@
+import numpy as np
+
+from engine._error import *
+
+# Ways a Mesh can be shaded when its scene has a light
+FLAT = 'flat'  # One colour for each face, from the face's normal
+GOURAUD = 'gouraud'  # Colours worked out at each vertex from the normals of the faces around it, blended across faces
+
+
+class Light:
+    def __init__(self, direction, ambient=0.3):
+        """
+
+        A directional light, such as the sun, shining along direction in world coordinates. ambient is the fraction
+        of its full colour a face keeps when turned away from the light, between 0 and 1.
+
+        Scenes created with light=Light(...) shade their Meshes according to each mesh's shading attribute. A light
+        can't be changed once created, so meshes can cache their shaded colours; assign a new one to scene.light.
+
+        """
+        direction = np.asarray(direction, dtype=float).reshape(3)
+        length = np.sqrt((direction ** 2).sum())
+
+        if not length:
+            raise ArgumentError('Light direction must not be zero')
+
+        if not 0 <= ambient <= 1:
+            raise ArgumentError('Ambient light must be between 0 and 1, not {}'.format(ambient))
+
+        self.__direction = direction / length
+        self.__ambient = float(ambient)
+
+    @property
+    def direction(self):
+        return tuple(self.__direction.tolist())
+
+    @property
+    def ambient(self):
+        return self.__ambient
+
+    def intensity(self, normals):
+        """
+
+        Return the brightness, from ambient to 1, of surfaces with the given (m, 3) array of normals, which need not
+        be of unit length. Zero normals, of faces with no area, get the ambient light alone.
+
+        """
+        lengths = np.sqrt((normals ** 2).sum(axis=1))
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            facing = np.where(lengths > 0, -(normals @ self.__direction) / lengths, 0)
+
+        return self.__ambient + (1 - self.__ambient) * facing.clip(0, 1)
+
+    def shade(self, col, normals):
+        """
+
+        Scale an (m, 3) array of colours by the intensity of the light on the matching normals.
+
+        """
+        return np.rint(col * self.intensity(normals)[:, None]).astype(np.uint8)
@@ -0,0 +1,385 @@
+import os
+import struct
+
+import numpy as np
+
+from engine._error import *
+from engine._lod import LODMesh
+from engine._obj import Mesh
+
+CHUNK_SIZE = 1 << 16  # Lines or elements parsed per batch
+CACHE_MAGIC = b'3DEMESH\0'
+CACHE_VERSION = 1
+
+_PLY_TYPES = {'char': 'i1', 'int8': 'i1', 'uchar': 'u1', 'uint8': 'u1', 'short': 'i2', 'int16': 'i2',
+              'ushort': 'u2', 'uint16': 'u2', 'int': 'i4', 'int32': 'i4', 'uint': 'u4', 'uint32': 'u4',
+              'float': 'f4', 'float32': 'f4', 'double': 'f8', 'float64': 'f8'}
+
+
+class _ArrayBuilder:
+    def __init__(self, width, dtype):
+        """
+
+        Collects rows in fixed size chunks and joins them into one compact array at the end, so parsing never holds
+        more than one chunk of Python lists at a time.
+
+        """
+        self.width = width
+        self.dtype = dtype
+        self.chunks = []
+        self.pending = []
+
+    def append(self, row):
+        self.pending.append(row)
+
+        if len(self.pending) >= CHUNK_SIZE:
+            self.flush()
+
+    def extend(self, array):
+        self.flush()
+        self.chunks.append(np.asarray(array, dtype=self.dtype).reshape(-1, self.width))
+
+    def flush(self):
+        if self.pending:
+            self.chunks.append(np.array(self.pending, dtype=self.dtype).reshape(-1, self.width))
+            self.pending = []
+
+    def array(self):
+        self.flush()
+
+        if not self.chunks:
+            return np.empty((0, self.width), dtype=self.dtype)
+
+        return np.concatenate(self.chunks) if len(self.chunks) > 1 else self.chunks[0]
+
+
+def _fan(polygon):
+    """
+
+    Split a polygon given as a list of vertex indexes into triangles sharing its first vertex.
+
+    """
+    return [(polygon[0], polygon[x], polygon[x + 1]) for x in range(1, len(polygon) - 1)]
+
+
+def _checkFaces(vertices, faces, path):
+    """
+
+    Make sure every face of a loaded model refers to one of its vertices, so corrupt files fail here rather than when
+    the Mesh is built.
+
+    """
+    if faces.size and (faces.min() < 0 or faces.max() >= len(vertices)):
+        raise FileFormatError('Face index out of range in {}'.format(path))
+
+
+def loadObj(path):
+    """
+
+    Read a Wavefront OBJ file, returning (vertices, faces) as an (n, 3) float array and an (m, 3) index array.
+    Polygons are split into triangles. Texture coordinates, normals, lines, groups and materials are ignored.
+
+    """
+    vertices = _ArrayBuilder(3, float)
+    faces = _ArrayBuilder(3, np.intp)
+    count = 0
+
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            tokens = line.split()
+
+            if not tokens:
+                continue
+
+            try:
+                if tokens[0] == 'v':
+                    if len(tokens) < 4:
+                        raise ValueError('Vertex with fewer than three coordinates')
+
+                    vertices.append([float(x) for x in tokens[1:4]])
+                    count += 1
+
+                elif tokens[0] == 'f':
+                    # Indexes start at 1, and negative indexes count back from the latest vertex
+                    indexes = [int(x.split('/')[0]) for x in tokens[1:]]
+                    indexes = [x - 1 if x > 0 else count + x for x in indexes]
+
+                    for x in _fan(indexes):
+                        faces.append(x)
+
+            except (ValueError, IndexError):
+                raise FileFormatError('Malformed line {} in OBJ file {}'.format(number, path))
+
+    vertices, faces = vertices.array(), faces.array()
+    _checkFaces(vertices, faces, path)
+
+    return vertices, faces
+
+
+def _readPlyHeader(f, path):
+    """
+
+    Parse a PLY header, returning the format and a list of (name, count, properties) for each element, where
+    properties is a list of (name, type) or (name, (count type, item type)) for list properties.
+
+    """
+    if f.readline().strip() != b'ply':
+        raise FileFormatError('{} is not a PLY file'.format(path))
+
+    form = None
+    elements = []
+
+    while True:
+        line = f.readline()
+        if not line:
+            raise FileFormatError('Unterminated header in PLY file {}'.format(path))
+
+        tokens = line.decode('ascii', 'replace').split()
+
+        if not tokens or tokens[0] in ('comment', 'obj_info'):
+            continue
+
+        if tokens[0] == 'end_header':
+            break
+
+        try:
+            if tokens[0] == 'format':
+                form = tokens[1]
+
+            elif tokens[0] == 'element':
+                elements.append((tokens[1], int(tokens[2]), []))
+
+            elif tokens[0] == 'property' and tokens[1] == 'list':
+                elements[-1][2].append((tokens[4], (_PLY_TYPES[tokens[2]], _PLY_TYPES[tokens[3]])))
+
+            elif tokens[0] == 'property':
+                elements[-1][2].append((tokens[2], _PLY_TYPES[tokens[1]]))
+
+        except (IndexError, KeyError, ValueError):
+            raise FileFormatError('Malformed header line {!r} in PLY file {}'.format(line, path))
+
+    if form not in ('binary_little_endian', 'binary_big_endian'):
+        raise FileFormatError('Only binary PLY files are supported, not {} in {}'.format(form, path))
+
+    return '<' if form == 'binary_little_endian' else '>', elements
+
+
+def _readPlyFaces(f, count, properties, endian, path):
+    """
+
+    Stream a face element. Rows are read in chunks as fixed size records, on the assumption that every face has the
+    same number of vertices as the first. A face that does not is read on its own before chunking resumes.
+
+    """
+    faces = _ArrayBuilder(3, np.intp)
+    listIndex = [x for x, (name, kind) in enumerate(properties) if isinstance(kind, tuple)]
+
+    if len(listIndex) != 1 or properties[listIndex[0]][0] not in ('vertex_indices', 'vertex_index'):
+        raise FileFormatError('Faces without a single vertex_indices list in PLY file {}'.format(path))
+
+    before = np.dtype([(name, endian + kind) for name, kind in properties[:listIndex[0]]])
+    after = np.dtype([(name, endian + kind) for name, kind in properties[listIndex[0] + 1:]])
+    countType, itemType = (np.dtype(endian + x) for x in properties[listIndex[0]][1])
+
+    def read(size):
+        data = f.read(size)
+
+        if len(data) != size:
+            raise FileFormatError('Truncated face data in PLY file {}'.format(path))
+
+        return data
+
+    def readOne():
+        read(before.itemsize)
+        n = int(np.frombuffer(read(countType.itemsize), countType)[0])
+        polygon = np.frombuffer(read(n * itemType.itemsize), itemType).tolist()
+        read(after.itemsize)
+        return polygon
+
+    done = 0
+    if count:
+        first = readOne()
+        for x in _fan(first):
+            faces.append(x)
+        done = 1
+
+        record = np.dtype([('before', before), ('n', countType), ('indexes', itemType, (len(first),)),
+                           ('after', after)])
+
+        while done < count:
+            size = min(CHUNK_SIZE, count - done)
+            position = f.tell()
+            data = f.read(size * record.itemsize)
+            rows = np.frombuffer(data[:len(data) - len(data) % record.itemsize], record)
+
+            irregular = np.flatnonzero(rows['n'] != len(first))
+            stop = irregular[0] if irregular.size else len(rows)  # Short reads also mean an irregular face follows
+            rows = rows[:stop]
+            f.seek(position + stop * record.itemsize)
+
+            indexes = rows['indexes'].astype(np.intp)
+            for x in range(1, len(first) - 1):
+                faces.extend(np.column_stack([indexes[:, 0], indexes[:, x], indexes[:, x + 1]]))
+            done += stop
+
+            if stop < size:
+                for x in _fan(readOne()):
+                    faces.append(x)
+
+                done += 1
+
+    return faces.array()
+
+
+def loadPly(path):
+    """
+
+    Read a binary PLY file, returning (vertices, faces, colours). colours is an (n, 3) uint8 array if the vertices have
+    red, green and blue properties, or None. Polygons are split into triangles.
+
+    """
+    vertices = np.empty((0, 3))
+    faces = np.empty((0, 3), dtype=np.intp)
+    colours = None
+
+    with open(path, 'rb') as f:
+        endian, elements = _readPlyHeader(f, path)
+
+        for name, count, properties in elements:
+            if name == 'face':
+                faces = _readPlyFaces(f, count, properties, endian, path)
+                continue
+
+            if any(isinstance(kind, tuple) for _, kind in properties):
+                raise FileFormatError('Unsupported list property in element {} of {}'.format(name, path))
+
+            record = np.dtype([(x, endian + kind) for x, kind in properties])
+
+            if name != 'vertex':
+                f.seek(count * record.itemsize, os.SEEK_CUR)
+                continue
+
+            positions = _ArrayBuilder(3, float)
+            colourRows = _ArrayBuilder(3, np.uint8)
+            hasColour = all(x in record.names for x in ('red', 'green', 'blue'))
+
+            for start in range(0, count, CHUNK_SIZE):
+                size = min(CHUNK_SIZE, count - start) * record.itemsize
+                data = f.read(size)
+
+                if len(data) != size:
+                    raise FileFormatError('Truncated vertex data in PLY file {}'.format(path))
+
+                rows = np.frombuffer(data, record)
+                positions.extend(np.column_stack([rows['x'], rows['y'], rows['z']]))
+
+                if hasColour:
+                    colourRows.extend(np.column_stack([rows['red'], rows['green'], rows['blue']]))
+
+            vertices = positions.array()
+            colours = colourRows.array() if hasColour else None
+
+    _checkFaces(vertices, faces, path)
+
+    return vertices, faces, colours
+
+
+def saveCache(path, vertices, faces, colours=None):
+    """
+
+    Write vertices, faces and optional colours to a binary cache file that loadCache() can memory-map.
+
+    The file starts with a magic string, a version number and the row count of each array, followed by each array's
+    raw data aligned to 64 bytes.
+
+    """
+    arrays = [np.ascontiguousarray(vertices, dtype='<f8'), np.ascontiguousarray(faces, dtype='<i8'),
+              np.ascontiguousarray(colours if colours is not None else np.empty((0, 3)), dtype='u1')]
+
+    with open(path, 'wb') as f:
+        f.write(CACHE_MAGIC + struct.pack('<I3Q', CACHE_VERSION, *(len(x) for x in arrays)))
+
+        for array in arrays:
+            f.write(b'\0' * (-f.tell() % 64))
+            f.write(array.tobytes())
+
+
+def loadCache(path):
+    """
+
+    Memory-map a file written by saveCache(), returning (vertices, faces, colours) without copying any data.
+    colours is None if none were saved.
+
+    """
+    header = struct.Struct('<I3Q')
+
+    with open(path, 'rb') as f:
+        if f.read(len(CACHE_MAGIC)) != CACHE_MAGIC:
+            raise FileFormatError('{} is not a mesh cache file'.format(path))
+
+        data = f.read(header.size)
+
+    if len(data) != header.size:
+        raise FileFormatError('Truncated header in mesh cache {}'.format(path))
+
+    version, *counts = header.unpack(data)
+
+    if version != CACHE_VERSION:
+        raise FileFormatError('Mesh cache {} has version {}, expected {}'.format(path, version, CACHE_VERSION))
+
+    arrays = []
+    position = len(CACHE_MAGIC) + header.size
+
+    for count, dtype in zip(counts, ('<f8', '<i8', 'u1')):
+        position += -position % 64
+
+        if count and position + count * 3 * np.dtype(dtype).itemsize > os.path.getsize(path):
+            raise FileFormatError('Truncated data in mesh cache {}'.format(path))
+
+        arrays.append(np.memmap(path, dtype=dtype, mode='r', offset=position, shape=(count, 3)) if count else
+                      np.empty((0, 3), dtype=dtype))
+        position += count * 3 * np.dtype(dtype).itemsize
+
+    vertices, faces, colours = arrays
+    _checkFaces(vertices, faces, path)
+
+    return vertices, faces, colours if len(colours) else None
+
+
+def loadMesh(path, cache=True, col=(0, 0, 0), lines=(False, None), corners=(False, None), levels=1):
+    """
+
+    Load an OBJ or binary PLY file as a Mesh, or as an LODMesh with up to the given number of levels of detail.
+
+    If cache is True, the parsed arrays are saved next to the file as path + '.cache', and later loads memory-map that
+    file instead of parsing again, as long as it is newer than the model. A damaged or partly written cache is
+    replaced.
+
+    """
+    cachePath = path + '.cache'
+    vertices = None
+
+    if cache and os.path.exists(cachePath) and os.path.getmtime(cachePath) >= os.path.getmtime(path):
+        try:
+            vertices, faces, colours = loadCache(cachePath)
+
+        except FileFormatError:
+            pass
+
+    if vertices is None:
+        if path.lower().endswith('.obj'):
+            (vertices, faces), colours = loadObj(path), None
+
+        elif path.lower().endswith('.ply'):
+            vertices, faces, colours = loadPly(path)
+
+        else:
+            raise FileFormatError('Unknown model format for {}'.format(path))
+
+        if cache:
+            saveCache(cachePath, vertices, faces, colours)
+
+    if levels > 1:
+        return LODMesh(vertices, faces, col=col, lines=lines, corners=corners, levels=levels)
+
+    return Mesh(vertices, faces, col=col, lines=lines, corners=corners)
@@ -0,0 +1,188 @@
+from functools import lru_cache
+from math import sqrt
+
+import numpy as np
+
+from engine._error import *
+from engine._obj import Mesh
+
+LOD_TOLERANCE = 2.0  # Pixels a level's feature size may cover on the screen before a finer level is used
+MIN_FACES = 4  # Decimation stops before a level would have fewer faces than this
+
+
+def decimate(vertices, faces, cellSize):
+    """
+
+    Simplify a triangle mesh by vertex clustering. Vertices are grouped into cubic cells of side cellSize, every vertex
+    in a cell is replaced by the one nearest the cell's mean, and faces that collapse or repeat are dropped.
+
+    Returns the new (m, 3) face array. It indexes into the original vertices, so every level of detail can share one
+    vertex array and be transformed together.
+
+    """
+    vertices = np.asarray(vertices, dtype=float).reshape(-1, 3)
+    faces = np.asarray(faces, dtype=np.intp).reshape(-1, 3)
+
+    cells = np.floor((vertices - vertices.min(axis=0)) / cellSize).astype(np.int64)
+    cluster = np.unique(cells, axis=0, return_inverse=True)[1].ravel()
+
+    counts = np.bincount(cluster)
+    means = np.stack([np.bincount(cluster, vertices[:, x]) for x in range(3)], axis=1) / counts[:, None]
+    distances = ((vertices - means[cluster]) ** 2).sum(axis=1)
+
+    order = np.lexsort((distances, cluster))
+    representatives = order[np.concatenate([[0], np.flatnonzero(np.diff(cluster[order])) + 1])]
+
+    mapped = representatives[cluster][faces]
+    mapped = mapped[(mapped[:, 0] != mapped[:, 1]) & (mapped[:, 1] != mapped[:, 2]) & (mapped[:, 2] != mapped[:, 0])]
+
+    unique = np.unique(np.sort(mapped, axis=1), axis=0, return_index=True)[1]
+
+    return mapped[np.sort(unique)]
+
+
+def decimateLevels(vertices, faces, count=4):
+    """
+
+    Build up to count levels of detail for a mesh, as a list of (feature size, faces) from finest to coarsest.
+    The first level is the mesh itself. Each further level clusters vertices in cells twice the size of the last,
+    starting from twice the mean edge length, and levels that would not remove any faces are skipped.
+
+    """
+    vertices = np.asarray(vertices, dtype=float).reshape(-1, 3)
+    faces = np.asarray(faces, dtype=np.intp).reshape(-1, 3)
+    levels = [(0.0, faces)]
+
+    if len(faces) == 0:
+        return levels
+
+    cellSize = 2 * np.linalg.norm(vertices[faces[:, 1]] - vertices[faces[:, 0]], axis=1).mean()
+    extent = (vertices.max(axis=0) - vertices.min(axis=0)).max()
+
+    while len(levels) < count and 0 < cellSize < extent:
+        coarse = decimate(vertices, faces, cellSize)
+
+        if len(coarse) < MIN_FACES:
+            break
+
+        if len(coarse) < len(levels[-1][1]):
+            levels.append((float(cellSize), coarse))
+
+        cellSize *= 2
+
+    return levels
+
+
+@lru_cache(maxsize=None)
+def _sphereLevels(subdivisions):
+    """
+
+    Unit icosphere with every subdivision level from the icosahedron up, as (vertices, [(edge length, faces), ...]),
+    finest first. Each subdivision only appends vertices, so coarser levels index a prefix of the vertex array.
+
+    """
+    t = (1 + sqrt(5)) / 2
+    vertices = np.array([(-1, t, 0), (1, t, 0), (-1, -t, 0), (1, -t, 0), (0, -1, t), (0, 1, t),
+                         (0, -1, -t), (0, 1, -t), (t, 0, -1), (t, 0, 1), (-t, 0, -1), (-t, 0, 1)], dtype=float)
+    vertices /= np.linalg.norm(vertices, axis=1)[:, None]
+
+    faces = np.array([(0, 11, 5), (0, 5, 1), (0, 1, 7), (0, 7, 10), (0, 10, 11), (1, 5, 9), (5, 11, 4),
+                      (11, 10, 2), (10, 7, 6), (7, 1, 8), (3, 9, 4), (3, 4, 2), (3, 2, 6), (3, 6, 8), (3, 8, 9),
+                      (4, 9, 5), (2, 4, 11), (6, 2, 10), (8, 6, 7), (9, 8, 1)], dtype=np.intp)
+
+    # Wind every face so that Mesh.checkVisible sees it from outside the sphere
+    corners = vertices[faces]
+    outward = (np.cross(corners[:, 2] - corners[:, 0], corners[:, 1] - corners[:, 0]) * corners.sum(axis=1)).sum(1)
+    faces[outward < 0] = faces[outward < 0][:, ::-1]
+
+    levels = [faces]
+    for _ in range(subdivisions):
+        a, b, c = faces.T
+        pairs = np.sort(np.stack([np.stack([a, b], axis=1), np.stack([b, c], axis=1), np.stack([c, a], axis=1)]), 2)
+        edges, inverse = np.unique(pairs.reshape(-1, 2), axis=0, return_inverse=True)
+
+        midpoints = vertices[edges[:, 0]] + vertices[edges[:, 1]]
+        midpoints /= np.linalg.norm(midpoints, axis=1)[:, None]
+        ab, bc, ca = inverse.reshape(3, -1) + len(vertices)
+        vertices = np.concatenate([vertices, midpoints])
+
+        faces = np.concatenate([np.stack(x, axis=1) for x in ((a, ab, ca), (ab, b, bc), (ca, bc, c), (ab, bc, ca))])
+        levels.append(faces)
+
+    sizes = [float(np.linalg.norm(vertices[x[:, 1]] - vertices[x[:, 0]], axis=1).mean()) for x in levels]
+
+    return vertices, list(zip(sizes, levels))[::-1]
+
+
+class LODMesh(Mesh):
+    def __init__(self, vertices, faces=(), edges=(), col=(0, 0, 0), lines=(True, (0, 0, 0)),
+                 corners=(True, (0, 0, 0)), levels=4, tolerance=LOD_TOLERANCE):
+        """
+
+        Mesh that draws a coarser version of itself the smaller it appears on the screen.
+
+        levels is either the number of levels to build with decimateLevels(), or a list of (feature size, faces) from
+        finest to coarsest, where feature size is the distance in world units that detail is lost over. Each frame the
+        coarsest level whose feature size covers at most tolerance pixels is drawn, measured at the nearest point of
+        the mesh's bounding sphere and projected the same way as Sphere radii.
+
+        All levels index the same vertices, so only the faces of the chosen level cost anything to draw.
+
+        """
+        super().__init__(vertices, faces, edges, col=col, lines=lines, corners=corners)
+
+        if isinstance(levels, int):
+            self.levels = decimateLevels(self.vertices, self.faces, levels)
+
+        else:
+            self.levels = [(float(size), np.asarray(x, dtype=np.intp).reshape(-1, 3)) for size, x in levels]
+
+        if not self.levels:
+            raise ArgumentError('No levels of detail specified for LODMesh')
+
+        if any(x.size and (x.min() < 0 or x.max() >= len(self.vertices)) for _, x in self.levels):
+            raise ArgumentError('Vertex index out of range for LODMesh')
+
+        self.sizes = np.array([size for size, _ in self.levels])
+
+        if np.any(np.diff(self.sizes) < 0):
+            raise ArgumentError('Levels of detail must be ordered from finest to coarsest')
+
+        self.tolerance = tolerance
+        self.radius = float(np.linalg.norm(self.vertices - self.vertices.mean(axis=0), axis=1).max())
+        self.level = 0  # Level drawn in the latest frame
+
+    def selectLevel(self, frame):
+        """
+
+        Return the index of the level of detail to draw for the given frame.
+
+        """
+        depth = frame.camera[:, 0].mean() - self.radius
+
+        if depth <= 0:
+            return 0
+
+        pixelSize = frame.dim * self.sizes / (4 * depth)
+
+        return max(int(np.searchsorted(pixelSize, self.tolerance, side='right')) - 1, 0)
+
+    def getFaces(self, frame):
+        self.level = self.selectLevel(frame)
+
+        return self.levels[self.level][1]
+
+
+def icosphere(x, y, z, r, col=(0, 0, 0), lines=(False, None), corners=(False, None), subdivisions=3,
+              tolerance=LOD_TOLERANCE):
+    """
+
+    Tessellated sphere of radius r as an LODMesh, drawn with between 20 and 20 * 4 ** subdivisions faces depending on
+    its size on the screen. Spheres with the same number of subdivisions share their face arrays.
+
+    """
+    vertices, levels = _sphereLevels(subdivisions)
+    levels = [(size * r, faces) for size, faces in levels]
+
+    return LODMesh(vertices * r + (x, y, z), levels[0][1], col=col, lines=lines, corners=corners, levels=levels,
+                   tolerance=tolerance)
@@ -0,0 +1,190 @@
+from time import perf_counter, sleep
+
+from engine._camera import Camera
+from engine._lazy import LazyModule, pygame
+
+futures = LazyModule('concurrent.futures', 'running scenes interactively')
+
+TICK_RATE = 120  # Input and update ticks per second
+MAX_CATCH_UP = 5  # Ticks run back to back after a stall before the rest of the lost time is dropped
+
+
+class RunLoop:
+    def __init__(self, scene, tickRate=TICK_RATE, frameRate=60, update=None, prepare=None, controls=True):
+        """
+
+        Runs a scene interactively, overlapping input with drawing instead of doing them in turn.
+
+        Events are polled and update(loop, events, dt) is called on the main thread at a fixed tickRate per second,
+        however long frames take. Frames are drawn by a worker thread into an offscreen surface, so while frame N is
+        copied to the display, frame N + 1 is transformed and rasterized. Only one frame is ever in flight, which
+        keeps the delay from input to display under about two frame times in heavy scenes.
+
+        Ticks steer self.camera, whose pose is copied into the scene as each frame starts. Scene objects must only be
+        changed in prepare(loop, scene), which is called on the main thread just before each frame starts, while no
+        frame is being drawn.
+
+        frameRate caps the frames started per second, or is None to draw as fast as possible. Each frame shown later
+        than its slot counts the slots missed in self.dropped, and self.latency is the time from a frame's pose being
+        taken to it being shown.
+
+        If controls is True, clicking grabs the mouse to turn the camera and the arrow, q and e keys fly it, as in the
+        demo. Escape releases the mouse, and closing the window stops the loop.
+
+        """
+        self.scene = scene
+        self.camera = Camera(scene.offset, scene.rot, scene.dim, scene.near, scene.far)
+        self.tickRate = tickRate
+        self.frameRate = frameRate
+        self.update = update
+        self.prepare = prepare
+        self.controls = controls
+
+        self.running = False
+        self.ticks = 0
+        self.frames = 0
+        self.dropped = 0
+        self.latency = self.maxLatency = 0.0
+
+        self.__grab = False
+        self.__lastMotion = (0, 0)
+
+    def stop(self):
+        """
+
+        Stop the loop after the current tick. May be called from update() or prepare().
+
+        """
+        self.running = False
+
+    def run(self, frames=None):
+        """
+
+        Run until stop() is called, the window is closed or the given number of frames have been shown. The scene's
+        screen holds the last frame shown afterwards.
+
+        """
+        scene = self.scene
+        display = scene.screen
+        back = pygame.Surface(display.get_size())
+        scene.screen = back
+        scene.invalidate()
+
+        tick = 1 / self.tickRate
+        interval = 1 / self.frameRate if self.frameRate else 0.0
+        executor = futures.ThreadPoolExecutor(max_workers=1)
+        pending = started = shown = taken = None
+        last = nextFrame = perf_counter()
+        lag = 0.0
+
+        self.running = True
+
+        try:
+            while self.running and (frames is None or self.frames < frames):
+                now = perf_counter()
+                lag += now - last
+                last = now
+
+                ticks = 0
+                while lag >= tick and self.running:
+                    if ticks == MAX_CATCH_UP:
+                        lag = 0.0  # The rest of a long stall is skipped rather than simulated
+                        break
+
+                    self.__tick(tick)
+                    lag -= tick
+                    ticks += 1
+
+                ready = pending is not None and pending.done()
+                if ready:
+                    rects = pending.result()  # Raises any error from the worker
+                    pending, taken = None, started
+
+                    for rect in rects:
+                        display.blit(back, rect, rect)
+
+                # The next frame starts drawing into the back surface as soon as the last one is copied out of it
+                if self.running and pending is None and now >= nextFrame:
+                    scene.offset, scene.rot = list(self.camera.offset), list(self.camera.rot)
+
+                    if self.prepare is not None:
+                        self.prepare(self, scene)
+
+                    started, pending = perf_counter(), executor.submit(scene.draw)
+                    nextFrame = max(nextFrame + interval, now)
+
+                if ready:
+                    self.__present(rects, shown, interval, taken)
+                    shown = perf_counter()
+
+                # Sleep until the next tick is due or the frame in flight finishes
+                remaining = tick - lag - (perf_counter() - last)
+                if remaining > 0:
+                    if pending is not None:
+                        futures.wait([pending], timeout=remaining)
+
+                    else:
+                        sleep(remaining)
+
+        finally:
+            if pending is not None:
+                futures.wait([pending])
+
+            executor.shutdown()
+            scene.screen = display
+            scene.invalidate()
+
+    def __present(self, rects, shown, interval, taken):
+        """
+
+        Update the parts of the display a finished frame changed and account for it.
+
+        """
+        if not self.scene.headless and rects:
+            pygame.display.update(rects)
+
+        now = perf_counter()
+        self.frames += 1
+        self.latency = now - taken
+        self.maxLatency = max(self.maxLatency, self.latency)
+
+        if shown is not None and interval:
+            self.dropped += max(round((now - shown) / interval) - 1, 0)
+
+    def __tick(self, dt):
+        """
+
+        Poll events, steer the camera and call update() for one fixed tick of dt seconds.
+
+        """
+        events = pygame.event.get() if pygame.display.get_init() else []
+        self.ticks += 1
+
+        for event in events:
+            if event.type == pygame.QUIT:
+                self.stop()
+
+            elif not self.controls:
+                continue
+
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                pygame.event.set_grab(False)
+                pygame.mouse.set_visible(True)
+                self.__grab = False
+
+            elif event.type == pygame.MOUSEBUTTONDOWN:
+                pygame.event.set_grab(True)
+                pygame.mouse.set_visible(False)
+                self.__grab = True
+
+            elif event.type == pygame.MOUSEMOTION:
+                if event.rel != (-self.__lastMotion[0], -self.__lastMotion[1]) and self.__grab:
+                    self.camera.adjustRotation(event.rel)
+                    pygame.mouse.set_pos(self.scene.dim / 2, self.scene.dim / 2)
+                    self.__lastMotion = event.rel
+
+        if self.controls and pygame.display.get_init():
+            self.camera.adjustOffset(pygame.key.get_pressed(), dt * 1000)
+
+        if self.update is not None:
+            self.update(self, events, dt)
@@ -1,81 +1,250 @@
 from abc import abstractmethod, ABCMeta
-from math import sin, cos, sqrt
+from math import sqrt
 
-import pygame
+import numpy as np
 
+from engine._drawlist import DrawList
 from engine._error import *
-from engine._scene import _OffsetHolder
+from engine._lazy import pygame
+from engine._light import FLAT, GOURAUD
+from engine._stats import DRAWN, BEHIND, BACKFACE, OFFSCREEN
+
+_changes = 0  # Incremented every time any scene object is marked as changed
+
+_LINE = np.array([[0, 1]])  # Rows of the Frames of single Lines and Triangles, for clipping them
+_TRIANGLE = np.array([[0, 1, 2]])
+_TRIANGLE_EDGES = np.array([[0, 1], [1, 2], [2, 0]])
+_FACE_CACHE = 16  # Face arrays a Mesh keeps normals for, such as the levels of an LODMesh
+
+
+def changeCount():
+    """
+
+    Return the number of times any scene object has been marked as changed, so scenes can cheaply tell if any of their
+    objects need transforming again.
+
+    """
+    return _changes
+
+
+def footprint(radius):
+    """
+
+    Return the x and y pixel offsets covered by a dot of the given radius, for splatting many points at once.
+
+    """
+    r = int(radius)
+    dx, dy = np.mgrid[-r:r + 1, -r:r + 1]
+    inside = dx ** 2 + dy ** 2 <= radius ** 2
+
+    return dx[inside], dy[inside]
+
+
+def _outcomes(shown, valid):
+    """
+
+    Reasons for a batch of single vertex objects, given whether each is on the screen and in front of the camera.
+
+    """
+    return [DRAWN if x else OFFSCREEN if y else BEHIND for x, y in zip(shown.tolist(), valid.tolist())]
 
 
 class __SceneObject(metaclass=ABCMeta):
+    __slots__ = ()  # Lets small subclasses such as Point do without an instance dictionary
+    padding = 0.0  # Distance the object extends beyond its vertices, used when bounding it for culling
+    pixelPadding = 3  # Pixels the object may draw beyond its projected vertices, such as corner circles
+    model = None  # 4x4 matrix placing the object's vertices in the world, or None to use them as they are
+
     def __init__(self):
-        pass
+        """
+
+        Every scene object provides the coordinates it needs transforming as self.vertices, an (n, 3) float array,
+        which its model matrix places in the world. The scene transforms the vertices of all objects in one batch per
+        frame.
+
+        """
+        self.version = 0
+        self.model = None
+
+    def markChanged(self):
+        """
+
+        Call after changing self.vertices or anything else that affects how the object is drawn, so that scenes
+        caching their transformed coordinates pick up the change on the next frame.
+
+        """
+        global _changes
+
+        _changes += 1
+        self.version = _changes
+
+    def setModel(self, model):
+        """
+
+        Place the object in the world with a 4x4 affine matrix, or None to remove it. Moving, turning or scaling the
+        object this way leaves its vertices untouched. Sphere radii and dot sizes are not scaled.
+
+        """
+        if model is not None:
+            model = np.array(model, dtype=float)
+
+            if model.shape != (4, 4):
+                raise ArgumentError('Model matrices must be 4x4, not shape {}'.format(model.shape))
+
+        self.model = model
+        self.markChanged()
+
+    def worldVertices(self):
+        """
+
+        Return self.vertices moved by the model matrix, if the object has one.
+
+        """
+        if self.model is None:
+            return self.vertices
+
+        return self.vertices @ self.model[:3, :3].T + self.model[:3, 3]
 
     @abstractmethod
-    def draw(self, screen, pointMap, offset, rot):
+    def draw(self, screen, frame):
         """
 
-        Transform coordinates correctly, and draw the object to the screen.
+        Draw the object to the screen.
 
-        Coordinates are translated, then rotated, then projected to 2D, then drawn to the screen.
+        frame is a Frame holding the already transformed and projected coordinates of self.vertices, in order.
         All errors in the process must be caught.
 
+        Returns DRAWN, or the reason the object was not drawn: BEHIND, BACKFACE or OFFSCREEN.
+
         """
         pass
 
     @abstractmethod
+    def rasterize(self, buffer, frame):
+        """
+
+        Write the object into a DepthBuffer, for scenes that depth test every pixel instead of sorting objects.
+
+        frame and the return value are the same as for draw().
+
+        """
+        pass
+
+    @abstractmethod
+    def submit(self, drawList, frame, key):
+        """
+
+        Add the object's primitives to a DrawList with the given key, for scenes that rasterize all the primitives of a
+        frame in one batch.
+
+        frame and the return value are the same as for draw().
+
+        """
+        pass
+
+    @classmethod
+    def submitMany(cls, drawList, objs, starts, frame, keys):
+        """
+
+        Submit several objects of this class whose vertices are held in one Frame, those of objs[k] starting at row
+        starts[k], and return the reason for each. Subclasses override this to submit all of them in one vectorised
+        pass.
+
+        """
+        return [x.submit(drawList, frame[s:s + len(x.vertices)], k) for x, s, k in zip(objs, starts, keys)]
+
+    def centroid(self):
+        """
+
+        Return the world coordinates the object is sorted by. Scenes cache the result, and only ask again after the
+        object is marked as changed.
+
+        """
+        return self.vertices.mean(axis=0).tolist()
+
+    def worldCentroid(self):
+        """
+
+        Return centroid() moved by the model matrix, if the object has one.
+
+        """
+        if self.model is None:
+            return self.centroid()
+
+        return (self.model[:3, :3] @ self.centroid() + self.model[:3, 3]).tolist()
+
     def centre(self, scene):
         """
 
         Return a numerical value of a measure of distance away from the camera.
 
         """
-        pass
+        centroid = self.worldCentroid()
+
+        return sum((centroid[x] - scene.offset[x]) ** 2 for x in range(3))
 
 
 class Point(__SceneObject):
+    __slots__ = ('pos', 'col', 'version', 'model')
+
     def __init__(self, x, y, z, col=(0, 0, 0)):
+        """
+
+        Points are kept small, with no instance dictionary and no stored copies of their coordinates.
+        For large numbers of points, use a PointCloud instead.
+
+        """
         super().__init__()
         self.pos = (x, y, z)
-        self.x = x
-        self.y = y
-        self.z = z
         self.col = col
 
-    def draw(self, screen, pointMap, offset, rot):
-        try:
+    @property
+    def x(self):
+        return self.pos[0]
 
-            translatedCoordinates = (self.pos[0] - offset[0],
-                                     self.pos[1] - offset[1],
-                                     self.pos[2] - offset[2])
+    @property
+    def y(self):
+        return self.pos[1]
 
-            rotatedCoordinatesY = (translatedCoordinates[0] * cos(rot[0]) + translatedCoordinates[2] * sin(rot[0]),
-                                   translatedCoordinates[1],
-                                   translatedCoordinates[2] * cos(rot[0]) - translatedCoordinates[0] * sin(
-                                       rot[0]))  # Rotation in z axis
+    @property
+    def z(self):
+        return self.pos[2]
 
-            fullRotatedCoordinates = (rotatedCoordinatesY[0] * cos(rot[1]) - rotatedCoordinatesY[1] * sin(rot[1]),
-                                      rotatedCoordinatesY[0] * sin(rot[1]) + rotatedCoordinatesY[1] * cos(rot[1]),
-                                      rotatedCoordinatesY[2])  # Rotation in y axis
+    @property
+    def vertices(self):
+        return np.array([self.pos], dtype=float)
 
-            positionOnScreen = (fullRotatedCoordinates[2] / fullRotatedCoordinates[0],
-                                fullRotatedCoordinates[1] / fullRotatedCoordinates[0])
+    def draw(self, screen, frame):
+        # These coordinates must be between (0 <= x <= dim, 0 <= y <= dim) to be on the screen
+        if frame.onScreen()[0]:
+            pygame.draw.circle(screen, self.col, frame.pixels()[0], 2)
+            return DRAWN
 
-            if fullRotatedCoordinates[0] <= 0:
-                return
+        return OFFSCREEN if frame.valid[0] else BEHIND
 
-        except ZeroDivisionError:
-            return
+    def rasterize(self, buffer, frame):
+        if frame.onScreen()[0]:
+            buffer.circles(frame.screen, 2, frame.camera[:, 0], self.col)
+            return DRAWN
 
-        # These coordinates must be between (-1 <= x <= 1, -1 <= y <= 1) to be on the screen
-        if -1 <= positionOnScreen[0] <= 1 and -1 <= positionOnScreen[1] <= 1:
-            coords = pointMap(positionOnScreen)
-            coords = (round(coords[0]), round(coords[1]))  # Need integer arguments for blit
+        return OFFSCREEN if frame.valid[0] else BEHIND
 
-            pygame.draw.circle(screen, self.col, coords, 2)
+    def submit(self, drawList, frame, key):
+        return self.submitMany(drawList, [self], [0], frame, [key])[0]
 
-    def centre(self, scene):
-        return sum((self.pos[x] - scene.offset[x]) ** 2 for x in range(3))
+    @classmethod
+    def submitMany(cls, drawList, objs, starts, frame, keys):
+        rows = np.asarray(starts, dtype=np.intp)
+        shown = frame.onScreen()[rows]
+        chosen = np.flatnonzero(shown)
+
+        drawList.circles(frame.screen[rows[chosen]], 2, [objs[x].col for x in chosen.tolist()],
+                         np.asarray(keys, dtype=float)[chosen])
+
+        return _outcomes(shown, frame.valid[rows])
+
+    def centroid(self):
+        return self.pos
 
 
 class Line(__SceneObject):
@@ -93,59 +262,74 @@ class Line(__SceneObject):
             raise ArgumentError('Incorrect number of points specified for Line')
 
         self.col = col
+        self.vertices = np.array([x.pos for x in self.coords], dtype=float)
 
-    def draw(self, screen, pointMap, offset, rot):
-        coordListOnScreen = []
-        for x in self.coords:  # Find the coordinates of each point on the screen and draw a polygon joining them.
-            try:
+    def draw(self, screen, frame):
+        if not frame.valid.any():  # The whole line is behind the camera
+            return BEHIND
 
-                translatedCoordinates = (x.pos[0] - offset[0],
-                                         x.pos[1] - offset[1],
-                                         x.pos[2] - offset[2])
+        ends, _, _ = frame.clipLines(_LINE)
 
-                rotatedCoordinatesY = (translatedCoordinates[0] * cos(rot[0]) + translatedCoordinates[2] * sin(rot[0]),
-                                       translatedCoordinates[1],
-                                       translatedCoordinates[2] * cos(rot[0]) - translatedCoordinates[0] * sin(
-                                           rot[0]))  # Rotation in z axis
+        if not len(ends):
+            return OFFSCREEN
 
-                fullRotatedCoordinates = (rotatedCoordinatesY[0] * cos(rot[1]) - rotatedCoordinatesY[1] * sin(rot[1]),
-                                          rotatedCoordinatesY[0] * sin(rot[1]) + rotatedCoordinatesY[1] * cos(rot[1]),
-                                          rotatedCoordinatesY[2])  # Rotation in y axis
+        coordListOnScreen = [(round(x), round(y)) for x, y in ends[0].tolist()]
 
-                positionOnScreen = (fullRotatedCoordinates[2] / fullRotatedCoordinates[0],
-                                    fullRotatedCoordinates[1] / fullRotatedCoordinates[0])
+        pygame.draw.aaline(screen, self.col, coordListOnScreen[0], coordListOnScreen[1])
+        if self.endInfo[0]:  # Only ends that were not clipped away
+            for x, shown in zip(frame.pixels(), frame.unclipped.tolist()):
+                if shown:
+                    pygame.draw.circle(screen, self.endInfo[1], x, 2)
 
-                if fullRotatedCoordinates[0] <= 0:
-                    return
+        return DRAWN
 
-                coords = pointMap(positionOnScreen)
-                coords = (round(coords[0]), round(coords[1]))  # Need integer arguments for blit
+    def rasterize(self, buffer, frame):
+        if not frame.valid.any():
+            return BEHIND
 
-                # if -1 * 10e10 <= coords[0] <= 10e10 and -1 * 10e10 <= coords[1] <= 10e10:
-                #     coordList.append(coords)  # Errors occur when coords go above magnitude of 10^10
-                coordListOnScreen.append(coords)
+        ends, depths, _ = frame.clipLines(_LINE)
 
-            except ZeroDivisionError:
-                pass
+        if not len(ends):
+            return OFFSCREEN
 
-        try:
-            pygame.draw.aaline(screen, self.col, coordListOnScreen[0], coordListOnScreen[1])
-            if self.endInfo[0]:
-                for x in coordListOnScreen:
-                    pygame.draw.circle(screen, self.endInfo[1], x, 2)
+        buffer.lines(ends, depths, self.col)
+        if self.endInfo[0]:
+            shown = frame.unclipped
+            buffer.circles(frame.screen[shown], 2, frame.camera[shown, 0], self.endInfo[1])
 
-        except IndexError:  # point not appended due to zero division error
-            pass
+        return DRAWN
 
-    def centre(self, scene):
-        midpoint = ((self.coords[0].pos[0] + self.coords[1].pos[0]) / 2,
-                    (self.coords[0].pos[1] + self.coords[1].pos[1]) / 2,
-                    (self.coords[0].pos[2] + self.coords[1].pos[2]) / 2)
+    def submit(self, drawList, frame, key):
+        return self.submitMany(drawList, [self], [0], frame, [key])[0]
+
+    @classmethod
+    def submitMany(cls, drawList, objs, starts, frame, keys):
+        rows = np.asarray(starts, dtype=np.intp)[:, None] + np.arange(2)
+        valid = frame.valid[rows].any(axis=1)
+        chosen = np.flatnonzero(valid)
+        keys = np.asarray(keys, dtype=float)[chosen]
+
+        ends, _, owners = frame.clipLines(rows[chosen])
+        colours = np.array([objs[x].col for x in chosen.tolist()], dtype=np.uint8).reshape(-1, 3)
+        drawList.lines(ends, colours[owners], keys[owners])
+
+        # Ends are drawn where they were not clipped away, after their line
+        ended = np.zeros(len(chosen), dtype=bool)
+        ended[owners] = [objs[x].endInfo[0] for x in chosen[owners].tolist()]
+        endRows = rows[chosen[ended]].ravel()
+        shown = frame.unclipped[endRows]
+        colours = np.repeat([objs[x].endInfo[1] for x in chosen[ended].tolist()], 2, axis=0).reshape(-1, 3)
+        drawList.circles(frame.screen[endRows[shown]], 2, colours[shown], np.repeat(keys[ended], 2)[shown])
+
+        drawn = np.zeros(len(objs), dtype=bool)
+        drawn[chosen[owners]] = True
 
-        return sum((midpoint[x] - scene.offset[x]) ** 2 for x in range(3))
+        return [DRAWN if x else OFFSCREEN if y else BEHIND for x, y in zip(drawn.tolist(), valid.tolist())]
 
 
 class Triangle(__SceneObject):
+    __plane = (None, None, None)  # Version the normal and distance below were worked out for
+
     def __init__(self, *coords, col=(0, 0, 0), lines=(True, (0, 0, 0)), corners=(True, (0, 0, 0))):
         """
 
@@ -159,75 +343,126 @@ class Triangle(__SceneObject):
         self.col = col
         self.cornersInfo = corners
         self.linesInfo = lines
+        self.vertices = np.array([x.pos for x in self.coords], dtype=float)
 
-    def draw(self, screen, pointMap, offset, rot):
-        coordListOnScreen = []
-        coordList3D = []
-        for x in self.coords:  # Find the coordinates of each point on the screen and draw a polygon joining them.
-            try:
-
-                translatedCoordinates = (x.pos[0] - offset[0],
-                                         x.pos[1] - offset[1],
-                                         x.pos[2] - offset[2])
+    def draw(self, screen, frame):
+        if not frame.valid.any():  # The whole triangle is behind the camera
+            return BEHIND
 
-                rotatedCoordinatesY = (translatedCoordinates[0] * cos(rot[0]) + translatedCoordinates[2] * sin(rot[0]),
-                                       translatedCoordinates[1],
-                                       translatedCoordinates[2] * cos(rot[0]) - translatedCoordinates[0] * sin(
-                                           rot[0]))  # Rotation in z axis
+        if not self.facing(frame):
+            return BACKFACE
 
-                fullRotatedCoordinates = (rotatedCoordinatesY[0] * cos(rot[1]) - rotatedCoordinatesY[1] * sin(rot[1]),
-                                          rotatedCoordinatesY[0] * sin(rot[1]) + rotatedCoordinatesY[1] * cos(rot[1]),
-                                          rotatedCoordinatesY[2])  # Rotation in y axis
+        clipped = not frame.unclipped.all()
 
-                coordList3D.append(fullRotatedCoordinates)
+        if clipped:  # Drawn as the pieces left inside the view, with only the triangle's own edges outlined
+            pieces, _, _ = frame.clipTriangles(_TRIANGLE)
 
-                positionOnScreen = (fullRotatedCoordinates[2] / fullRotatedCoordinates[0],
-                                    fullRotatedCoordinates[1] / fullRotatedCoordinates[0])
+            if not len(pieces):
+                return OFFSCREEN
 
-                if fullRotatedCoordinates[0] <= 0:
-                    return
+            polygons = [[(round(x), round(y)) for x, y in piece] for piece in pieces.tolist()]
 
-                coords = pointMap(positionOnScreen)
-                coords = (round(coords[0]), round(coords[1]))  # Need integer arguments for blit
+        else:
+            polygons = [frame.pixels()]
 
-                # if -1 * 10e10 <= coords[0] <= 10e10 and -1 * 10e10 <= coords[1] <= 10e10:
-                #     coordList.append(coords)  # Errors occur when coords go above magnitude of 10^10
-                coordListOnScreen.append(coords)
+        for coordListOnScreen in polygons:
+            try:
+                pygame.draw.polygon(screen, self.col, coordListOnScreen)  # Body of polygon done
 
-            except ZeroDivisionError:
+            except (ValueError, TypeError):
                 pass
 
-        if self.checkVisible(coordList3D):
+        if self.linesInfo[0] and clipped:
+            for (x0, y0), (x1, y1) in frame.clipLines(_TRIANGLE_EDGES)[0].tolist():
+                pygame.draw.aaline(screen, self.linesInfo[1], (round(x0), round(y0)), (round(x1), round(y1)))
+
+        elif self.linesInfo[0]:  # If lines are to be drawn
             try:
-                pygame.draw.polygon(screen, self.col, coordListOnScreen)  # Body of polygon done
+                pygame.draw.aalines(screen, True, self.linesInfo[1], polygons[0])
 
-            except (ValueError, TypeError):
+            except ValueError:
                 pass
 
-            if self.linesInfo[0]:  # If lines are to be drawn
-                try:
-                    pygame.draw.aalines(screen, True, self.linesInfo[1], coordListOnScreen)
+        if self.cornersInfo[0]:  # If corners are to be drawn, reuse the coordinates already transformed
+            for x in range(3):
+                self.coords[x].draw(screen, frame[x:x + 1])
 
-                except ValueError:
-                    pass
+        return DRAWN
 
-            if self.cornersInfo[0]:  # If corners are to be drawn
-                for x in self.coords:
-                    x.draw(screen, pointMap, offset, rot)
+    def rasterize(self, buffer, frame):
+        if not frame.valid.any():
+            return BEHIND
 
-    def centre(self, scene):
-        c1 = self.coords[0]
-        c2 = self.coords[1]
-        c3 = self.coords[2]
+        if not self.facing(frame):
+            return BACKFACE
 
-        c1ToC2 = [c2.pos[x] - c1.pos[x] for x in range(3)]
-        c1ToMedian = [c1ToC2[x] / 2 for x in range(3)]
-        median = [c1.pos[x] + c1ToMedian[x] for x in range(3)]
-        medianToC3 = [c3.pos[x] - median[x] for x in range(3)]
-        medianToCentroid = [medianToC3[x] / 3 for x in range(3)]
-        centroid = [median[x] + medianToCentroid[x] for x in range(3)]
+        pieces, depths, _ = frame.clipTriangles(_TRIANGLE)
 
-        return sum((centroid[x] - scene.offset[x]) ** 2 for x in range(3))
+        if not len(pieces):
+            return OFFSCREEN
+
+        buffer.triangles(pieces, depths, self.col)
+
+        if self.linesInfo[0]:
+            ends, depths, _ = frame.clipLines(_TRIANGLE_EDGES)
+            buffer.lines(ends, depths, self.linesInfo[1])
+
+        if self.cornersInfo[0]:
+            for x in range(3):
+                self.coords[x].rasterize(buffer, frame[x:x + 1])
+
+        return DRAWN
+
+    def submit(self, drawList, frame, key):
+        return self.submitMany(drawList, [self], [0], frame, [key])[0]
+
+    @classmethod
+    def submitMany(cls, drawList, objs, starts, frame, keys):
+        rows = np.asarray(starts, dtype=np.intp)[:, None] + np.arange(3)
+        valid = frame.valid[rows].any(axis=1)
+        facing = valid & Mesh.checkVisible(frame.camera[rows])
+        pieces, _, owners = frame.clipTriangles(rows[facing])
+        drawn = np.zeros(len(objs), dtype=bool)
+        drawn[np.flatnonzero(facing)[owners]] = True
+
+        chosen = np.flatnonzero(drawn)
+        keys = np.asarray(keys, dtype=float)[chosen]
+        owners = np.searchsorted(chosen, np.flatnonzero(facing)[owners])
+        colours = np.array([objs[x].col for x in chosen.tolist()], dtype=np.uint8).reshape(-1, 3)
+        drawList.triangles(pieces, colours[owners], keys[owners])
+
+        lined = np.array([objs[x].linesInfo[0] for x in chosen.tolist()], dtype=bool)
+        ends, _, owners = frame.clipLines(rows[chosen[lined]][:, _TRIANGLE_EDGES].reshape(-1, 2))
+        colours = np.array([objs[x].linesInfo[1] for x in chosen[lined].tolist()], dtype=np.uint8).reshape(-1, 3)
+        drawList.lines(ends, colours[owners // 3], keys[lined][owners // 3])
+
+        # Corners are drawn with the colours of their own Points, wherever they are on the screen
+        cornered = np.array([objs[x].cornersInfo[0] for x in chosen.tolist()], dtype=bool)
+        corners = rows[chosen[cornered]].ravel()
+        shown = frame.onScreen()[corners]
+        colours = [y.col for x in chosen[cornered].tolist() for y in objs[x].coords]
+        drawList.circles(frame.screen[corners[shown]], 2, np.array(colours, dtype=np.uint8).reshape(-1, 3)[shown],
+                         np.repeat(keys[cornered], 3)[shown])
+
+        return [DRAWN if x else OFFSCREEN if y else BACKFACE if z else BEHIND
+                for x, y, z in zip(drawn.tolist(), facing.tolist(), valid.tolist())]
+
+    def facing(self, frame):
+        """
+
+        Return whether the triangle faces the camera. The normal is worked out in world coordinates once and cached
+        until the triangle is marked as changed, so only a dot product with the camera's position is left per frame.
+
+        """
+        if frame.eye is None:
+            return self.checkVisible(frame.camera)
+
+        if self.__plane[0] != self.version:
+            corners = self.worldVertices()
+            normal = np.cross(corners[2] - corners[0], corners[1] - corners[0])
+            self.__plane = (self.version, normal, float(normal @ corners[0]))
+
+        return float(self.__plane[1] @ frame.eye) >= self.__plane[2]
 
     @staticmethod
     def getNormal(coords):
@@ -271,49 +506,465 @@ class Sphere(__SceneObject):
         super().__init__()
         self.pos = (x, y, z)
         self.radius = r
+        self.padding = r
         self.col = col
         self.outline = outline
+        self.vertices = np.array([self.pos], dtype=float)
 
-    def draw(self, screen, pointMap, offset, rot):
-        try:
+    def draw(self, screen, frame):
+        if not frame.allValid():
+            return BEHIND
 
-            translatedCoordinates = (self.pos[0] - offset[0],
-                                     self.pos[1] - offset[1],
-                                     self.pos[2] - offset[2])
+        if not frame.inDepth()[0]:  # Beyond the far plane
+            return OFFSCREEN
 
-            rotatedCoordinatesY = (translatedCoordinates[0] * cos(rot[0]) + translatedCoordinates[2] * sin(rot[0]),
-                                   translatedCoordinates[1],
-                                   translatedCoordinates[2] * cos(rot[0]) - translatedCoordinates[0] * sin(
-                                       rot[0]))  # Rotation in z axis
+        coords = frame.pixels()[0]
 
-            fullRotatedCoordinates = (rotatedCoordinatesY[0] * cos(rot[1]) - rotatedCoordinatesY[1] * sin(rot[1]),
-                                      rotatedCoordinatesY[0] * sin(rot[1]) + rotatedCoordinatesY[1] * cos(rot[1]),
-                                      rotatedCoordinatesY[2])  # Rotation in y axis
+        radius = self.projectedRadius(frame)
 
-            positionOnScreen = (fullRotatedCoordinates[2] / fullRotatedCoordinates[0],
-                                fullRotatedCoordinates[1] / fullRotatedCoordinates[0])
+        pygame.draw.circle(screen, self.col, coords, radius)
 
-            if fullRotatedCoordinates[0] <= 0:
-                return
+        if self.outline[0]:
+            pygame.draw.circle(screen, self.outline[1], coords, radius, 1)
 
-        except ZeroDivisionError:
-            return
+        return DRAWN
 
-        coords = pointMap(positionOnScreen)
-        coords = (round(coords[0]), round(coords[1]))  # Need integer arguments for blit
+    def rasterize(self, buffer, frame):
+        if not frame.allValid():
+            return BEHIND
 
-        radius = round(pointMap((0, 1))[0] * self.radius / (2 * fullRotatedCoordinates[0]))
+        if not frame.inDepth()[0]:
+            return OFFSCREEN
 
-        pygame.draw.circle(screen, self.col, coords, radius)
+        radius = self.projectedRadius(frame)
+        depth = frame.camera[:, 0]
+
+        buffer.circles(frame.screen, radius, depth, self.col, sphereRadii=self.radius)
 
         if self.outline[0]:
-            pygame.draw.circle(screen, self.outline[1], coords, radius, 1)
+            buffer.circles(frame.screen, radius, depth - self.radius, self.outline[1], width=1)  # At the front
 
-    def centre(self, scene):
-        return sum((self.pos[x] - scene.offset[x]) ** 2 for x in range(3))
+        return DRAWN
+
+    def submit(self, drawList, frame, key):
+        return self.submitMany(drawList, [self], [0], frame, [key])[0]
+
+    @classmethod
+    def submitMany(cls, drawList, objs, starts, frame, keys):
+        rows = np.asarray(starts, dtype=np.intp)
+        valid, inDepth = frame.valid[rows], frame.inDepth()[rows]
+        chosen = np.flatnonzero(inDepth)
+        rows, keys = rows[chosen], np.asarray(keys, dtype=float)[chosen]
+
+        radii = np.rint(frame.dim * np.array([objs[x].radius for x in chosen.tolist()]).reshape(-1) /
+                        (4 * frame.camera[rows, 0]))
+        drawList.circles(frame.screen[rows], radii, [objs[x].col for x in chosen.tolist()], keys)
+
+        outlined = np.array([objs[x].outline[0] for x in chosen.tolist()], dtype=bool)
+        drawList.circles(frame.screen[rows[outlined]], radii[outlined],
+                         [objs[x].outline[1] for x in chosen[outlined].tolist()], keys[outlined], width=1)
+
+        return [DRAWN if x else OFFSCREEN if y else BEHIND for x, y in zip(inDepth.tolist(), valid.tolist())]
+
+    def projectedRadius(self, frame):
+        return round(frame.dim * self.radius / (4 * frame.camera[0, 0]))
+
+    def centroid(self):
+        return self.pos
+
+
+class PointCloud(__SceneObject):
+    def __init__(self, positions, col=(0, 0, 0), size=2):
+        """
+
+        positions should be an (n, 3) array of coordinates, kept in one contiguous array rather than as Point objects.
+        col is either one colour or an (n, 3) array with a colour for each point. Each point is drawn as a dot of
+        radius size pixels, and all of them are splatted onto the screen at once.
+
+        """
+        super().__init__()
+        self.vertices = np.array(positions, dtype=float).reshape(-1, 3)
+        self.col = col
+        self.colours = np.broadcast_to(np.asarray(col, dtype=np.uint8), (len(self.vertices), 3))
+        self.size = size
+        self.pixelPadding = size + 1
+
+        if len(self.vertices) == 0:
+            raise ArgumentError('No points specified for PointCloud')
+
+        self.midpoint = self.vertices.mean(axis=0).tolist()
+
+    def __splat(self, frame):
+        """
 
+        Return the pixel coordinates, depths and colours covered by the points on the screen, furthest first.
 
-class Cube(__SceneObject):
+        """
+        shown = np.flatnonzero(frame.onScreen())
+        shown = shown[np.argsort(-frame.camera[shown, 0], kind='stable')]
+
+        dx, dy = footprint(self.size)
+        centres = np.rint(frame.screen[shown]).astype(np.intp)
+        xs = (centres[:, 0, None] + dx).ravel()
+        ys = (centres[:, 1, None] + dy).ravel()
+        inside = (xs >= 0) & (xs < frame.dim) & (ys >= 0) & (ys < frame.dim)
+
+        depths = np.repeat(frame.camera[shown, 0], len(dx))
+        colours = np.repeat(self.colours[shown], len(dx), axis=0)
+
+        return shown, xs[inside], ys[inside], depths[inside], colours[inside]
+
+    def draw(self, screen, frame):
+        shown, xs, ys, depths, colours = self.__splat(frame)
+
+        left, top, width, height = screen.get_clip()
+        inside = (xs >= left) & (xs < left + width) & (ys >= top) & (ys < top + height)
+
+        if inside.any():
+            pixels = pygame.surfarray.pixels3d(screen)
+            pixels[xs[inside], ys[inside]] = colours[inside]  # Furthest first, so nearer points are written last
+            del pixels  # Unlocks the surface
+
+        return self.__outcome(shown, frame)
+
+    def rasterize(self, buffer, frame):
+        shown, xs, ys, depths, colours = self.__splat(frame)
+        buffer.points(xs, ys, depths, colours)
+
+        return self.__outcome(shown, frame)
+
+    def submit(self, drawList, frame, key):
+        shown, xs, ys, depths, colours = self.__splat(frame)
+        drawList.pixels(xs, ys, colours, key)
+
+        return self.__outcome(shown, frame)
+
+    @staticmethod
+    def __outcome(shown, frame):
+        if len(shown):
+            return DRAWN
+
+        return OFFSCREEN if frame.valid.any() else BEHIND
+
+    def centroid(self):
+        return self.midpoint
+
+
+class Mesh(__SceneObject):
+    copies = 1  # Number of copies of the mesh drawn, each with its own row of colours when more than one
+    shading = FLAT  # How faces are lit when the scene has a Light: FLAT, GOURAUD, or None to leave them unlit
+    __faceData = (None, None)  # Version the cached face normals and colours were worked out for, and the cache
+
+    def __init__(self, vertices, faces=(), edges=(), col=(0, 0, 0), lines=(True, (0, 0, 0)),
+                 corners=(True, (0, 0, 0))):
+        """
+
+        vertices should be a sequence of (x, y, z) coordinates, stored once in a compact array.
+        faces is a sequence of vertex index triples and edges a sequence of vertex index pairs.
+
+        Faces are drawn in col. If lines[0], edges are drawn in lines[1]. If corners[0], every vertex is drawn in
+        corners[1]. Each shared vertex is transformed once per frame, however many faces and edges use it.
+
+        In scenes with a Light, faces are shaded as self.shading asks. Call markChanged() after changing it.
+
+        """
+        super().__init__()
+        self.vertices = np.asarray(vertices, dtype=float).reshape(-1, 3)  # Memory mapped arrays are not copied
+        self.faces = np.asarray(faces, dtype=np.intp).reshape(-1, 3)
+        self.edges = np.asarray(edges, dtype=np.intp).reshape(-1, 2)
+
+        if len(self.vertices) == 0:
+            raise ArgumentError('No vertices specified for Mesh')
+
+        if self.faces.size and (self.faces.min() < 0 or self.faces.max() >= len(self.vertices)) or \
+                self.edges.size and (self.edges.min() < 0 or self.edges.max() >= len(self.vertices)):
+            raise ArgumentError('Vertex index out of range for Mesh')
+
+        self.midpoint = self.vertices.mean(axis=0).tolist()
+
+        self.col = col
+        self.linesInfo = lines
+        self.cornersInfo = corners
+
+    @property
+    def vertexCount(self):
+        return len(self.vertices)
+
+    def centroid(self):
+        return self.midpoint
+
+    def getFaces(self, frame):
+        """
+
+        Return the faces to draw for this frame. Subclasses can override this to swap between versions of the mesh.
+
+        """
+        return self.faces
+
+    def facePlanes(self, faces=None):
+        """
+
+        Return the world space normals of the given faces, or of self.faces if None, and their distances along them
+        as (m, 3) and (m,) arrays, such that a face is seen from its front from p when normals @ p >= distances. The
+        normals are scaled by twice the faces' areas.
+
+        They are worked out once and cached until the mesh is marked as changed, so culling faces turned away from the
+        camera costs one matrix product per frame.
+
+        """
+        entry = self.__faceEntry(faces)
+
+        return entry[1], entry[2]
+
+    def faceColours(self, light, faces=None):
+        """
+
+        Return the colours of the corners of the given faces, or of self.faces if None, lit by light as self.shading
+        asks, as an (m, 3, 3) array. The colours for the last light used are cached like the normals.
+
+        """
+        entry = self.__faceEntry(faces)
+
+        if entry[3] is not light:
+            faces = entry[0]
+            base = np.asarray(self.col, dtype=np.uint8).reshape(-1, 3) if self.copies == 1 else \
+                self.colours[faces[:, 0] // (self.vertexCount // self.copies)]
+            base = np.broadcast_to(base, (len(faces), 3))
+
+            if self.shading is None:
+                colours = base[:, None]
+
+            elif self.shading == FLAT:
+                colours = light.shade(base, entry[1])[:, None]
+
+            elif self.shading == GOURAUD:
+                # Each vertex takes the sum of the normals of the faces around it, weighted by their areas
+                normals = np.stack([np.bincount(faces.ravel(), np.repeat(entry[1][:, x], 3), self.vertexCount)
+                                    for x in range(3)], axis=1)
+                colours = light.shade(np.repeat(base, 3, axis=0), normals[faces.ravel()]).reshape(-1, 3, 3)
+
+            else:
+                raise ArgumentError('Unknown shading {!r} for Mesh'.format(self.shading))
+
+            entry[3], entry[4] = light, np.broadcast_to(colours, (len(faces), 3, 3))
+
+        return entry[4]
+
+    def __faceEntry(self, faces):
+        """
+
+        Return the cached [faces, normals, distances, light, colours] for the given faces, worked out again after the
+        mesh is marked as changed.
+
+        """
+        version, cache = self.__faceData
+
+        if version != self.version:
+            cache = {}
+            self.__faceData = (self.version, cache)
+
+        key = None if faces is None else id(faces)  # The entry holds on to the faces, so the id can't be reused
+        entry = cache.get(key)
+
+        if entry is None:
+            if len(cache) >= _FACE_CACHE:
+                cache.clear()
+
+            faces = self.faces if faces is None else faces
+            corners = self.worldVertices()[faces]
+            normals = np.cross(corners[:, 2] - corners[:, 0], corners[:, 1] - corners[:, 0])
+            entry = cache[key] = [faces, normals, (normals * corners[:, 0]).sum(axis=1), None, None]
+
+        return entry
+
+    def facing(self, frame, faces=None):
+        """
+
+        Return a mask of the given faces, or of self.faces if None, seen from their fronts in a Frame of the mesh's
+        vertices.
+
+        """
+        if frame.eye is None:
+            return self.checkVisible(frame.camera[self.faces if faces is None else faces])
+
+        normals, distances = self.facePlanes(faces)
+
+        return normals @ frame.eye >= distances
+
+    def draw(self, screen, frame):
+        """
+
+        Faces, edges and corners are drawn furthest first, ordered by the distance of their centroids from the camera.
+
+        """
+        drawList, outcomes = meshPrimitives([self], [0], frame)
+        drawList.replay(screen)
+
+        return outcomes[0]
+
+    def submit(self, drawList, frame, key):
+        parts, outcomes = meshPrimitives([self], [0], frame)
+        drawList.extend(parts, key)
+
+        return outcomes[0]
+
+    def rasterize(self, buffer, frame):
+        camera = frame.camera
+        valid = frame.valid
+
+        faces = self.getFaces(frame)
+        chosen = None if type(self).getFaces is Mesh.getFaces else faces
+        index = np.flatnonzero(valid[faces].any(axis=1) & self.facing(frame, chosen))
+        faces = faces[index]
+        pieces, depths, kept = frame.clipTriangles(faces)
+
+        if frame.light is not None:
+            col = _pieceColours(self.faceColours(frame.light, chosen)[index[kept]], frame.needsClipping(faces)[kept])
+
+        else:
+            col = self.col if self.copies == 1 else self.colours[faces[kept, 0] // (len(frame) // self.copies)]
+
+        buffer.triangles(pieces, depths, col)
+        drawn = len(pieces)
+
+        if self.linesInfo[0]:
+            ends, depths, _ = frame.clipLines(self.edges[valid[self.edges].any(axis=1)])
+            buffer.lines(ends, depths, self.linesInfo[1])
+            drawn += len(ends)
+
+        if self.cornersInfo[0]:
+            corners = frame.onScreen()
+            buffer.circles(frame.screen[corners], 2, camera[corners, 0], self.cornersInfo[1])
+            drawn += corners.sum()
+
+        return self.__outcome(drawn, valid)
+
+    def __outcome(self, drawn, valid):
+        """
+
+        Summarise a mesh's faces, edges and corners as one reason for the scene's statistics.
+
+        """
+        if drawn:
+            return DRAWN
+
+        if not valid.any():
+            return BEHIND
+
+        return BACKFACE if len(self.faces) else OFFSCREEN
+
+    @staticmethod
+    def checkVisible(faceCoords):
+        """
+
+        Vectorised form of Triangle.checkVisible over an (m, 3, 3) array of camera space face coordinates.
+
+        """
+        c1 = faceCoords[:, 0]
+        normal = np.cross(faceCoords[:, 2] - c1, faceCoords[:, 1] - c1)
+
+        return (normal * -c1).sum(axis=1) >= 0
+
+
+def _pieceColours(colours, clipped):
+    """
+
+    Give the pieces of clipped faces, whose corners are not the faces' own, the average of their faces' corner colours.
+
+    """
+    if clipped.any():
+        colours = colours.copy()
+        colours[clipped] = np.rint(colours[clipped].mean(axis=1, keepdims=True))
+
+    return colours
+
+
+def meshPrimitives(meshes, starts, frame):
+    """
+
+    Gather the faces, edges and corners of several meshes whose vertices are held in one Frame, those of meshes[k]
+    starting at row starts[k], and decide their visibility and distance from the camera in one vectorised pass.
+
+    Returns a DrawList of the primitives to draw, keyed by minus their squared distance from the camera so the furthest
+    are drawn first, and the reason to count for each mesh. Scenes use this to merge the primitives of every mesh into
+    their own drawing order.
+
+    """
+    camera, valid = frame.camera, frame.valid
+    starts = np.asarray(starts, dtype=np.intp)
+    ends = starts + [x.vertexCount for x in meshes]
+
+    # Meshes only need their own Frame if they choose their faces per frame
+    chosen = [None if type(x).getFaces is Mesh.getFaces else x.getFaces(frame[s:e])
+              for x, s, e in zip(meshes, starts.tolist(), ends.tolist())]
+    faces = [x.faces if y is None else y for x, y in zip(meshes, chosen)]
+    lined = [k for k, x in enumerate(meshes) if x.linesInfo[0]]
+    cornered = [k for k, x in enumerate(meshes) if x.cornersInfo[0]]
+
+    faceCounts = [len(x) for x in faces]
+    edgeCounts = [len(meshes[k].edges) for k in lined]
+    faces = np.concatenate(faces + [np.empty((0, 3), dtype=np.intp)]) + np.repeat(starts, faceCounts)[:, None]
+    edges = np.concatenate([meshes[k].edges for k in lined] + [np.empty((0, 2), dtype=np.intp)]) + \
+        np.repeat(starts[lined], edgeCounts)[:, None]
+    corners = np.concatenate([np.arange(starts[k], ends[k]) for k in cornered] + [np.empty(0, dtype=np.intp)])
+
+    owners = [np.repeat(np.arange(len(meshes)), faceCounts), np.repeat(lined, edgeCounts),
+              np.repeat(cornered, ends[cornered] - starts[cornered])]
+    if frame.eye is None:
+        facing = Mesh.checkVisible(camera[faces])
+
+    else:  # With the normals cached by each mesh, faces are culled without touching their vertices
+        planes = [x.facePlanes(y) for x, y in zip(meshes, chosen)]
+        normals = np.concatenate([x[0] for x in planes] + [np.empty((0, 3))])
+        facing = normals @ frame.eye >= np.concatenate([x[1] for x in planes] + [np.empty(0)])
+
+    visible = [np.flatnonzero(valid[faces].any(axis=1) & facing),
+               np.flatnonzero(valid[edges].any(axis=1)),
+               np.flatnonzero(frame.onScreen()[corners])]
+    faces, edges, corners = (x[y] for x, y in zip((faces, edges, corners), visible))
+    owners = [x[y].astype(np.intp) for x, y in zip(owners, visible)]
+
+    # Faces and edges crossing the near or far plane or far off the screen are clipped, pieces keeping their keys
+    facePoints, _, pieces = frame.clipTriangles(faces)
+    edgePoints, _, segments = frame.clipLines(edges)
+    faces, edges = faces[pieces], edges[segments]
+    owners[:2] = owners[0][pieces], owners[1][segments]
+
+    copies = np.array([x.copies for x in meshes], dtype=np.intp)
+    colours = [np.array([x.col for x in meshes], dtype=np.uint8).reshape(-1, 3) if (copies == 1).all() else
+               np.concatenate([x.colours if x.copies != 1 else np.asarray(x.col, dtype=np.uint8).reshape(1, 3)
+                               for x in meshes]),
+               np.array([x.linesInfo[1] if x.linesInfo[0] else (0, 0, 0) for x in meshes], dtype=np.uint8),
+               np.array([x.cornersInfo[1] if x.cornersInfo[0] else (0, 0, 0) for x in meshes], dtype=np.uint8)]
+
+    # Faces of meshes drawn several times take the colour of the copy whose block of vertices they index
+    slots = owners[0] if (copies == 1).all() else \
+        np.cumsum(copies)[owners[0]] - copies[owners[0]] + \
+        (faces[:, 0] - starts[owners[0]]) // ((ends - starts) // copies)[owners[0]]
+
+    if frame.light is not None:
+        lit = np.concatenate([x.faceColours(frame.light, y) for x, y in zip(meshes, chosen)] +
+                             [np.empty((0, 3, 3), dtype=np.uint8)])
+        faceColours = _pieceColours(lit[visible[0][pieces]], frame.needsClipping(faces))
+
+    else:
+        faceColours = colours[0][slots]
+
+    drawList = DrawList()
+    drawList.triangles(facePoints, faceColours, -(camera[faces].mean(axis=1) ** 2).sum(axis=1))
+    drawList.lines(edgePoints, colours[1][owners[1]], -(camera[edges].mean(axis=1) ** 2).sum(axis=1))
+    drawList.circles(frame.screen[corners], 2, colours[2][owners[2]], -(camera[corners] ** 2).sum(axis=1))
+
+    drawn = np.bincount(np.concatenate(owners), minlength=len(meshes))
+    validCounts = np.concatenate([[0], np.cumsum(valid)])
+    anyValid = validCounts[ends] > validCounts[starts]
+    outcomes = [DRAWN if d else BACKFACE if n and v else OFFSCREEN if v else BEHIND
+                for d, v, n in zip(drawn.tolist(), anyValid.tolist(), faceCounts)]
+
+    return drawList, outcomes
+
+
+class Cube(Mesh):
     def __init__(self, topEdge1, topEdge2, leftEdge, col=(0, 0, 0), lines=(True, (0, 0, 0)),
                  corners=(True, (0, 0, 0))):
         """
@@ -329,7 +980,6 @@ class Cube(__SceneObject):
         leftEdge ---------------------
 
         """
-        super().__init__()
         topEdgeLength = sqrt(sum((topEdge1.pos[x] - topEdge2.pos[x]) ** 2 for x in range(3)))
         leftEdgeLength = sqrt(sum((topEdge1.pos[x] - leftEdge.pos[x]) ** 2 for x in range(3)))
 
@@ -370,8 +1020,6 @@ class Cube(__SceneObject):
 
         vertices = frontFace + backFace
 
-        self.midpoint = [(vertices[0][x] + vertices[6][x]) / 2 for x in range(3)]
-
         """
         
         From the order in this list, sets of indexes making valid triangles are:
@@ -395,8 +1043,6 @@ class Cube(__SceneObject):
         
         """
 
-        self.objs = []
-
         vertexList = [(0, 1, 3),
                       (1, 2, 3),
                       (1, 5, 2),
@@ -410,10 +1056,6 @@ class Cube(__SceneObject):
                       (5, 4, 6),
                       (4, 7, 6)]
 
-        for x in vertexList:
-            self.objs.append(Triangle(*[Point(*vertices[x[y]]) for y in range(3)],
-                                      col=col, lines=(False, None), corners=(False, None)))
-
         lineList = [(0, 1),
                     (1, 2),
                     (2, 3),
@@ -427,26 +1069,9 @@ class Cube(__SceneObject):
                     (6, 7),
                     (7, 4)]
 
-        if lines[0]:
-            for x in lineList:
-                self.objs.append(Line(Point(*vertices[x[0]]), Point(*vertices[x[1]]), col=lines[1], ends=(False, None)))
+        super().__init__(vertices, vertexList, lineList, col=col, lines=lines, corners=corners)
 
-        if corners[0]:
-            for x in vertices:
-                self.objs.append(Point(*x, col=corners[1]))
-
-        self.col = col
-        self.linesInfo = lines
-        self.cornersInfo = corners
-
-    def centre(self, scene):
-
-        return sum((self.midpoint[x] - scene.offset[x]) ** 2 for x in range(3))
-
-    def draw(self, screen, pointMap, offset, rot):
-        s = _OffsetHolder(offset)
-        for x in sorted(self.objs, key=lambda element: element.centre(s), reverse=True):
-            x.draw(screen, pointMap, offset, rot)
+        self.midpoint = [(vertices[0][x] + vertices[6][x]) / 2 for x in range(3)]
 
 
-COMPOSITE = (Triangle,)
+COMPOSITE = (Mesh,)  # Objects whose primitives scenes merge into their drawing order, through meshPrimitives()
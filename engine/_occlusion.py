@@ -0,0 +1,70 @@
+import numpy as np
+
+OCCLUSION_TILE = 8  # Side in pixels of the squares covered by the finest level of a DepthPyramid
+
+
+class DepthPyramid:
+    def __init__(self, depth, tile=OCCLUSION_TILE):
+        """
+
+        Coarse hierarchical depth buffer built from the depth array of a DepthBuffer, which holds 1 / depth indexed
+        [x, y] with 0 where nothing has been drawn. Each texel of the first level holds the smallest value, so the
+        furthest depth, of a tile x tile square of pixels, and each further level the smallest of 2x2 texels of the one
+        before, down to a single texel.
+
+        Whether something nearer covers all of a box on the screen is then found from at most 2x2 texels, of the
+        level whose texels are about the size of the box.
+
+        """
+        self.tile = tile
+        self.levels = [self.__reduce(depth, tile)]
+
+        while max(self.levels[-1].shape) > 1:
+            self.levels.append(self.__reduce(self.levels[-1], 2))
+
+    @staticmethod
+    def __reduce(values, size):
+        """
+
+        Return the smallest value in each size x size square of values. Squares running past the edge only hold the
+        values inside it, as boxes tested never reach beyond the screen.
+
+        """
+        w, h = -(-values.shape[0] // size), -(-values.shape[1] // size)
+
+        if values.shape != (w * size, h * size):
+            padded = np.full((w * size, h * size), np.inf)
+            padded[:values.shape[0], :values.shape[1]] = values
+            values = padded
+
+        return values.reshape(w, size, h, size).min(axis=(1, 3))
+
+    def occludes(self, boxes, depths):
+        """
+
+        Return a mask of which of the (n, 4) array of pixel boxes (minX, minY, maxX, maxY) inside the screen are hidden
+        behind what has been drawn, for objects no nearer than the matching depths in the (n,) array depths. Empty
+        boxes and depths reaching the camera are never hidden.
+
+        """
+        boxes, depths = np.asarray(boxes, dtype=float).reshape(-1, 4), np.asarray(depths, dtype=float)
+        first = np.floor(boxes[:, :2]).astype(np.intp)
+        last = np.ceil(boxes[:, 2:]).astype(np.intp) - 1  # Last pixel each box covers
+
+        remaining = (last >= first).all(axis=1) & (depths > 0)
+        tested = remaining.copy()
+        furthest = np.zeros(len(boxes))  # 1 / depth of the furthest pixel each box may show
+
+        for k, level in enumerate(self.levels):
+            size = self.tile << k
+            lo, hi = first // size, last // size
+            fits = remaining & (hi - lo <= 1).all(axis=1)
+
+            if fits.any():
+                (x0, y0), (x1, y1) = lo[fits].T, hi[fits].T
+                furthest[fits] = np.minimum(np.minimum(level[x0, y0], level[x1, y0]),
+                                            np.minimum(level[x0, y1], level[x1, y1]))
+                remaining &= ~fits
+
+        # The box is hidden if its object's nearest point is further away than the furthest pixel it could show
+        return tested & (furthest * depths > 1)
@@ -0,0 +1,174 @@
+import numpy as np
+
+from engine._error import *
+from engine._lazy import LazyModule
+from engine._scene import Scene
+from engine._scenefile import sceneBytes, readScene
+
+multiprocessing = LazyModule('multiprocessing', 'rendering in parallel')
+shared_memory = LazyModule('multiprocessing.shared_memory', 'rendering in parallel')
+
+_worker = None  # Per process state, set up once by _initWorker
+
+
+class _WorkerScene(Scene):
+    def __init__(self, objs, vertices, starts, dim, background, depthBuffer, batch, near, far, occlusion, light, cull):
+        """
+
+        Headless copy of a scene inside a worker process. Its vertices are read from shared memory rather than gathered
+        from its objects.
+
+        """
+        super().__init__(*objs, screenDim=dim, background=background, depthBuffer=depthBuffer, headless=True,
+                         batch=batch, near=near, far=far, occlusion=occlusion, light=light, cull=cull)
+        self.__vertices = vertices
+        self.__starts = starts
+
+    def gatherVertices(self):
+        return self.__vertices, self.__starts
+
+
+def _attach(name, shape, dtype):
+    memory = shared_memory.SharedMemory(name=name)
+    return memory, np.ndarray(shape, dtype=dtype, buffer=memory.buf)
+
+
+def _initWorker(objs, vertexInfo, starts, outputInfo, dim, background, depthBuffer, batch, near, far, occlusion, light,
+                cull):
+    """
+
+    Runs once in each worker. Objects are only sent once per worker (or not at all if the process is forked), and the
+    vertex array and output frames live in shared memory, so tasks only carry camera poses.
+
+    If objs is the name and size of a shared memory block instead, the objects are read from the scene file saved in
+    it, which is much quicker than unpickling them in every worker.
+
+    """
+    global _worker
+
+    vertexMemory, vertices = _attach(*vertexInfo)
+    outputMemory, output = _attach(*outputInfo)
+    sceneMemory = None
+
+    if isinstance(objs, tuple):
+        sceneMemory = shared_memory.SharedMemory(name=objs[0])
+        objs = readScene(sceneMemory.buf[:objs[1]])[0]
+
+    scene = _WorkerScene(objs, vertices, starts, dim, background, depthBuffer, batch, near, far, occlusion, light, cull)
+    _worker = (scene, output, vertexMemory, outputMemory, sceneMemory)  # Memory handles are kept alive with the arrays
+
+
+def _renderFrames(task):
+    scene, output = _worker[:2]
+
+    for index, offset, rot in task:
+        scene.offset = list(offset)
+        scene.rot = list(rot)
+        scene.draw()
+        output[index] = scene.getArray()
+
+
+def _renderStrip(task):
+    scene, output = _worker[:2]
+    offset, rot, top, bottom = task
+
+    rect = (0, top, scene.dim, bottom - top)
+    scene.screen.set_clip(rect)
+    if scene.depthBuffer is not None:
+        scene.depthBuffer.setClip(rect)
+    scene.invalidate()  # The cached frame was drawn for another strip
+
+    scene.offset = list(offset)
+    scene.rot = list(rot)
+    scene.draw()
+    output[0, top:bottom] = scene.getArray()[top:bottom]
+
+
+def _run(scene, count, tasks, function, processes):
+    """
+
+    Share the scene's vertices and an output array of count frames with a pool of workers, map function over tasks and
+    return a copy of the composited frames.
+
+    """
+    vertices, starts = scene.gatherVertices()
+    shape = (count, scene.dim, scene.dim, 3)
+
+    vertexMemory = shared_memory.SharedMemory(create=True, size=max(vertices.nbytes, 1))
+    outputMemory = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)), 1))
+    sceneMemory = None
+
+    try:
+        np.ndarray(vertices.shape, dtype=vertices.dtype, buffer=vertexMemory.buf)[:] = vertices
+        output = np.ndarray(shape, dtype=np.uint8, buffer=outputMemory.buf)
+        objs = scene.objs
+
+        # Forked workers inherit the objects for free. Others read them from a scene file in shared memory when every
+        # object can be saved in one, and have them pickled otherwise.
+        if multiprocessing.get_start_method() != 'fork':
+            try:
+                data = sceneBytes(scene)
+
+            except ArgumentError:
+                pass
+
+            else:
+                sceneMemory = shared_memory.SharedMemory(create=True, size=max(len(data), 1))
+                sceneMemory.buf[:len(data)] = data
+                objs = (sceneMemory.name, len(data))
+
+        initArgs = (objs, (vertexMemory.name, vertices.shape, vertices.dtype), starts,
+                    (outputMemory.name, shape, np.uint8), scene.dim, scene.background, scene.depthBuffer is not None,
+                    scene.batch, scene.near, scene.far, scene.occlusion, scene.light, scene.cull)
+
+        with multiprocessing.Pool(processes, initializer=_initWorker, initargs=initArgs) as pool:
+            pool.map(function, tasks)
+
+        frames = output.copy()
+        del output
+
+    finally:
+        for memory in (vertexMemory, outputMemory, sceneMemory):
+            if memory is not None:
+                memory.close()
+                memory.unlink()
+
+    return frames
+
+
+def renderParallel(scene, poses, processes=None):
+    """
+
+    Render one frame for each camera pose (offset, rot) in poses across a pool of processes, splitting by frame.
+    Returns a (len(poses), screenDim, screenDim, 3) uint8 array, with frames in the same format as Scene.getArray().
+
+    processes defaults to the number of CPUs. The scene itself is not modified.
+
+    """
+    poses = [(list(offset), list(rot)) for offset, rot in poses]
+    processes = processes or multiprocessing.cpu_count()
+
+    indexed = [(i, offset, rot) for i, (offset, rot) in enumerate(poses)]
+    size = max(len(indexed) // (processes * 4), 1)  # A few chunks per process to balance uneven frames
+    tasks = [indexed[x:x + size] for x in range(0, len(indexed), size)]
+
+    return _run(scene, len(poses), tasks, _renderFrames, processes)
+
+
+def renderTiled(scene, processes=None, strips=None):
+    """
+
+    Render the scene's current view across a pool of processes, each rasterizing horizontal strips of the screen.
+    Every worker transforms the whole scene but only draws inside its own strip; the strips are composited into a
+    single (screenDim, screenDim, 3) uint8 frame. Without a depth buffer, antialiased lines crossing a strip edge may
+    differ from a single process render by a pixel.
+
+    """
+    processes = processes or multiprocessing.cpu_count()
+    strips = strips or processes
+    edges = np.linspace(0, scene.dim, strips + 1).astype(int).tolist()
+
+    tasks = [(list(scene.offset), list(scene.rot), edges[x], edges[x + 1])
+             for x in range(strips) if edges[x] < edges[x + 1]]
+
+    return _run(scene, 1, tasks, _renderStrip, processes)[0]
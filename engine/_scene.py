@@ -1,95 +1,747 @@
-from math import sin, cos, pi
+import numpy as np
 
-import pygame
+from engine._bvh import BoundingVolumeHierarchy
+from engine._camera import Camera
+from engine._clip import NEAR_PLANE
+from engine._drawlist import DrawList
+from engine._lazy import pygame
+from engine._obj import changeCount, meshPrimitives, COMPOSITE
+from engine._occlusion import DepthPyramid
+from engine._stats import FRUSTUM, OCCLUDED
+from engine._transform import Frame
+from engine._zbuffer import DepthBuffer, LINE_BIAS
 
+CULL_MARGIN = 4  # Pixels
+DIRTY_LIMIT = 0.5  # Fraction of the screen changed objects may cover before the whole screen is redrawn instead
+OCCLUSION_BATCH = 16  # Objects drawn before the occlusion test is first updated, doubling for each batch after
+OCCLUDERS = 8  # Objects rasterized to hide the others when occlusion culling without a depth buffer
+OCCLUDER_AREA = 0.01  # Fraction of the screen an object's bounds must cover for it to be one of them
 
-class _OffsetHolder:
-    def __init__(self, offset):
+
+class Scene:
+    def __init__(self, *args, screenDim=0, background=(255, 255, 255), depthBuffer=False, headless=False, cull=True,
+                 batch=False, near=NEAR_PLANE, far=None, light=None, occlusion=False):
         """
 
-        Holder offset so that object.offset contains a list/tuple of length 3, for use with composite body rasterizing.
+        If depthBuffer is True, objects are written into a DepthBuffer and depth tested per pixel rather than drawn in
+        sorted order, which is correct for intersecting objects and needs no sorting each frame. Its triangles are
+        rasterized with NumPy in batches, which is the quickest way to draw large meshes.
 
-        """
-        self.offset = offset
+        If headless is True, the scene draws to an offscreen surface and never initialises a display, so it can run on
+        machines without one. Use getArray() or renderFrames() to read the results. Either way, pygame is only imported
+        and the display or surface created when the scene first draws, so scenes only used to build and transform
+        geometry never need it.
 
+        If cull is True, objects are kept in a BoundingVolumeHierarchy and only objects whose bounding boxes reach into
+        the camera's view are transformed and drawn.
 
-class Scene:
-    def __init__(self, *args, screenDim=0, background=(255, 255, 255)):
+        If batch is True and there is no depth buffer, every primitive of a frame is gathered into a DrawList and
+        rasterized with NumPy in a few passes, rather than with a pygame call each. This pays off for many small
+        primitives, while a few large filled ones are quicker through pygame. Lines are then not antialiased.
+
+        near and far are the depths of the clipping planes, with far None for no far plane. Triangles and lines crossing
+        them are clipped and drawn in part, and objects beyond the far plane are not drawn.
+
+        light is a Light shading the faces of Meshes as their shading attributes ask, or None to draw every face in its
+        own colour. Faces turned away from the camera are culled with normals each mesh works out once and caches.
+
+        If occlusion is True, objects hidden behind nearer ones are not drawn. Their screen bounds and nearest depths
+        are tested against a coarse DepthPyramid of the objects hiding them. With a depth buffer, those are all the
+        objects drawn so far: the ones not hidden last frame go first, then the rest nearest first. Otherwise, only the
+        nearest few objects with large bounds are rasterized into a private depth buffer to hide the others. This pays
+        off for scenes of many objects that mostly hide each other, such as rooms and buildings. As objects are drawn
+        in another order, coplanar faces of different objects may come out the other way round.
+
+        The viewpoint is held in self.camera, a Camera. self.offset, self.rot, self.near and self.far are shortcuts to
+        its attributes.
+
+        """
+        self.camera = Camera(dim=screenDim, near=near, far=far)
         self.objs = list(args)
         self.background = background
-        self.offset = [0.0, 0.0, 0.0]
-        self.rot = [0.0, 0.0]
         self.dim = screenDim
-        self.pointMap = lambda point: (self.dim * (1 + point[0]) / 2, self.dim * (1 - point[1]) / 2)
-        self.screen = pygame.display.set_mode((screenDim, screenDim))
+        self.headless = headless
+        self.__screen = None  # Created on first use
+        self.depthBuffer = DepthBuffer(screenDim) if depthBuffer else None
+        self.cull = cull
+        self.batch = batch
+        self.light = light
+        self.occlusion = occlusion
+        self.stats = None  # Set to a FrameStats to instrument draw()
+
+        # Caches reused between frames while the camera and objects are unchanged
+        self.__objs = None
+        self.__vertices = self.__starts = self.__frame = self.__fresh = None
+        self.__centroids = self.__composite = self.__paddings = None
+        self.__index = None
+        self.__visible = self.__visibleKey = None
+        self.__frames = {}
+        self.__pose = None
+        self.__seen = 0
+        self.__geometry = 0  # Incremented whenever any object's vertices change
+        self.__order = self.__orderKey = self.__distances = None
+        self.__drawn = None
+        self.__changed = None  # Indexes of the objects changed since the last frame drawn, or None to redraw them all
+        self.__dirty = []  # Screen boxes the changed objects were last drawn in
+        self.__scratch = None
+        self.__shown = None  # Whether each object was left unhidden by the last occlusion test of it
+        self.__occluders = None  # Private DepthBuffer for occlusion culling without a depth buffer
 
     def draw(self):
         """
 
         For each object in self.objs, draw to the screen in reverse order of distance away from the camera.
+        The faces, edges and corners of composite objects such as Meshes are sorted among the other objects one by one.
+        With a depth buffer, objects are rasterized in any order and the buffer is blitted to the screen once.
+
+        If the camera, background and objects are all unchanged since the last call, the screen already holds the frame
+        and nothing is drawn. Call invalidate() after drawing over the screen yourself.
+
+        If only some objects have been marked as changed and the camera is still, only the parts of the screen they
+        covered before and cover now are cleared, and only the objects reaching into those parts are drawn again.
+
+        Returns the list of pygame.Rects of the screen that were drawn, which is empty if nothing was, so the display
+        can be updated with pygame.display.update(rects) rather than a full flip.
+
+        If self.stats is a FrameStats, each stage is timed, its callbacks are fired, and the reason each object was or
+        was not drawn is counted.
+
+        """
+        stats = self.stats
+
+        if stats is not None:
+            stats.beginFrame()
+            stats.enter(self, 'transform')
+
+        visible, frames = self.__transformObjects()
+
+        state = (self.__pose, self.__geometry, tuple(self.background), self.depthBuffer, self.cull, self.batch,
+                 self.light, self.occlusion)
+        if state == self.__drawn:
+            if stats is not None:
+                stats.leave(self, 'transform')
+                stats.endFrame(drawn=False)
+            return []
+
+        rects = self.__dirtyRects(state, visible)
+        self.__drawn = state
+        self.__changed, self.__dirty = set(), []
+
+        if stats is not None:
+            stats.leave(self, 'transform')
+            stats.count(FRUSTUM, len(self.objs) - len(visible))
+
+        if rects is None:
+            rects = [pygame.Rect(self.screen.get_clip())]
+            self.__drawObjects(visible, frames)
+
+        else:
+            boxes = self.__screenBoxes(visible)
+            inside = np.zeros(len(visible), dtype=bool)
+
+            for rect in rects:
+                inside |= (boxes[:, 0] < rect.right) & (boxes[:, 2] > rect.left) & \
+                          (boxes[:, 1] < rect.bottom) & (boxes[:, 3] > rect.top)
+
+            # The objects are drawn whole onto a scratch surface, as clipping lines shifts their pixels, and only the
+            # changed rectangles are copied back
+            if self.__scratch is None or self.__scratch.get_size() != self.screen.get_size():
+                self.__scratch = pygame.Surface(self.screen.get_size())
+
+            screen, self.screen = self.screen, self.__scratch
+
+            try:
+                self.__drawObjects(visible[inside], frames)
+
+            finally:
+                self.screen = screen
+
+            for rect in rects:
+                self.screen.blit(self.__scratch, rect, rect)
+
+        if stats is not None:
+            stats.endFrame()
+
+        return rects
+
+    def __drawObjects(self, visible, frames):
+        """
+
+        Clear the screen and draw the objects at the given indexes.
+
+        """
+        stats = self.stats
+
+        if stats is not None:
+            stats.enter(self, 'sort')
+
+        drawList = None
+
+        if self.occlusion and self.depthBuffer is None:
+            visible = self.__cullBehindOccluders(visible, frames)
+
+        if self.depthBuffer is not None:
+            objs = [] if self.occlusion else [self.objs[x] for x in visible.tolist()]
+
+        else:
+            order = self.__sortObjects()
+            mask = np.zeros(len(self.objs), dtype=bool)
+            mask[visible] = True
+            indexes = order[mask[order]]
+
+            if self.batch or self.__composite[indexes].any():
+                drawList, objs = self.__buildDrawList(indexes, frames), []
+
+            else:
+                objs = [self.objs[x] for x in indexes.tolist()]
+
+        if stats is not None:
+            stats.leave(self, 'sort')
+            stats.enter(self, 'raster')
+
+        if self.depthBuffer is not None:
+            self.depthBuffer.clear(self.background)
+            draw, target = 'rasterize', self.depthBuffer
+
+            if self.occlusion:
+                self.__cullOccluded(visible, frames)
+
+        else:
+            self.screen.fill(self.background)
+            draw, target = 'draw', self.screen
+
+        if stats is None:
+            for x in objs:
+                getattr(x, draw)(target, frames[id(x)])
+
+        else:
+            for x in objs:
+                stats.count(getattr(x, draw)(target, frames[id(x)]))
+
+        if drawList is not None:
+            reasons = drawList.render(self.screen) if self.batch else drawList.replay(self.screen)
+
+            if stats is not None:
+                for reason in reasons:
+                    stats.count(reason)
+
+        if self.depthBuffer is not None:
+            self.depthBuffer.blit(self.screen)
+
+        if stats is not None:
+            stats.leave(self, 'raster')
+
+    def __cullOccluded(self, visible, frames):
+        """
+
+        Rasterize the objects at the given indexes into the depth buffer, skipping those hidden behind the ones drawn
+        before them.
+
+        The objects left unhidden last frame are drawn first. The rest follow in order of nearest depth, in batches
+        doubling in size from OCCLUSION_BATCH, and each batch is tested against a DepthPyramid of everything drawn
+        before it. Once all are drawn, every object is tested against the finished buffer to decide which go first
+        next frame.
+
+        """
+        stats, buffer = self.stats, self.depthBuffer
+        boxes, nearest = self.__screenBoxes(visible, nearest=True)
+        depths = nearest / (1 + LINE_BIAS)  # Lines and points are drawn slightly nearer than they are
+
+        shown = self.__shown[visible]
+        rest = np.flatnonzero(~shown)
+        rest = rest[np.argsort(nearest[rest], kind='stable')]
+
+        batches = [np.flatnonzero(shown)]
+        start, size = 0, OCCLUSION_BATCH
+        while start < len(rest):
+            batches.append(rest[start:start + size])
+            start, size = start + size, size * 2
+
+        drawn = np.zeros(len(visible), dtype=bool)
+
+        for i, batch in enumerate(batches):
+            if i:
+                buffer.flush()
+                batch = batch[~DepthPyramid(buffer.depth).occludes(boxes[batch], depths[batch])]
+
+            for x in visible[batch].tolist():
+                reason = self.objs[x].rasterize(buffer, frames[id(self.objs[x])])
+
+                if stats is not None:
+                    stats.count(reason)
+
+            drawn[batch] = True
+
+        buffer.flush()
+        self.__shown[visible] = ~DepthPyramid(buffer.depth).occludes(boxes, depths)
+
+        if stats is not None:
+            stats.count(OCCLUDED, len(visible) - int(drawn.sum()))
 
+    def __cullBehindOccluders(self, visible, frames):
         """
 
-        self.screen.fill(self.background)
+        Return the indexes of the objects at the given indexes that are not hidden behind the nearest OCCLUDERS objects
+        whose screen bounds cover at least OCCLUDER_AREA of the screen. Those are rasterized into a private DepthBuffer,
+        which is much cheaper than rasterizing every object when the scene has no depth buffer of its own.
+
+        """
+        boxes, nearest = self.__screenBoxes(visible, nearest=True)
+        area = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+
+        occluders = np.flatnonzero((area >= OCCLUDER_AREA * self.dim ** 2) & (nearest > 0))
+        occluders = occluders[np.argsort(nearest[occluders], kind='stable')[:OCCLUDERS]]
+
+        if not len(occluders):
+            return visible
+
+        if self.__occluders is None or self.__occluders.dim != self.dim:
+            self.__occluders = DepthBuffer(self.dim)
+
+        buffer = self.__occluders
+        buffer.setClip(self.screen.get_clip())
+        buffer.clear(self.background)
+
+        for x in visible[occluders].tolist():
+            self.objs[x].rasterize(buffer, frames[id(self.objs[x])])
+
+        buffer.flush()
+        hidden = DepthPyramid(buffer.depth).occludes(boxes, nearest / (1 + LINE_BIAS))
+        hidden[occluders] = False
+
+        if self.stats is not None:
+            self.stats.count(OCCLUDED, int(hidden.sum()))
+
+        return visible[~hidden]
+
+    def __dirtyRects(self, state, visible):
+        """
+
+        Return the merged screen rectangles to redraw for the objects changed since the last frame drawn, or None if
+        the whole screen must be redrawn because anything else has changed or the changes cover too much of it.
+
+        """
+        if self.__drawn is None or self.__changed is None or state[:1] + state[2:] != self.__drawn[:1] + \
+                self.__drawn[2:]:
+            return None
+
+        changed = np.array(sorted(self.__changed), dtype=np.intp)
+        changed = changed[np.isin(changed, visible)]
+        boxes = np.concatenate(self.__dirty + [self.__screenBoxes(changed)])
+
+        # Boxes are merged while any two overlap, leaving a few disjoint rectangles to redraw
+        rects = []
+        boxes = np.concatenate([np.floor(boxes[:, :2]), np.ceil(boxes[:, 2:])], axis=1).astype(int)
+        for box in boxes.tolist():
+            rect = pygame.Rect(box[0], box[1], box[2] - box[0], box[3] - box[1]).clip(self.screen.get_clip())
+
+            if not rect.width or not rect.height:
+                continue
+
+            while True:
+                touching = rect.collidelist(rects)
+                if touching < 0:
+                    break
+
+                rect = rect.union(rects.pop(touching))
+
+            rects.append(rect)
+
+        if sum(x.width * x.height for x in rects) > DIRTY_LIMIT * self.dim ** 2:
+            return None
+
+        return rects
+
+    def __screenBoxes(self, indexes, nearest=False):
+        """
+
+        Return the pixel bounding boxes (minX, minY, maxX, maxY) of the objects at the given indexes in the scene's
+        Frame, widened by how far each draws past its vertices. Objects with any vertex behind the near plane may
+        reach anywhere, so they cover the whole screen.
+
+        If nearest is True, also return the depth of the nearest point of each object, less its world padding.
+
+        """
+        if not len(indexes):
+            return (np.empty((0, 4)), np.empty(0)) if nearest else np.empty((0, 4))
+
+        starts = np.asarray(self.__starts, dtype=np.intp)
+        counts = starts[indexes + 1] - starts[indexes]
+        first = np.cumsum(counts) - counts
+        rows = self.__rows(indexes)
+
+        screen, depth = self.__frame.screen[rows], self.__frame.camera[rows, 0]
+        closest = np.minimum.reduceat(depth, first)
+        padding, pixels = self.__paddings[indexes].T
+
+        # World padding such as sphere radii is projected at the object's nearest depth, at the screen's full scale
+        with np.errstate(divide='ignore', invalid='ignore'):
+            widening = pixels + self.dim * padding / (2 * closest)
+
+        boxes = np.concatenate([np.minimum.reduceat(screen, first) - widening[:, None],
+                                np.maximum.reduceat(screen, first) + widening[:, None]], axis=1)
+        boxes[closest < self.near] = (0, 0, self.dim, self.dim)
+
+        return (boxes.clip(0, self.dim), closest - padding) if nearest else boxes.clip(0, self.dim)
+
+    def getArray(self):
+        """
+
+        Return a copy of the last drawn frame as a (screenDim, screenDim, 3) uint8 array, indexed [row, column].
+
+        """
+        return pygame.surfarray.array3d(self.screen).transpose(1, 0, 2).copy()
+
+    def renderFrames(self, poses):
+        """
 
-        o = self.__sortObjects()
+        Generator drawing one frame for each camera pose (offset, rot) in poses and yielding it from getArray().
 
-        for x in o:
-            x.draw(self.screen, self.pointMap, self.offset, self.rot)
+        Frames are produced one at a time, so long camera paths can be streamed without holding every frame in memory.
+        The camera is returned to its original pose afterwards.
+
+        """
+        offset, rot = self.offset, self.rot
+
+        try:
+            for poseOffset, poseRot in poses:
+                self.offset = list(poseOffset)
+                self.rot = list(poseRot)
+                self.draw()
+
+                yield self.getArray()
+
+        finally:
+            self.offset, self.rot = offset, rot
+
+    def saveFrames(self, poses, path):
+        """
+
+        Draw one frame for each camera pose and save it as an image to path.format(index), e.g. 'frame{:04d}.png'.
+        Returns the list of file names written.
+
+        """
+        names = []
+        offset, rot = self.offset, self.rot
+
+        try:
+            for i, (poseOffset, poseRot) in enumerate(poses):
+                self.offset = list(poseOffset)
+                self.rot = list(poseRot)
+                self.draw()
+
+                names.append(path.format(i))
+                pygame.image.save(self.screen, names[-1])
+
+        finally:
+            self.offset, self.rot = offset, rot
+
+        return names
+
+    @property
+    def screen(self):
+        """
+
+        The surface the scene draws to: the display, or an offscreen surface if headless. May be replaced with any
+        surface of the same size.
+
+        """
+        if self.__screen is None:
+            self.__screen = pygame.Surface((self.dim, self.dim)) if self.headless else \
+                pygame.display.set_mode((self.dim, self.dim))
+
+        return self.__screen
+
+    @screen.setter
+    def screen(self, screen):
+        self.__screen = screen
+
+    @property
+    def offset(self):
+        return self.camera.offset
+
+    @offset.setter
+    def offset(self, offset):
+        self.camera.offset = offset
+
+    @property
+    def rot(self):
+        return self.camera.rot
+
+    @rot.setter
+    def rot(self, rot):
+        self.camera.rot = rot
+
+    @property
+    def near(self):
+        return self.camera.near
+
+    @property
+    def far(self):
+        return self.camera.far
+
+    def invalidate(self):
+        """
+
+        Force the next call to draw() to redraw the whole screen.
+
+        """
+        self.__drawn = None
+
+    def __transformObjects(self):
+        """
+
+        Gather the vertices of every object into one contiguous array and transform and project them in one batch.
+        Returns the sorted indexes of the objects in view, and a dictionary from the id of each of those objects to the
+        Frame holding its own vertices.
+
+        The gathered array and its transformed Frame are cached. They are rebuilt when self.objs changes, and when only
+        some objects have been marked as changed, just their vertices are copied and transformed again. Vertices are
+        only transformed for objects in view that have not been transformed for the current camera yet.
+
+        """
+        pose = (tuple(self.offset), tuple(self.rot), self.near, self.far)
+
+        if self.objs != self.__objs:
+            previous = self.__objs
+            self.__objs = list(self.objs)
+            self.__gather()
+
+            if not self.cull:
+                self.__index = None
+
+            elif self.__index is not None and previous and self.objs[:len(previous)] == previous:
+                self.__index.extend(*self.__bounds(np.arange(len(previous), len(self.objs))))
+
+            else:
+                self.__index = BoundingVolumeHierarchy(*self.__bounds(np.arange(len(self.objs))))
+
+            self.__seen = changeCount()
+            self.__geometry += 1
+            self.__changed = None
+
+        elif changeCount() != self.__seen:
+            starts = self.__starts
+            stale = [i for i, x in enumerate(self.objs) if x.version > self.__seen]
+            self.__seen = changeCount()
+
+            if stale:
+                self.__geometry += 1
+
+                if any(len(self.objs[i].vertices) != starts[i + 1] - starts[i] for i in stale):
+                    self.__gather()
+                    self.__changed = None
+
+                else:
+                    # Where they were drawn is worked out before their rows of the Frame are transformed again
+                    if self.__changed is not None:
+                        drawn = [i for i in stale if self.__fresh[i]]
+                        self.__dirty.append(self.__screenBoxes(np.array(drawn, dtype=np.intp)))
+                        self.__changed.update(stale)
+
+                    for i in stale:
+                        self.__vertices[starts[i]:starts[i + 1]] = self.objs[i].worldVertices()
+                        self.__centroids[i] = self.objs[i].worldCentroid()
+                        self.__paddings[i] = (self.objs[i].padding, self.objs[i].pixelPadding)
+                    self.__fresh[stale] = False
+
+                if self.__index is not None:
+                    self.__index.update(stale, *self.__bounds(np.array(stale)))
+
+        if pose != self.__pose:
+            self.__fresh[:] = False
+            self.__frame.near, self.__frame.far = self.near, self.far
+            self.__frame.eye = np.array(self.offset, dtype=float)
+            self.__pose = pose
+
+        if (pose, self.__geometry, self.cull, self.light) != self.__visibleKey:
+            if self.cull and self.__index is None:
+                self.__index = BoundingVolumeHierarchy(*self.__bounds(np.arange(len(self.objs))))
+
+            if self.cull:
+                # Widened by a few pixels, as rounding, antialiasing and corner circles reach past the screen edge
+                visible = self.__index.query(*self.camera.frustum(CULL_MARGIN * 2 / max(self.dim, 1)))
+
+            else:
+                visible = np.arange(len(self.objs))
+
+            need = visible[~self.__fresh[visible]]
+            rows = self.__rows(need)
+            part = self.camera.frame(self.__vertices[rows])
+            self.__frame.camera[rows] = part.camera
+            self.__frame.screen[rows] = part.screen
+            self.__frame.valid[rows] = part.valid
+            self.__frame.unclipped[rows] = part.unclipped
+            self.__fresh[need] = True
+
+            starts = self.__starts
+            self.__frame.light = self.light
+            self.__frames = {id(self.objs[i]): self.__frame[starts[i]:starts[i + 1]] for i in visible.tolist()}
+            self.__visible = visible
+            self.__visibleKey = (pose, self.__geometry, self.cull, self.light)
+
+        return self.__visible, self.__frames
+
+    def __gather(self):
+        """
+
+        Gather every object's vertices again and allocate a Frame for them, with nothing transformed yet.
+
+        """
+        self.__vertices, self.__starts = self.gatherVertices()
+        count = len(self.__vertices)
+
+        self.__frame = Frame(np.zeros((count, 3)), np.zeros((count, 2)), np.zeros(count, dtype=bool), self.dim,
+                             self.near, self.far, eye=np.array(self.offset, dtype=float))
+        self.__fresh = np.zeros(len(self.objs), dtype=bool)
+        self.__shown = np.zeros(len(self.objs), dtype=bool)
+
+        self.__centroids = np.array([x.worldCentroid() for x in self.objs], dtype=float).reshape(-1, 3)
+        self.__composite = np.array([isinstance(x, COMPOSITE) for x in self.objs], dtype=bool)
+        self.__paddings = np.array([(x.padding, x.pixelPadding) for x in self.objs], dtype=float).reshape(-1, 2)
+
+    def __rows(self, indexes):
+        """
+
+        Return the rows of the gathered vertex array belonging to the objects at the given indexes, in order.
+
+        """
+        starts = np.asarray(self.__starts, dtype=np.intp)
+        begin = starts[indexes]
+        counts = starts[indexes + 1] - begin
+
+        return np.repeat(begin - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+
+    def __bounds(self, indexes):
+        """
+
+        Return the minimum and maximum corners of the bounding boxes of the objects at the given indexes.
+
+        """
+        if not len(indexes):
+            return np.empty((0, 3)), np.empty((0, 3))
+
+        starts = np.asarray(self.__starts, dtype=np.intp)
+        counts = starts[indexes + 1] - starts[indexes]
+        first = np.cumsum(counts) - counts
+        vertices = self.__vertices[self.__rows(indexes)]
+
+        padding = np.array([self.objs[i].padding for i in indexes.tolist()], dtype=float)[:, None]
+
+        return (np.minimum.reduceat(vertices, first, axis=0) - padding,
+                np.maximum.reduceat(vertices, first, axis=0) + padding)
+
+    def gatherVertices(self):
+        """
+
+        Return one contiguous (n, 3) array holding the world coordinates of every object's vertices in self.objs, in
+        order, and the list of indexes where each object's vertices start, ending with n.
+
+        """
+        starts = np.cumsum([0] + [len(x.vertices) for x in self.objs]).tolist()
+
+        if not self.objs:
+            return np.empty((0, 3)), starts
+
+        return np.concatenate([x.worldVertices() for x in self.objs]), starts
 
     def __sortObjects(self):  # This method isn't perfect but works for the majority of scenarios
         """
 
         Use the centroid of triangles and the midpoints of lines to order by.
+        Returns an array of indexes into self.objs, furthest first.
+        The order only depends on the camera's offset, so it is reused while the camera only rotates.
+
+        Distances are measured from the cached centroids in one pass, and the previous frame's order is sorted again
+        with a stable sort, which is Timsort and close to linear time when the camera has only moved a little.
 
         """
-        return sorted(self.objs, key=lambda element: element.centre(self), reverse=True)
+        key = (tuple(self.offset), self.__geometry)
 
-    def adjustOffset(self, keys, dt):
+        if key != self.__orderKey:
+            distances = ((self.__centroids - self.offset) ** 2).sum(axis=1)
+            order = self.__order
+
+            if order is None or len(order) != len(distances):
+                order = np.arange(len(distances))
+
+            order = order[np.argsort(-distances[order], kind='stable')]
+
+            # Equal distances are ordered by index, as a full sort would, so the order never depends on earlier frames
+            keys = distances[order]
+            ties = keys[1:] == keys[:-1]
+
+            if ties.any():
+                tied = np.flatnonzero(np.concatenate([[False], ties]) | np.concatenate([ties, [False]]))
+                order[tied] = order[tied][np.lexsort((order[tied], -keys[tied]))]
+
+            self.__order, self.__distances = order, distances
+            self.__orderKey = key
+
+        return self.__order
+
+    def __buildDrawList(self, indexes, frames):
         """
 
-        Allows the camera to free fly around - q is vertically up, e is vertically down.
-        Arrow keys move relative to the camera's rotation.
+        Gather the objects at the given indexes, which are sorted furthest first, into a DrawList keyed by minus their
+        distance from the camera. The faces, edges and corners of every composite in view are gathered from the
+        scene's Frame in one batch, each with its own distance, so they are drawn in order among the other objects.
+
+        When batching, objects of each class submit their primitives together with submitMany(). Otherwise they are
+        added as calls to their own draw() methods.
 
         """
-        t = dt / 100
-        if keys[pygame.K_UP]:
-            self.offset[0] += t * cos(self.rot[0]) * cos(self.rot[1])
-            self.offset[1] -= t * sin(self.rot[1])
-            self.offset[2] += t * sin(self.rot[0]) * cos(self.rot[1])
+        stats = self.stats
+        drawList = DrawList()
+        starts = self.__starts
 
-        if keys[pygame.K_DOWN]:
-            self.offset[0] -= t * cos(self.rot[0]) * cos(self.rot[1])
-            self.offset[1] += t * sin(self.rot[1])
-            self.offset[2] -= t * sin(self.rot[0]) * cos(self.rot[1])
+        composite = self.__composite[indexes]
+        plain, composite = indexes[~composite], indexes[composite]
+        keys = (-self.__distances[plain]).tolist()
 
-        if keys[pygame.K_RIGHT]:
-            self.offset[0] += t * cos(self.rot[0] + pi / 2)
-            self.offset[2] += t * sin(self.rot[0] + pi / 2)
-            
-        if keys[pygame.K_LEFT]:
-            self.offset[0] -= t * cos(self.rot[0] + pi / 2)
-            self.offset[2] -= t * sin(self.rot[0] + pi / 2)
+        if self.batch:
+            groups = {}
+            for i, key in zip(plain.tolist(), keys):
+                group = groups.setdefault(type(self.objs[i]), ([], [], []))
+                group[0].append(self.objs[i])
+                group[1].append(starts[i])
+                group[2].append(key)
 
-        if keys[pygame.K_q]:
-            self.offset[1] += t
+            for kind, (objs, objStarts, objKeys) in groups.items():
+                reasons = kind.submitMany(drawList, objs, objStarts, self.__frame, objKeys)
 
-        if keys[pygame.K_e]:
-            self.offset[1] -= t
+                if stats is not None:
+                    for reason in reasons:
+                        stats.count(reason)
 
-    def adjustRotation(self, motion):
+        else:
+            for i, key in zip(plain.tolist(), keys):
+                drawList.call(self.objs[i].draw, frames[id(self.objs[i])], key=key)
+
+        if len(composite):
+            meshes = [self.objs[x] for x in composite.tolist()]
+            parts, outcomes = meshPrimitives(meshes, np.asarray(starts)[composite], self.__frame)
+            drawList.extend(parts)
+
+            if stats is not None:
+                for reason in outcomes:
+                    stats.count(reason)
+
+        return drawList
+
+    def adjustOffset(self, keys, dt):
         """
 
-        Given a list motion = [a, b], adjust the camera's rotation.
-        Transformation of points is handled in __SceneObject.draw(), not here.
+        Allows the camera to free fly around - q is vertically up, e is vertically down.
+        Arrow keys move relative to the camera's rotation.
 
+        """
+        self.camera.adjustOffset(keys, dt)
 
+    def adjustRotation(self, motion):
         """
-        self.rot[0] += motion[0] / 100
-        self.rot[1] += motion[1] / 100
 
-        if self.rot[1] < - pi / 2:  # Fixing vertical rotation to stop camera flipping around
-            self.rot[1] = - pi / 2
+        Given a list motion = [a, b], adjust the camera's rotation.
 
-        if self.rot[1] > pi / 2:
-            self.rot[1] = pi / 2
+        """
+        self.camera.adjustRotation(motion)
@@ -0,0 +1,480 @@
+import io
+import struct
+
+import numpy as np
+
+from engine._error import *
+from engine._instance import Instances
+from engine._light import FLAT, GOURAUD
+from engine._lod import LODMesh
+from engine._obj import Point, Line, Triangle, Sphere, PointCloud, Mesh, Cube
+from engine._scene import Scene
+
+SCENE_MAGIC = b'3DESCENE'
+SCENE_VERSION = 1
+
+_HEADER = struct.Struct('<2I3B3d2dQ')  # Version, array count, background, camera offset and rotation, object count
+_ENTRY = struct.Struct('<24s8sB3QQ')  # Array name, dtype, number of dimensions, shape and position in the file
+
+# Every object is stored in the table of its class, and kinds records which table each object of the scene is in
+_KINDS = (Point, Line, Triangle, Sphere, PointCloud, Mesh, Cube, LODMesh, Instances)
+_SHADINGS = (FLAT, GOURAUD, None)  # Codes stored for the shading of each Mesh
+
+
+def _colours(values):
+    """
+
+    Pack a sequence of colours, which may be None where they are not drawn, into an (n, 3) uint8 array.
+
+    """
+    return np.array([(0, 0, 0) if x is None else tuple(x)[:3] for x in values], dtype=np.uint8).reshape(-1, 3)
+
+
+def _flags(values):
+    return np.array(values, dtype=bool)
+
+
+def _concatenate(arrays, width, dtype):
+    """
+
+    Join variable sized blocks of rows into one array, returning it and the number of rows in each block.
+
+    """
+    counts = np.array([len(x) for x in arrays], dtype=np.int64)
+    joined = np.concatenate([np.asarray(x, dtype=dtype).reshape(-1, width) for x in arrays] +
+                            [np.empty((0, width), dtype=dtype)])
+
+    return joined, counts
+
+
+def _split(array, counts):
+    """
+
+    Inverse of _concatenate(), returning views onto the blocks of array.
+
+    """
+    counts = counts.tolist()
+    ends = np.cumsum(counts, dtype=np.int64).tolist()
+
+    return [array[end - n:end] for n, end in zip(counts, ends)]
+
+
+def _indexes(array):
+    """
+
+    Store vertex indexes in the smallest unsigned type that holds them.
+
+    """
+    top = int(array.max()) if array.size else 0
+
+    for dtype in ('u1', '<u2', '<u4'):
+        if top <= np.iinfo(dtype).max:
+            return array.astype(dtype)
+
+    return array.astype('<i8')
+
+
+def _tuples(array):
+    return [tuple(x) for x in array.tolist()]
+
+
+def _shadings(meshes):
+    codes = []
+    for x in meshes:
+        if x.shading not in _SHADINGS:
+            raise ArgumentError('Cannot save Mesh shading {!r} in a scene file'.format(x.shading))
+
+        codes.append(_SHADINGS.index(x.shading))
+
+    return np.array(codes, dtype='u1')
+
+
+def _restoreShadings(meshes, arrays, name):
+    """
+
+    Set the shading of each restored mesh from the codes stored as name. Files saved before shading was stored leave
+    every mesh FLAT.
+
+    """
+    codes = arrays.get(name)
+
+    if codes is None:
+        return
+
+    if codes.shape != (len(meshes),) or codes.size and codes.max() >= len(_SHADINGS):
+        raise FileFormatError('Corrupt shading in stored {}'.format(name.split('.')[0]))
+
+    for obj, code in zip(meshes, codes.tolist()):
+        obj.shading = _SHADINGS[code]
+
+
+def _packMeshes(meshes, prefix):
+    vertices, vertexCounts = _concatenate([x.vertices for x in meshes], 3, '<f8')
+    faces, faceCounts = _concatenate([x.faces for x in meshes], 3, '<i8')
+    edges, edgeCounts = _concatenate([x.edges for x in meshes], 2, '<i8')
+
+    return {prefix + 'vertices': vertices, prefix + 'vertexCounts': vertexCounts,
+            prefix + 'faces': _indexes(faces), prefix + 'faceCounts': faceCounts,
+            prefix + 'edges': _indexes(edges), prefix + 'edgeCounts': edgeCounts,
+            prefix + 'midpoint': np.array([x.midpoint for x in meshes], dtype='<f8').reshape(-1, 3),
+            prefix + 'col': _colours(x.col for x in meshes),
+            prefix + 'lines': _flags([x.linesInfo[0] for x in meshes]),
+            prefix + 'lineCol': _colours(x.linesInfo[1] for x in meshes),
+            prefix + 'corners': _flags([x.cornersInfo[0] for x in meshes]),
+            prefix + 'cornerCol': _colours(x.cornersInfo[1] for x in meshes),
+            prefix + 'shading': _shadings(meshes)}
+
+
+def _unpackMeshes(arrays, prefix):
+    """
+
+    Return the arguments of each stored Mesh and its midpoint, with vertices as views of the stored arrays. Vertex
+    indexes are checked against their own mesh for the whole table at once.
+
+    """
+    get = arrays.get
+    vertexCounts = get(prefix + 'vertexCounts')
+    blocks = []
+
+    for name, width in (('face', 3), ('edge', 2)):
+        indexes, counts = get(prefix + name + 's').astype(np.intp).reshape(-1, width), get(prefix + name + 'Counts')
+
+        if indexes.size and (indexes >= np.repeat(vertexCounts, counts)[:, None]).any():
+            raise FileFormatError('Vertex index out of range in stored {}'.format(prefix.rstrip('.')))
+
+        blocks.append(_split(indexes, counts))
+
+    if (vertexCounts == 0).any():
+        raise FileFormatError('Stored {} without vertices'.format(prefix.rstrip('.')))
+
+    parts = zip(_split(get(prefix + 'vertices').reshape(-1, 3), vertexCounts), *blocks,
+                _tuples(get(prefix + 'col')),
+                zip(get(prefix + 'lines').tolist(), _tuples(get(prefix + 'lineCol'))),
+                zip(get(prefix + 'corners').tolist(), _tuples(get(prefix + 'cornerCol'))),
+                get(prefix + 'midpoint').tolist())
+
+    return list(parts)
+
+
+def _restoreMeshes(kind, arrays, prefix):
+    """
+
+    Meshes and Cubes were checked when they were saved and their indexes are checked by _unpackMeshes(), so they are
+    restored without running their constructors.
+
+    """
+    objs = []
+    for vertices, faces, edges, col, lines, corners, midpoint in _unpackMeshes(arrays, prefix):
+        obj = kind.__new__(kind)
+        obj.version = 0
+        obj.vertices, obj.faces, obj.edges, obj.midpoint = vertices, faces, edges, midpoint
+        obj.col, obj.linesInfo, obj.cornersInfo = col, lines, corners
+        objs.append(obj)
+
+    _restoreShadings(objs, arrays, prefix + 'shading')
+
+    return objs
+
+
+def _pack(kind, objs):
+    """
+
+    Pack every object of one class into a dictionary of arrays, named by the class.
+
+    """
+    if kind is Point:
+        return {'point.pos': np.array([x.pos for x in objs], dtype='<f8').reshape(-1, 3),
+                'point.col': _colours(x.col for x in objs)}
+
+    if kind is Line:
+        return {'line.vertices': np.array([x.vertices for x in objs], dtype='<f8').reshape(-1, 2, 3),
+                'line.pointCol': _colours(y.col for x in objs for y in x.coords).reshape(-1, 2, 3),
+                'line.col': _colours(x.col for x in objs),
+                'line.ends': _flags([x.endInfo[0] for x in objs]),
+                'line.endCol': _colours(x.endInfo[1] for x in objs)}
+
+    if kind is Triangle:
+        return {'triangle.vertices': np.array([x.vertices for x in objs], dtype='<f8').reshape(-1, 3, 3),
+                'triangle.pointCol': _colours(y.col for x in objs for y in x.coords).reshape(-1, 3, 3),
+                'triangle.col': _colours(x.col for x in objs),
+                'triangle.lines': _flags([x.linesInfo[0] for x in objs]),
+                'triangle.lineCol': _colours(x.linesInfo[1] for x in objs),
+                'triangle.corners': _flags([x.cornersInfo[0] for x in objs]),
+                'triangle.cornerCol': _colours(x.cornersInfo[1] for x in objs)}
+
+    if kind is Sphere:
+        return {'sphere.pos': np.array([x.pos for x in objs], dtype='<f8').reshape(-1, 3),
+                'sphere.radius': np.array([x.radius for x in objs], dtype='<f8'),
+                'sphere.col': _colours(x.col for x in objs),
+                'sphere.outline': _flags([x.outline[0] for x in objs]),
+                'sphere.outlineCol': _colours(x.outline[1] for x in objs)}
+
+    if kind is PointCloud:
+        positions, counts = _concatenate([x.vertices for x in objs], 3, '<f8')
+        colours, _ = _concatenate([x.colours for x in objs], 3, 'u1')
+
+        return {'cloud.positions': positions, 'cloud.counts': counts, 'cloud.colours': colours,
+                'cloud.size': np.array([x.size for x in objs], dtype='<f8')}
+
+    if kind is LODMesh:
+        levels, levelCounts = _concatenate([x for mesh in objs for _, x in mesh.levels], 3, '<i8')
+
+        return dict(_packMeshes(objs, 'lod.'), **{
+            'lod.levels': np.array([len(x.levels) for x in objs], dtype=np.int64),
+            'lod.sizes': np.array([size for mesh in objs for size, _ in mesh.levels], dtype='<f8'),
+            'lod.levelFaces': levels, 'lod.levelFaceCounts': levelCounts,
+            'lod.tolerance': np.array([x.tolerance for x in objs], dtype='<f8')})
+
+    if kind is Instances:
+        # Meshes shared by several Instances are stored once, as plain Meshes
+        meshes = list({id(x.mesh): x.mesh for x in objs}.values())
+        index = {id(x): i for i, x in enumerate(meshes)}
+        offsets, copies = _concatenate([x.offsets for x in objs], 3, '<f8')
+        matrices, matrixCounts = _concatenate([x.matrices if x.matrices is not None else np.empty((0, 3, 3))
+                                               for x in objs], 9, '<f8')
+
+        return dict(_packMeshes(meshes, 'geometry.'), **{
+            'instances.mesh': np.array([index[id(x.mesh)] for x in objs], dtype=np.int64),
+            'instances.offsets': offsets, 'instances.copies': copies,
+            'instances.matrices': matrices.reshape(-1, 3, 3), 'instances.matrixCounts': matrixCounts,
+            'instances.colours': _concatenate([x.colours for x in objs], 3, 'u1')[0],
+            'instances.lines': _flags([x.linesInfo[0] for x in objs]),
+            'instances.lineCol': _colours(x.linesInfo[1] for x in objs),
+            'instances.corners': _flags([x.cornersInfo[0] for x in objs]),
+            'instances.cornerCol': _colours(x.cornersInfo[1] for x in objs),
+            'instances.shading': _shadings(objs)})
+
+    # Cubes are kept as their faces and edges, and restored without working out their geometry again
+    return _packMeshes(objs, 'cube.' if kind is Cube else 'mesh.')
+
+
+def _unpack(kind, arrays):
+    """
+
+    Rebuild the objects of one class from the arrays written by _pack().
+
+    """
+    get = arrays.get
+
+    if kind is Point:
+        return [Point(*pos, col=col) for pos, col in zip(get('point.pos').tolist(), _tuples(get('point.col')))]
+
+    if kind in (Line, Triangle):
+        prefix = 'line.' if kind is Line else 'triangle.'
+        coords = [[Point(*pos, col=tuple(col)) for pos, col in zip(x, y)]
+                  for x, y in zip(get(prefix + 'vertices').tolist(), get(prefix + 'pointCol').tolist())]
+
+        if kind is Line:
+            return [Line(*x, col=col, ends=ends) for x, col, ends in
+                    zip(coords, _tuples(get('line.col')), zip(get('line.ends').tolist(), _tuples(get('line.endCol'))))]
+
+        return [Triangle(*x, col=col, lines=lines, corners=corners) for x, col, lines, corners in
+                zip(coords, _tuples(get('triangle.col')),
+                    zip(get('triangle.lines').tolist(), _tuples(get('triangle.lineCol'))),
+                    zip(get('triangle.corners').tolist(), _tuples(get('triangle.cornerCol'))))]
+
+    if kind is Sphere:
+        return [Sphere(*pos, r, col=col, outline=outline) for pos, r, col, outline in
+                zip(get('sphere.pos').tolist(), get('sphere.radius').tolist(), _tuples(get('sphere.col')),
+                    zip(get('sphere.outline').tolist(), _tuples(get('sphere.outlineCol'))))]
+
+    if kind is PointCloud:
+        counts = get('cloud.counts')
+        return [PointCloud(positions, col=colours, size=size) for positions, colours, size in
+                zip(_split(get('cloud.positions'), counts), _split(get('cloud.colours'), counts),
+                    get('cloud.size').tolist())]
+
+    if kind is LODMesh:
+        levels = list(zip(get('lod.sizes').tolist(), _split(get('lod.levelFaces'), get('lod.levelFaceCounts'))))
+        counts = get('lod.levels').tolist()
+        ends = np.cumsum(counts).tolist()
+
+        objs = [LODMesh(vertices, faces, edges, col=col, lines=lines, corners=corners, levels=levels[end - n:end],
+                        tolerance=tolerance)
+                for (vertices, faces, edges, col, lines, corners, _), n, end, tolerance in
+                zip(_unpackMeshes(arrays, 'lod.'), counts, ends, get('lod.tolerance').tolist())]
+        _restoreShadings(objs, arrays, 'lod.shading')
+
+        return objs
+
+    if kind is Instances:
+        meshes = _restoreMeshes(Mesh, arrays, 'geometry.')
+        chosen = get('instances.mesh')
+
+        if chosen.size and chosen.max() >= len(meshes):
+            raise FileFormatError('Mesh index out of range in stored instances')
+
+        copies, matrixCounts = get('instances.copies'), get('instances.matrixCounts')
+        objs = [Instances(meshes[mesh], offsets, matrices if len(matrices) else None, col=colours, lines=lines,
+                          corners=corners)
+                for mesh, offsets, matrices, colours, lines, corners in
+                zip(chosen.tolist(), _split(get('instances.offsets'), copies),
+                    _split(get('instances.matrices'), matrixCounts), _split(get('instances.colours'), copies),
+                    zip(get('instances.lines').tolist(), _tuples(get('instances.lineCol'))),
+                    zip(get('instances.corners').tolist(), _tuples(get('instances.cornerCol'))))]
+        _restoreShadings(objs, arrays, 'instances.shading')
+
+        return objs
+
+    return _restoreMeshes(kind, arrays, 'cube.' if kind is Cube else 'mesh.')
+
+
+def saveScene(scene, target):
+    """
+
+    Write a scene's objects, camera offset and rotation and background to target, a path or a binary file.
+
+    Objects of each built in class are written together as a handful of arrays, so saving and loading cost a few
+    NumPy operations per class rather than pickling every object and every Point inside it. Objects of other classes,
+    including subclasses, cannot be saved.
+
+    The file starts with a magic string, a header and a table of contents naming each array with its dtype and
+    shape, followed by each array's raw data aligned to 64 bytes.
+
+    """
+    kinds = np.array([_KINDS.index(type(x)) if type(x) in _KINDS else -1 for x in scene.objs], dtype=np.int64)
+
+    if (kinds < 0).any():
+        raise ArgumentError('Cannot save objects of type {} in a scene file'.format(
+            type(scene.objs[int(np.flatnonzero(kinds < 0)[0])]).__name__))
+
+    arrays = {'kinds': kinds.astype('u1')}
+    for index, kind in enumerate(_KINDS):
+        chosen = np.flatnonzero(kinds == index)
+
+        if len(chosen):
+            arrays.update(_pack(kind, [scene.objs[x] for x in chosen.tolist()]))
+
+    # Model matrices are kept apart from the tables, as any object may have one
+    modelled = [i for i, x in enumerate(scene.objs) if x.model is not None]
+    if modelled:
+        arrays['models'] = np.array([scene.objs[x].model for x in modelled], dtype='<f8')
+        arrays['modelled'] = np.array(modelled, dtype=np.int64)
+
+    arrays = {name: np.ascontiguousarray(x) for name, x in arrays.items()}
+
+    # Lay out the arrays after the header and table of contents
+    position = len(SCENE_MAGIC) + _HEADER.size + _ENTRY.size * len(arrays)
+    entries = []
+    for name, array in arrays.items():
+        position += -position % 64
+        entries.append(_ENTRY.pack(name.encode(), array.dtype.str.encode(), array.ndim,
+                                   *(array.shape + (0, 0, 0))[:3], position))
+        position += array.nbytes
+
+    header = _HEADER.pack(SCENE_VERSION, len(arrays), *_colours([scene.background])[0].tolist(),
+                          *map(float, scene.offset), *map(float, scene.rot), len(scene.objs))
+
+    f = open(target, 'wb') if isinstance(target, str) else target
+
+    try:
+        f.write(SCENE_MAGIC + header + b''.join(entries))
+        written = len(SCENE_MAGIC) + len(header) + len(entries) * _ENTRY.size
+
+        for entry, array in zip(entries, arrays.values()):
+            start = _ENTRY.unpack(entry)[-1]
+            f.write(b'\0' * (start - written))
+            f.write(array.tobytes())
+            written = start + array.nbytes
+
+    finally:
+        if isinstance(target, str):
+            f.close()
+
+
+def sceneBytes(scene):
+    """
+
+    Return what saveScene() would write for a scene, as bytes.
+
+    """
+    buffer = io.BytesIO()
+    saveScene(scene, buffer)
+
+    return buffer.getvalue()
+
+
+def readScene(source):
+    """
+
+    Read a file written by saveScene(), returning (objs, background, offset, rot).
+
+    source is a path, which is memory-mapped copy on write, or a bytes-like object such as shared memory. Large arrays
+    such as Mesh vertices and faces are views of it, so nothing is copied and they must outlive the objects.
+
+    """
+    if isinstance(source, str):
+        data = np.asarray(np.memmap(source, dtype=np.uint8, mode='c'))  # Plain views slice much faster
+
+    else:
+        data = np.frombuffer(source, dtype=np.uint8)
+
+    name = source if isinstance(source, str) else 'scene data'
+
+    if bytes(data[:len(SCENE_MAGIC)]) != SCENE_MAGIC:
+        raise FileFormatError('{} is not a scene file'.format(name))
+
+    position = len(SCENE_MAGIC)
+
+    if position + _HEADER.size > len(data):
+        raise FileFormatError('Truncated header in scene file {}'.format(name))
+
+    version, count, *header = _HEADER.unpack(bytes(data[position:position + _HEADER.size]))
+
+    if version != SCENE_VERSION:
+        raise FileFormatError('Scene file {} has version {}, expected {}'.format(name, version, SCENE_VERSION))
+
+    background, offset, rot, objectCount = tuple(header[:3]), header[3:6], header[6:8], header[8]
+    position += _HEADER.size
+
+    if position + _ENTRY.size * count > len(data):
+        raise FileFormatError('Truncated table of contents in scene file {}'.format(name))
+
+    arrays = {}
+    for _ in range(count):
+        key, dtype, ndim, *shape, start = _ENTRY.unpack(bytes(data[position:position + _ENTRY.size]))
+        position += _ENTRY.size
+
+        dtype, shape = np.dtype(dtype.rstrip(b'\0').decode()), tuple(shape[:ndim])
+        size = int(np.prod(shape)) * dtype.itemsize
+
+        if start + size > len(data):
+            raise FileFormatError('Truncated array {} in scene file {}'.format(key.rstrip(b'\0').decode(), name))
+
+        arrays[key.rstrip(b'\0').decode()] = data[start:start + size].view(dtype).reshape(shape)
+
+    kinds = arrays.get('kinds', np.empty(0, dtype=np.uint8))
+    if len(kinds) != objectCount or kinds.size and kinds.max() >= len(_KINDS):
+        raise FileFormatError('Corrupt object table in scene file {}'.format(name))
+
+    # Rebuild each class's objects in turn, then put them back in the scene's order
+    objs = [None] * objectCount
+    for index, kind in enumerate(_KINDS):
+        chosen = np.flatnonzero(kinds == index).tolist()
+
+        if chosen:
+            for x, obj in zip(chosen, _unpack(kind, arrays)):
+                objs[x] = obj
+
+    modelled, models = arrays.get('modelled', np.empty(0, dtype=np.int64)), arrays.get('models')
+    if modelled.size and (models is None or models.shape != (len(modelled), 4, 4) or modelled.max() >= objectCount):
+        raise FileFormatError('Corrupt model matrices in scene file {}'.format(name))
+
+    for x, model in zip(modelled.tolist(), models if modelled.size else ()):
+        objs[x].model = model
+
+    return objs, background, offset, rot
+
+
+def loadScene(source, **kwargs):
+    """
+
+    Load a file written by saveScene() as a new Scene, with its saved camera and background. Other keyword arguments,
+    such as screenDim and headless, are passed on to Scene.
+
+    """
+    objs, background, offset, rot = readScene(source)
+    scene = Scene(*objs, background=background, **kwargs)
+    scene.offset, scene.rot = list(offset), list(rot)
+
+    return scene
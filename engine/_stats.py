@@ -0,0 +1,101 @@
+from time import perf_counter
+
+# Reasons returned by draw() and rasterize() of scene objects, and counted by FrameStats
+DRAWN = 'drawn'
+BEHIND = 'behind'  # The object is behind the near plane
+BACKFACE = 'backface'  # The object faces away from the camera
+OFFSCREEN = 'offscreen'  # The object is in front of the camera but outside the screen or beyond the far plane
+FRUSTUM = 'frustum'  # Culled by the scene's bounding volume hierarchy before being transformed
+OCCLUDED = 'occluded'  # Hidden behind nearer objects, found by the scene's occlusion culling
+
+STAGES = ('transform', 'sort', 'raster')
+
+
+class FrameStats:
+    def __init__(self):
+        """
+
+        Optional instrumentation for Scene.draw(). Assign an instance to scene.stats to enable it; with scene.stats
+        left as None, draw() only pays for a few comparisons per frame.
+
+        timings and counts describe the last frame drawn. totals and totalCounts accumulate over every frame since the
+        last reset(). Stages are 'transform', 'sort' and 'raster', and counts are keyed by the reasons DRAWN, BEHIND,
+        BACKFACE, OFFSCREEN, FRUSTUM and OCCLUDED.
+
+        """
+        self.__callbacks = {}
+        self.reset()
+
+    def reset(self):
+        self.frames = 0
+        self.skipped = 0  # Calls to draw() that reused the previous frame
+        self.timings = {}
+        self.totals = {}
+        self.counts = {}
+        self.totalCounts = {}
+        self.__timings = {}
+        self.__counts = {}
+        self.__started = None
+
+    def addCallback(self, callback, stage=None, when='after'):
+        """
+
+        Call callback(scene, stage) before or after the given stage of every frame, or of every stage if stage is None.
+        when must be 'before' or 'after'.
+
+        """
+        if when not in ('before', 'after'):
+            raise ValueError("when must be 'before' or 'after'")
+
+        self.__callbacks.setdefault((stage, when), []).append(callback)
+
+    def removeCallback(self, callback, stage=None, when='after'):
+        self.__callbacks[(stage, when)].remove(callback)
+
+    def __fire(self, scene, stage, when):
+        for key in ((None, when), (stage, when)):
+            for callback in self.__callbacks.get(key, ()):
+                callback(scene, stage)
+
+    def beginFrame(self):
+        self.__timings = {}
+        self.__counts = {}
+
+    def endFrame(self, drawn=True):
+        """
+
+        Publish the frame's timings and counts, unless draw() found nothing to draw and reused the previous frame.
+
+        """
+        if drawn:
+            self.frames += 1
+            self.timings, self.counts = self.__timings, self.__counts
+
+            for stage, seconds in self.timings.items():
+                self.totals[stage] = self.totals.get(stage, 0.0) + seconds
+
+            for reason, number in self.counts.items():
+                self.totalCounts[reason] = self.totalCounts.get(reason, 0) + number
+
+        else:
+            self.skipped += 1
+
+    def enter(self, scene, stage):
+        self.__fire(scene, stage, 'before')
+        self.__started = perf_counter()
+
+    def leave(self, scene, stage):
+        seconds = perf_counter() - self.__started
+        self.__timings[stage] = self.__timings.get(stage, 0.0) + seconds
+        self.__fire(scene, stage, 'after')
+
+    def count(self, reason, number=1):
+        self.__counts[reason] = self.__counts.get(reason, 0) + number
+
+    def averages(self):
+        """
+
+        Return the mean seconds per drawn frame spent in each stage.
+
+        """
+        return {stage: seconds / max(self.frames, 1) for stage, seconds in self.totals.items()}
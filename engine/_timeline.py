@@ -0,0 +1,279 @@
+from math import sin, cos
+
+import numpy as np
+
+from engine._error import *
+from engine._lazy import pygame
+
+FRAME_RATE = 30  # Frames per second of animation rendered by a Timeline
+
+
+def eulerQuaternion(rotation):
+    """
+
+    Return the unit quaternion (w, x, y, z) turning by rotation[0], rotation[1] and rotation[2] radians about the x, y
+    and z axes, in that order.
+
+    """
+    halves = [x / 2 for x in rotation]
+    (cx, cy, cz), (sx, sy, sz) = [cos(x) for x in halves], [sin(x) for x in halves]
+
+    return (cx * cy * cz + sx * sy * sz,
+            sx * cy * cz - cx * sy * sz,
+            cx * sy * cz + sx * cy * sz,
+            cx * cy * sz - sx * sy * cz)
+
+
+def slerp(q0, q1, t):
+    """
+
+    Interpolate between (n, 4) arrays of unit quaternions along the shorter arc, with an (n,) array of fractions.
+    Nearly equal pairs are interpolated linearly and normalised, where the arc is too short to divide by.
+
+    """
+    dot = (q0 * q1).sum(axis=1)
+    q1 = np.where(dot[:, None] < 0, -q1, q1)
+    dot = np.abs(dot).clip(0, 1)
+
+    angle = np.arccos(dot)
+    near = dot > 0.9995
+    safe = np.where(near, 1.0, np.sin(angle))
+    w0 = np.where(near, 1 - t, np.sin((1 - t) * angle) / safe)
+    w1 = np.where(near, t, np.sin(t * angle) / safe)
+
+    q = w0[:, None] * q0 + w1[:, None] * q1
+
+    return q / np.sqrt((q ** 2).sum(axis=1))[:, None]
+
+
+def quaternionMatrices(q):
+    """
+
+    Convert an (n, 4) array of unit quaternions (w, x, y, z) to an (n, 3, 3) array of rotation matrices.
+
+    """
+    w, x, y, z = q.T
+
+    return np.stack([1 - 2 * (y * y + z * z), 2 * (x * y - w * z), 2 * (x * z + w * y),
+                     2 * (x * y + w * z), 1 - 2 * (x * x + z * z), 2 * (y * z - w * x),
+                     2 * (x * z - w * y), 2 * (y * z + w * x), 1 - 2 * (x * x + y * y)], axis=1).reshape(-1, 3, 3)
+
+
+def _segments(times, starts, time):
+    """
+
+    For tracks of keys whose sorted times are held one track after another in times, track k's from starts[k] to
+    starts[k + 1], find the pair of keys each track is between at the given time, clamped to its first and last keys.
+
+    Returns the indexes of the keys before and after, and the fraction of the way from one to the other.
+
+    """
+    counts = np.diff(starts)
+    first, last = times[starts[:-1]], times[starts[1:] - 1]
+
+    # Tracks are moved apart in time so one search finds the key before in every track at once
+    spacing = (last - first).max() + 1
+    track = np.repeat(np.arange(len(counts)), counts)
+    shifted = times - first[track] + track * spacing
+    wanted = np.clip(time, first, last) - first + np.arange(len(counts)) * spacing
+
+    before = np.clip(np.searchsorted(shifted, wanted, side='right') - 1, starts[:-1], starts[1:] - 1)
+    after = np.minimum(before + 1, starts[1:] - 1)
+
+    span = times[after] - times[before]
+    fraction = np.where(span > 0, (np.clip(time, first, last) - times[before]) / np.where(span > 0, span, 1), 0)
+
+    return before, after, fraction
+
+
+class Timeline:
+    def __init__(self, scene, frameRate=FRAME_RATE):
+        """
+
+        Keyframed animation of a scene's objects and camera.
+
+        Keys are added with key() and keyCamera(). Each frame, apply() interpolates every animated object's transform
+        in one batch and writes the results into model matrices the timeline owns, so nothing is allocated or rebuilt
+        per object. Objects are only marked as changed, and scenes only transform their vertices again.
+
+        frames(), saveFrames() and writeRaw() render the animation at frameRate frames per second, one frame at a
+        time, so long animations use constant memory.
+
+        """
+        if frameRate <= 0:
+            raise ArgumentError('Frame rate must be positive, not {}'.format(frameRate))
+
+        self.scene = scene
+        self.frameRate = frameRate
+
+        self.__keys = {}  # id of each animated object to the object and its list of (time, position, rotation, scale)
+        self.__cameraKeys = []  # (time, offset, rot)
+        self.__tracks = None  # Key arrays for every animated object, built again after keys are added
+        self.__camera = None
+        self.__models = self.__views = None
+
+    def key(self, obj, time, position=(0.0, 0.0, 0.0), rotation=(0.0, 0.0, 0.0), scale=1.0):
+        """
+
+        Place obj at time seconds by scaling its vertices by scale, which is one factor or one per axis, then turning
+        them by rotation, as in eulerQuaternion(), and moving them by position. Between keys, positions and scales are
+        interpolated linearly and rotations along the shortest arc. Before its first key and after its last, an
+        object holds still.
+
+        The transform replaces any model matrix the object had.
+
+        """
+        scale = np.broadcast_to(np.asarray(scale, dtype=float), (3,))
+        keys = self.__keys.setdefault(id(obj), (obj, []))[1]
+        keys.append((float(time), tuple(map(float, position)), eulerQuaternion(rotation), tuple(scale.tolist())))
+        self.__tracks = None
+
+    def keyCamera(self, time, offset, rot):
+        """
+
+        Place the camera at offset with rotation rot at time seconds. Offsets and rotations are interpolated linearly.
+
+        """
+        self.__cameraKeys.append((float(time), tuple(map(float, offset)), tuple(map(float, rot))))
+        self.__tracks = None
+
+    @property
+    def duration(self):
+        """
+
+        Time of the last key of any object or the camera, in seconds.
+
+        """
+        times = [y[0] for _, keys in self.__keys.values() for y in keys] + [x[0] for x in self.__cameraKeys]
+
+        return max(times, default=0.0)
+
+    def __build(self):
+        """
+
+        Gather the keys of every animated object into flat arrays, each object's sorted by time, and those of the
+        camera.
+
+        """
+        objs, rows = [], []
+        for obj, keys in self.__keys.values():
+            objs.append(obj)
+            rows.extend(sorted(keys, key=lambda x: x[0]))
+
+        starts = np.cumsum([0] + [len(x[1]) for x in self.__keys.values()])
+        times, positions, rotations, scales = (np.array([x[k] for x in rows], dtype=float) for k in range(4))
+
+        self.__tracks = (objs, starts, times, positions.reshape(-1, 3), rotations.reshape(-1, 4), scales.reshape(-1, 3))
+        self.__models = np.zeros((len(objs), 4, 4))
+        self.__models[:, 3, 3] = 1
+        self.__views = list(self.__models)  # Each object's model matrix, a view into the array above
+
+        keys = sorted(self.__cameraKeys, key=lambda x: x[0])
+        self.__camera = (np.array([x[0] for x in keys]), np.array([x[1] for x in keys]).reshape(-1, 3),
+                         np.array([x[2] for x in keys]).reshape(-1, 2))
+
+    def apply(self, time):
+        """
+
+        Move every animated object and the camera to where they are at time seconds. Call it from a RunLoop's prepare()
+        to play the animation interactively.
+
+        """
+        if self.__tracks is None:
+            self.__build()
+
+        objs, starts, times, positions, rotations, scales = self.__tracks
+
+        if objs:
+            before, after, t = _segments(times, starts, time)
+            models = self.__models
+
+            rotation = quaternionMatrices(slerp(rotations[before], rotations[after], t))
+            models[:, :3, :3] = rotation * (scales[before] + t[:, None] * (scales[after] - scales[before]))[:, None]
+            models[:, :3, 3] = positions[before] + t[:, None] * (positions[after] - positions[before])
+
+            for obj, model in zip(objs, self.__views):
+                obj.model = model
+                obj.markChanged()
+
+        times, offsets, rots = self.__camera
+
+        if len(times):
+            before, after, t = (x[0] for x in _segments(times, np.array([0, len(times)]), time))
+
+            self.scene.offset = (offsets[before] + t * (offsets[after] - offsets[before])).tolist()
+            self.scene.rot = (rots[before] + t * (rots[after] - rots[before])).tolist()
+
+    def times(self, start=0.0, end=None):
+        """
+
+        Return the time of each frame from start to end seconds inclusive, by default the whole animation.
+
+        """
+        end = self.duration if end is None else end
+
+        return start + np.arange(int(round((end - start) * self.frameRate)) + 1) / self.frameRate
+
+    def frames(self, start=0.0, end=None):
+        """
+
+        Generator applying the animation at each frame's time, drawing the scene and yielding the frame as a
+        (screenDim, screenDim, 3) uint8 array, like Scene.getArray().
+
+        The same array is filled in and yielded for every frame, so copy it to keep it. The scene is left as it was
+        at the last frame.
+
+        """
+        scene = self.scene
+        frame = np.empty((scene.dim, scene.dim, 3), dtype=np.uint8)
+
+        for time in self.times(start, end).tolist():
+            self.apply(time)
+            scene.draw()
+
+            pixels = pygame.surfarray.pixels3d(scene.screen)
+            np.copyto(frame, pixels.transpose(1, 0, 2))
+            del pixels  # Unlocks the surface
+
+            yield frame
+
+    def saveFrames(self, path, start=0.0, end=None):
+        """
+
+        Render the animation and save each frame as an image to path.format(index), e.g. 'frame{:04d}.png'.
+        Returns the list of file names written.
+
+        """
+        names = []
+
+        for i, time in enumerate(self.times(start, end).tolist()):
+            self.apply(time)
+            self.scene.draw()
+
+            names.append(path.format(i))
+            pygame.image.save(self.scene.screen, names[-1])
+
+        return names
+
+    def writeRaw(self, target, start=0.0, end=None):
+        """
+
+        Render the animation as raw video to target, a path or a binary file such as a pipe to a video encoder: every
+        frame in turn as rows of 8 bit RGB pixels, top row first, with no header. Returns the number of frames written.
+
+        For example, ffmpeg reads the stream with -f rawvideo -pix_fmt rgb24 -s {dim}x{dim} -r {frameRate} -i -.
+
+        """
+        f = open(target, 'wb') if isinstance(target, str) else target
+        count = 0
+
+        try:
+            for frame in self.frames(start, end):
+                f.write(frame.data)
+                count += 1
+
+        finally:
+            if isinstance(target, str):
+                f.close()
+
+        return count
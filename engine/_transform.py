@@ -0,0 +1,247 @@
+from math import sin, cos
+
+import numpy as np
+
+from engine._clip import NEAR_PLANE, GUARD_BAND, clipPolygons, clipSegments, fanTriangles
+
+
+def rotationMatrix(rot):
+    """
+
+    Build the 3x3 matrix that applies the camera's yaw (rot[0]) and then its pitch (rot[1]).
+
+    The trigonometry is evaluated once per frame here, rather than once per vertex.
+
+    """
+    cy, sy = cos(rot[0]), sin(rot[0])
+    cp, sp = cos(rot[1]), sin(rot[1])
+
+    return np.array([[cy * cp, -sp, sy * cp],
+                     [cy * sp, cp, sy * sp],
+                     [-sy, 0.0, cy]])
+
+
+def transformVertices(vertices, offset, rot):
+    """
+
+    Translate then rotate an (n, 3) array of world coordinates into camera space.
+
+    In camera space, index 0 is the depth along the view direction, index 1 is vertical and index 2 is horizontal.
+
+    """
+    return (vertices - np.asarray(offset, dtype=float)) @ rotationMatrix(rot).T
+
+
+def frustumPlanes(offset, rot, margin=0.0, near=0.0, far=None):
+    """
+
+    Return the planes bounding everything between the near and far planes that projects onto the screen, as (5, 3)
+    world space normals and offsets, or (6, 3) with a far plane, such that a point p is inside when
+    normals . p + offsets >= 0 for every plane.
+
+    margin widens the sides of the screen, in the same units as projected coordinates (the screen spans -1 to 1).
+
+    """
+    edge = 1.0 + margin
+    cameraNormals = np.array([[1.0, 0.0, 0.0],  # In front of the near plane
+                              [edge, 0.0, -1.0],  # Right edge of the screen
+                              [edge, 0.0, 1.0],  # Left edge
+                              [edge, -1.0, 0.0],  # Top edge
+                              [edge, 1.0, 0.0]])  # Bottom edge
+    cameraOffsets = [-near, 0.0, 0.0, 0.0, 0.0]
+
+    if far is not None:
+        cameraNormals = np.concatenate([cameraNormals, [[-1.0, 0.0, 0.0]]])  # Behind the far plane
+        cameraOffsets.append(far)
+
+    normals = cameraNormals @ rotationMatrix(rot)
+
+    return normals, cameraOffsets - normals @ np.asarray(offset, dtype=float)
+
+
+def projectVertices(camera, dim, near=NEAR_PLANE):
+    """
+
+    Project an (n, 3) array of camera space coordinates onto the screen.
+
+    Returns the (n, 2) pixel coordinates and a mask of the vertices in front of the near plane.
+    Pixel coordinates of vertices behind it are meaningless and must be ignored.
+
+    """
+    depth = camera[:, 0]
+    valid = depth >= near
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        safeDepth = np.where(valid, depth, 1.0)
+        screen = np.empty((len(camera), 2))
+        screen[:, 0] = dim * (1 + camera[:, 2] / safeDepth) / 2
+        screen[:, 1] = dim * (1 - camera[:, 1] / safeDepth) / 2
+
+    return screen, valid
+
+
+class Frame:
+    def __init__(self, camera, screen, valid, dim, near=NEAR_PLANE, far=None, unclipped=None, eye=None, light=None):
+        """
+
+        The result of transforming a block of vertices for a single frame.
+
+        camera holds camera space coordinates, screen holds pixel coordinates and valid marks vertices in front of the
+        near plane. far is the depth of the far plane, or None for no far plane. Slicing a Frame returns a Frame of
+        views onto the same arrays, so objects can read their own vertices without copying.
+
+        unclipped marks the vertices that need no clipping: between the near and far planes and inside the guard band
+        around the screen. It is worked out from the other arrays if not given. Triangles and lines with any other
+        vertex are clipped with clipTriangles() and clipLines() before they are rasterized.
+
+        eye is the camera's position in world coordinates, letting faces be culled with normals worked out in advance
+        rather than from the camera space coordinates, and light is the scene's Light, or None to leave faces unlit.
+
+        """
+        self.camera = camera
+        self.screen = screen
+        self.valid = valid
+        self.dim = dim
+        self.near = near
+        self.far = far
+
+        if unclipped is None:
+            lo, hi = -GUARD_BAND * dim, (1 + GUARD_BAND) * dim
+            unclipped = self.inDepth() & (screen >= lo).all(axis=1) & (screen <= hi).all(axis=1)
+
+        self.unclipped = unclipped
+        self.eye = eye
+        self.light = light
+
+    @classmethod
+    def fromVertices(cls, vertices, offset, rot, dim, near=NEAR_PLANE, far=None):
+        camera = transformVertices(vertices, offset, rot)
+        screen, valid = projectVertices(camera, dim, near)
+
+        return cls(camera, screen, valid, dim, near, far, eye=np.array(offset, dtype=float))
+
+    def __getitem__(self, item):
+        return Frame(self.camera[item], self.screen[item], self.valid[item], self.dim, self.near, self.far,
+                     self.unclipped[item], self.eye, self.light)
+
+    def __len__(self):
+        return len(self.camera)
+
+    def allValid(self):
+        return bool(self.valid.all())
+
+    def pixels(self):
+        """
+
+        Integer pixel coordinates of each vertex, as a list of tuples for pygame.draw.
+
+        """
+        return [(round(x), round(y)) for x, y in self.screen.tolist()]
+
+    def inDepth(self):
+        """
+
+        Mask of the vertices between the near and far planes.
+
+        """
+        return self.valid if self.far is None else self.valid & (self.camera[:, 0] <= self.far)
+
+    def onScreen(self):
+        """
+
+        Mask of the vertices between the near and far planes and inside the screen rectangle.
+
+        """
+        return self.inDepth() & (self.screen >= 0).all(axis=1) & (self.screen <= self.dim).all(axis=1)
+
+    def needsClipping(self, rows):
+        """
+
+        Mask of the primitives, given as an (m, k) array of rows of this Frame, with any vertex that needs clipping.
+
+        """
+        return ~self.unclipped[rows].all(axis=1)
+
+    def clipTriangles(self, rows):
+        """
+
+        Clip triangles, given as an (m, 3) array of rows of this Frame, against the near and far planes and then the
+        guard band around the screen. Returns the pixel coordinates and depths of the triangles to draw, as (k, 3, 2)
+        and (k, 3) arrays, and the index into rows of the triangle each came from, in order.
+
+        Triangles needing no clipping are passed through unchanged. The others are split into fans, so the
+        rasterizer is never handed a vertex behind the camera or huge pixel coordinates.
+
+        """
+        rows = np.asarray(rows, dtype=np.intp).reshape(-1, 3)
+        clipped = self.needsClipping(rows)
+
+        if not clipped.any():
+            return self.screen[rows], self.camera[rows, 0], np.arange(len(rows))
+
+        kept = np.flatnonzero(~clipped)
+        polygons, counts = clipPolygons(self.camera[rows[clipped]], np.full(clipped.sum(), 3), 0, self.near)
+
+        if self.far is not None:
+            polygons, counts = clipPolygons(polygons, counts, 0, self.far, below=True)
+
+        # Clipped in screen space with 1 / depth, which unlike depth varies linearly across the screen
+        polygons = self.__project(polygons)
+        for bound, below in ((-GUARD_BAND * self.dim, False), ((1 + GUARD_BAND) * self.dim, True)):
+            for axis in (0, 1):
+                polygons, counts = clipPolygons(polygons, counts, axis, bound, below)
+
+        pieces, owners = fanTriangles(polygons, counts)
+        owners = np.concatenate([kept, np.flatnonzero(clipped)[owners]])
+        order = np.argsort(owners, kind='stable')
+
+        screen = np.concatenate([self.screen[rows[kept]], pieces[:, :, :2]])[order]
+        depth = np.concatenate([self.camera[rows[kept], 0], 1 / pieces[:, :, 2]])[order]
+
+        return screen, depth, owners[order]
+
+    def clipLines(self, rows):
+        """
+
+        Clip lines, given as an (m, 2) array of rows of this Frame, in the same way as clipTriangles(), returning
+        (k, 2, 2) pixel coordinates, (k, 2) depths and the index into rows of each line left.
+
+        """
+        rows = np.asarray(rows, dtype=np.intp).reshape(-1, 2)
+        clipped = self.needsClipping(rows)
+
+        if not clipped.any():
+            return self.screen[rows], self.camera[rows, 0], np.arange(len(rows))
+
+        segments, keep = clipSegments(self.camera[rows[clipped]], 0, self.near)
+
+        if self.far is not None:
+            segments, inside = clipSegments(segments, 0, self.far, below=True)
+            keep &= inside
+
+        segments = self.__project(segments)
+        for bound, below in ((-GUARD_BAND * self.dim, False), ((1 + GUARD_BAND) * self.dim, True)):
+            for axis in (0, 1):
+                segments, inside = clipSegments(segments, axis, bound, below)
+                keep &= inside
+
+        owners = np.concatenate([np.flatnonzero(~clipped), np.flatnonzero(clipped)[keep]])
+        order = np.argsort(owners, kind='stable')
+
+        screen = np.concatenate([self.screen[rows[~clipped]], segments[keep, :, :2]])[order]
+        depth = np.concatenate([self.camera[rows[~clipped], 0], 1 / segments[keep, :, 2]])[order]
+
+        return screen, depth, owners[order]
+
+    def __project(self, points):
+        """
+
+        Project camera space points clipped to the near plane, returning pixel coordinates with 1 / depth as a third
+        channel. Padding points of clipped polygons may lie anywhere and are given harmless values.
+
+        """
+        depth = points[..., 0]
+        inverse = 1 / np.where(depth > 0, depth, 1.0)
+
+        return np.stack([self.dim * (1 + points[..., 2] * inverse) / 2,
+                         self.dim * (1 - points[..., 1] * inverse) / 2, inverse], axis=-1)
@@ -0,0 +1,314 @@
+import numpy as np
+
+from engine._drawlist import FRAGMENT_BUDGET
+from engine._lazy import pygame
+
+LINE_BIAS = 1e-3  # Lines and points are pulled slightly towards the camera so they win against coplanar faces
+
+
+class DepthBuffer:
+    def __init__(self, dim):
+        """
+
+        Colour and depth arrays for a square screen of side dim, indexed [x, y] like pygame.surfarray.
+
+        The depth array stores 1 / depth, which interpolates linearly across the screen, so larger values are nearer.
+        Every primitive is depth tested per pixel as it is written, so primitives can be submitted in any order.
+        Triangles, lines and discs are queued and rasterized with NumPy in batches rather than one at a time.
+
+        """
+        self.dim = dim
+        self.colour = np.zeros((dim, dim, 3), dtype=np.uint8)
+        self.depth = np.zeros((dim, dim))
+        self.window = (0, dim - 1, 0, dim - 1)
+        self.__pending = []  # Triangles waiting for flush()
+        self.__marks = []  # Lines and discs waiting for flush(), in the order they were drawn
+
+    def setClip(self, rect=None):
+        """
+
+        Restrict rasterizing to the pygame style rect (x, y, width, height), or to the whole buffer if rect is None.
+        Mirrors pygame.Surface.set_clip.
+
+        """
+        self.flush()  # Queued primitives are clipped to the window they were drawn in
+
+        if rect is None:
+            self.window = (0, self.dim - 1, 0, self.dim - 1)
+
+        else:
+            x, y, w, h = rect
+            self.window = (max(x, 0), min(x + w, self.dim) - 1, max(y, 0), min(y + h, self.dim) - 1)
+
+    def clear(self, background):
+        self.colour[:] = background
+        self.depth.fill(0)
+        self.__pending = []
+        self.__marks = []
+
+    def blit(self, screen):
+        self.flush()
+        pygame.surfarray.blit_array(screen, self.colour)
+
+    def __resolve(self, pixels, fragments):
+        """
+
+        Depth test the fragments, 1 / depth values for the flat pixel indexes pixels, against the buffer and each
+        other, writing the depths that win. Returns the indexes of the winning fragments, reversed so that colours
+        written in that order leave the first submitted of equally near fragments on top.
+
+        """
+        depth = self.depth.reshape(-1)
+        nearest = depth.copy()
+        np.maximum.at(nearest, pixels, fragments)
+        won = np.flatnonzero((fragments == nearest[pixels]) & (fragments > depth[pixels]))[::-1]
+        depth[pixels[won]] = fragments[won]
+
+        return won
+
+    def triangles(self, screen, depth, col):
+        """
+
+        Fill triangles given an (m, 3, 2) array of pixel coordinates and an (m, 3) array of camera space depths.
+        col is either one colour, an (m, 3) array of colours or an (m, 3, 3) array of colours at each corner, which are
+        blended across the triangle with perspective correction.
+
+        Triangles are queued and rasterized together by flush(), which blit() calls. As every pixel is depth tested,
+        the result is the same as rasterizing them one at a time in the order given.
+
+        """
+        if not len(screen):
+            return
+
+        col = np.asarray(col, dtype=np.uint8)
+        col = col if col.ndim == 3 else np.broadcast_to(col, (len(screen), 3))[:, None]
+        self.__pending.append((np.asarray(screen, dtype=float), 1 / np.asarray(depth, dtype=float),
+                               np.broadcast_to(col, (len(screen), 3, 3))))
+
+    def flush(self):
+        """
+
+        Rasterize every queued line and disc, then every queued triangle, in vectorised passes of about
+        FRAGMENT_BUDGET pixels each.
+
+        The pixels in each triangle's bounding box are tested against its edge functions, and each pass keeps the
+        nearest fragment for every pixel, the first submitted where depths are equal, before depth testing it
+        against the buffer.
+
+        """
+        self.__flushMarks()
+
+        if not self.__pending:
+            return
+
+        screen, inv, col = (np.concatenate(x) for x in zip(*self.__pending))
+        self.__pending = []
+
+        (x0, y0), (x1, y1), (x2, y2) = (screen[:, k].T for k in range(3))
+        area = (x1 - x0) * (y2 - y0) - (x2 - x0) * (y1 - y0)
+        smooth = (col != col[:, :1]).any(axis=(1, 2))
+
+        # Only pixel centres inside a triangle are filled, so its box is the whole rows and columns its corners span
+        left, right, top, bottom = self.window
+        minX = np.maximum(np.ceil(screen[:, :, 0].min(axis=1)), left).astype(np.intp)
+        maxX = np.minimum(np.floor(screen[:, :, 0].max(axis=1)), right).astype(np.intp)
+        minY = np.maximum(np.ceil(screen[:, :, 1].min(axis=1)), top).astype(np.intp)
+        maxY = np.minimum(np.floor(screen[:, :, 1].max(axis=1)), bottom).astype(np.intp)
+
+        heights = np.maximum(maxY - minY + 1, 0)
+        costs = np.where(area != 0, np.maximum(maxX - minX + 1, 0) * heights, 0)
+
+        colour = self.colour.reshape(-1, 3)
+
+        for entry, local in _runs(costs):
+            xs = (minX[entry] + local // heights[entry]).astype(float)
+            ys = (minY[entry] + local % heights[entry]).astype(float)
+
+            # Edge functions, divided by the signed area so they are barycentric weights for either winding
+            a, b, c = x0[entry], x1[entry], x2[entry]
+            d, e, f = y0[entry], y1[entry], y2[entry]
+            w0 = ((c - b) * (ys - e) - (f - e) * (xs - b)) / area[entry]
+            w1 = ((a - c) * (ys - f) - (d - f) * (xs - c)) / area[entry]
+            w2 = 1 - w0 - w1
+
+            inside = np.flatnonzero((w0 >= 0) & (w1 >= 0) & (w2 >= 0))
+            entry, w0, w1, w2 = entry[inside], w0[inside], w1[inside], w2[inside]
+            pixels = xs[inside].astype(np.intp) * self.dim + ys[inside].astype(np.intp)
+            fragments = w0 * inv[entry, 0] + w1 * inv[entry, 1] + w2 * inv[entry, 2]
+
+            won = self.__resolve(pixels, fragments)
+            entry, pixels = entry[won], pixels[won]
+
+            # Colours are interpolated as colour / depth, which varies linearly across the screen like 1 / depth
+            shaded = col[entry, 0]
+            blended = np.flatnonzero(smooth[entry])
+            if len(blended):
+                k, w = entry[blended], won[blended]
+                weights = np.stack([w0[w] * inv[k, 0], w1[w] * inv[k, 1], w2[w] * inv[k, 2]], axis=1)
+                weights /= fragments[w][:, None]
+                shaded[blended] = np.rint((weights[:, :, None] * col[k]).sum(axis=1)).clip(0, 255)
+
+            colour[pixels] = shaded  # Reversed, so the first of equally near fragments is written last and wins
+
+    def lines(self, screen, depth, col):
+        """
+
+        Draw one pixel wide lines of the colour col given an (m, 2, 2) array of pixel coordinates and an (m, 2) array
+        of depths.
+
+        Lines are queued along with discs and rasterized together by flush(), ahead of any triangles, with the same
+        result as drawing them one at a time in the order given.
+
+        """
+        if len(screen):
+            rows = np.concatenate([np.reshape(screen, (-1, 4)), 1 / np.asarray(depth, dtype=float)], axis=1)
+            self.__marks.append((True, rows, col))
+
+    def points(self, xs, ys, depth, col):
+        """
+
+        Write single pixels at the integer coordinates xs and ys, ordered furthest first, with a colour for each.
+
+        """
+        self.__flushMarks()  # Points are written straight away, so lines and discs drawn before them go first
+
+        left, right, top, bottom = self.window
+        inv = (1 + LINE_BIAS) / depth
+        mask = (xs >= left) & (xs <= right) & (ys >= top) & (ys <= bottom)
+        mask[mask] = inv[mask] > self.depth[xs[mask], ys[mask]]
+        xs, ys, inv = xs[mask], ys[mask], inv[mask]
+
+        self.depth[xs, ys] = inv  # Nearer points come later, so they win where pixels repeat
+        self.colour[xs, ys] = np.asarray(col)[mask] if np.ndim(col) == 2 else col
+
+    def circles(self, centres, radii, depth, col, width=0, sphereRadii=None):
+        """
+
+        Draw discs of the colour col and the given pixel radii at constant depth, or rings if width is non-zero.
+
+        If sphereRadii is given, each disc is shaded in depth as the front of a sphere of that world space radius,
+        so intersecting spheres and faces meet correctly. Discs are queued like lines.
+
+        """
+        count = len(centres)
+
+        if count:
+            rows = np.empty((count, 6))
+            rows[:, :2] = centres
+            rows[:, 2], rows[:, 3], rows[:, 5] = radii, depth, width
+            rows[:, 4] = 0 if sphereRadii is None else sphereRadii
+            self.__marks.append((False, rows, col))
+
+    def __flushMarks(self):
+        """
+
+        Rasterize the queued lines and discs in passes of about FRAGMENT_BUDGET pixels, taking them in the order they
+        were drawn so the first of equally near fragments wins, as it would drawing them one at a time.
+
+        Each line is sampled once per pixel along its longer axis, at the same points whatever part of it is inside
+        the clip window, and each disc's pixels are found from its bounding box.
+
+        """
+        if not self.__marks:
+            return
+
+        isLine, rows, col = zip(*self.__marks)
+        counts = [len(x) for x in rows]
+        kinds, rows = np.repeat(isLine, counts), np.concatenate(rows)
+        col = np.repeat(np.asarray(col, dtype=np.uint8), counts, axis=0)
+        self.__marks = []
+
+        left, right, top, bottom = self.window
+        costs, first, minX, minY = (np.zeros(len(rows), dtype=np.intp) for _ in range(4))
+        steps, heights = np.ones(len(rows), dtype=np.intp), np.ones(len(rows), dtype=np.intp)
+        outer, inner, flat = np.zeros(len(rows)), np.zeros(len(rows)), np.zeros(len(rows))
+
+        # Clip each line's parameter range to the clip window so long lines never produce huge sample arrays
+        # Pixels cover half a unit either side of their centre, so the window is widened by a half before clipping
+        x0, y0, x1, y1 = rows[kinds, :4].T
+        dx, dy = x1 - x0, y1 - y0
+        tMin, tMax, hidden = np.zeros(len(dx)), np.ones(len(dx)), np.zeros(len(dx), dtype=bool)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for p, q in ((-dx, x0 - left + 0.5), (dx, right + 0.5 - x0),
+                         (-dy, y0 - top + 0.5), (dy, bottom + 0.5 - y0)):
+                hidden |= (p == 0) & (q < 0)
+                tMin = np.where(p < 0, np.maximum(tMin, q / p), tMin)
+                tMax = np.where(p > 0, np.minimum(tMax, q / p), tMax)
+
+        # Samples are spaced along the whole line, so clipping never moves the pixels that are drawn
+        steps[kinds] = np.maximum(np.maximum(np.abs(dx), np.abs(dy)).astype(np.intp), 1)
+        first[kinds] = np.ceil(tMin * steps[kinds])
+        samples = np.floor(tMax * steps[kinds]).astype(np.intp) - first[kinds] + 1
+        costs[kinds] = np.where(hidden | (tMin > tMax), 0, np.maximum(samples, 0))
+
+        # Only pixel centres within r of a disc's centre are drawn, so its box is the whole rows and columns in reach
+        cx, cy, r, d, s, width = rows[~kinds].T
+        minX[~kinds], minY[~kinds] = np.maximum(np.ceil(cx - r), left), np.maximum(np.ceil(cy - r), top)
+        heights[~kinds] = np.maximum(np.minimum(np.floor(cy + r), bottom) - minY[~kinds] + 1, 0)
+        widths = np.maximum(np.minimum(np.floor(cx + r), right) - minX[~kinds] + 1, 0).astype(np.intp)
+        costs[~kinds] = np.where((r > 0) & (d > 0), widths * heights[~kinds], 0)
+
+        with np.errstate(divide='ignore'):
+            outer[~kinds], inner[~kinds] = r ** 2, np.where(width != 0, (r - width) ** 2, -1)
+            flat[~kinds] = (1 + LINE_BIAS) / d
+
+        sphere = np.zeros(len(rows), dtype=bool)
+        sphere[~kinds] = s != 0
+        columns = np.ascontiguousarray(rows.T)
+        colour = self.colour.reshape(-1, 3)
+
+        for entry, local in _runs(costs):
+            xs, ys = np.empty(len(entry), dtype=np.intp), np.empty(len(entry), dtype=np.intp)
+            fragments, inside = np.empty(len(entry)), np.empty(len(entry), dtype=bool)
+            line = kinds[entry]
+            lines, discs = np.flatnonzero(line), np.flatnonzero(~line)
+
+            k = entry[lines]
+            x0, y0, x1, y1, inv0, inv1 = (x[k] for x in columns)
+            t = (first[k] + local[lines]) / steps[k]
+            xs[lines], ys[lines] = np.rint(x0 + t * (x1 - x0)), np.rint(y0 + t * (y1 - y0))
+            fragments[lines] = (inv0 + t * (inv1 - inv0)) * (1 + LINE_BIAS)
+
+            k = entry[discs]
+            across, down = np.divmod(local[discs], heights[k])
+            xs[discs], ys[discs] = minX[k] + across, minY[k] + down
+            distance = (xs[discs] - columns[0][k]) ** 2 + (ys[discs] - columns[1][k]) ** 2
+            inside[discs] = (distance <= outer[k]) & (distance > inner[k])
+            fragments[discs] = flat[k]
+
+            # Spheres are shaded in depth across the disc, to the front of the sphere at each pixel
+            shaded = sphere[k]
+            k, distance = k[shaded], distance[shaded]
+            surface = columns[3][k] - columns[4][k] * np.sqrt(np.clip(1 - distance / outer[k], 0, 1))
+            fragments[discs[shaded]] = 1 / np.maximum(surface, 1e-9)
+
+            inside[lines] = (xs[lines] >= left) & (xs[lines] <= right) & (ys[lines] >= top) & (ys[lines] <= bottom)
+            inside = np.flatnonzero(inside)
+            entry, pixels, fragments = entry[inside], xs[inside] * self.dim + ys[inside], fragments[inside]
+
+            won = self.__resolve(pixels, fragments)
+            colour[pixels[won]] = col[entry[won]]
+
+
+def _runs(costs):
+    """
+
+    Split primitives into runs whose pixel costs add up to about FRAGMENT_BUDGET, yielding for every pixel of each
+    run the index of its primitive and its position among that primitive's pixels, in the order given.
+
+    """
+    total = np.cumsum(costs)
+
+    if not len(total):
+        return
+
+    edges = np.searchsorted(total, np.arange(FRAGMENT_BUDGET, total[-1], FRAGMENT_BUDGET), side='right')
+    edges = np.unique(np.concatenate([[0], edges, [len(costs)]]))
+
+    for begin, end in zip(edges[:-1].tolist(), edges[1:].tolist()):
+        counts = costs[begin:end]
+        entry = np.repeat(np.arange(begin, end), counts)
+
+        if len(entry):
+            yield entry, np.arange(len(entry)) - np.repeat(np.cumsum(counts) - counts, counts)
@@ -0,0 +1,184 @@
+"""
+
+Regression tests for reading model and scene files, run with python -m pytest.
+
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+from engine import *
+from engine._error import FileFormatError
+
+_PLY_HEADER = ('ply\nformat binary_little_endian 1.0\nelement vertex {}\nproperty float x\nproperty float y\n'
+               'property float z\nelement face {}\nproperty list uchar int vertex_indices\nend_header\n')
+
+
+def _plyFace(*indexes):
+    return bytes([len(indexes)]) + np.array(indexes, dtype='<i4').tobytes()
+
+
+def _writePly(path, vertices, faces):
+    vertices = np.asarray(vertices, dtype='<f4').reshape(-1, 3)
+
+    with open(path, 'wb') as f:
+        f.write(_PLY_HEADER.format(len(vertices), len(faces)).encode())
+        f.write(vertices.tobytes() + b''.join(_plyFace(*x) for x in faces))
+
+    return str(path)
+
+
+_SQUARE = [(0, 0, 0), (1, 0, 0), (1, 1, 0), (0, 1, 0)]
+
+
+def testPlyRoundTrip(tmp_path):
+    vertices, faces, colours = loadPly(_writePly(tmp_path / 'square.ply', _SQUARE, [(0, 1, 2, 3)]))
+
+    assert np.array_equal(vertices, _SQUARE)
+    assert faces.tolist() == [[0, 1, 2], [0, 2, 3]]
+    assert colours is None
+
+
+def testPlyTruncatedVertices(tmp_path):
+    path = _writePly(tmp_path / 'square.ply', _SQUARE, [])
+
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    with open(path, 'wb') as f:
+        f.write(data[:-2])
+
+    with pytest.raises(FileFormatError, match='Truncated vertex data'):
+        loadPly(path)
+
+
+@pytest.mark.parametrize('faces', [[(0, 1, 2)], [(0, 1, 2), (0, 2, 3), (0, 1, 2, 3)]])
+@pytest.mark.parametrize('cut', [1, 3, 6, 10])
+def testPlyTruncatedFaces(tmp_path, faces, cut):
+    path = _writePly(tmp_path / 'square.ply', _SQUARE, faces)
+
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    with open(path, 'wb') as f:
+        f.write(data[:-cut])
+
+    with pytest.raises(FileFormatError, match='Truncated face data'):
+        loadPly(path)
+
+
+def testPlyFaceIndexOutOfRange(tmp_path):
+    with pytest.raises(FileFormatError, match='Face index out of range'):
+        loadPly(_writePly(tmp_path / 'square.ply', _SQUARE, [(0, 1, 4)]))
+
+
+@pytest.mark.parametrize('text', ['v 0 0 0\nv 1 0 0\nv 0 1 0\nf 1 2 4\n', 'v 0 0 0\nv 1 0 0\nv 0 1 0\nf 1 2 -4\n'])
+def testObjFaceIndexOutOfRange(tmp_path, text):
+    path = tmp_path / 'triangle.obj'
+    path.write_text(text)
+
+    with pytest.raises(FileFormatError, match='Face index out of range'):
+        loadObj(str(path))
+
+
+def testObjShortVertex(tmp_path):
+    path = tmp_path / 'triangle.obj'
+    path.write_text('v 0 0 0\nv 1 0\nv 0 1 0\nf 1 2 3\n')
+
+    with pytest.raises(FileFormatError, match='Malformed line 2'):
+        loadObj(str(path))
+
+
+def testCacheRoundTrip(tmp_path):
+    path = _writePly(tmp_path / 'square.ply', _SQUARE, [(0, 1, 2, 3)])
+    mesh = loadMesh(path)
+
+    assert os.path.exists(path + '.cache')
+
+    vertices, faces, colours = loadCache(path + '.cache')
+    assert np.array_equal(vertices, mesh.vertices)
+    assert np.array_equal(faces, mesh.faces)
+    assert colours is None
+
+    cached = loadMesh(path)
+    assert np.array_equal(cached.vertices, mesh.vertices)
+    assert np.array_equal(cached.faces, mesh.faces)
+
+
+@pytest.mark.parametrize('keep', [20, -30])
+def testTruncatedCacheIsReplaced(tmp_path, keep):
+    path = _writePly(tmp_path / 'square.ply', _SQUARE, [(0, 1, 2, 3)])
+    loadMesh(path)
+
+    with open(path + '.cache', 'rb') as f:
+        data = f.read()
+
+    with open(path + '.cache', 'wb') as f:
+        f.write(data[:keep])
+
+    with pytest.raises(FileFormatError, match='Truncated'):
+        loadCache(path + '.cache')
+
+    mesh = loadMesh(path)
+    assert mesh.faces.tolist() == [[0, 1, 2], [0, 2, 3]]
+
+    with open(path + '.cache', 'rb') as f:
+        assert f.read() == data
+
+
+def _scene():
+    cube = Cube(Point(5, 0, 0), Point(5, 0, 1), Point(5, -1, 0), col=(255, 0, 0))
+    sheet = Mesh(np.array(_SQUARE, dtype=float) + 3, [(0, 1, 2), (0, 2, 3)], col=(0, 0, 255))
+    sheet.shading = GOURAUD
+    lod = icosphere(0, 0, 8, 1, col=(0, 200, 0), subdivisions=2)
+    lod.shading = None
+
+    objs = [Point(1, 2, 3, col=(1, 2, 3)), Line(Point(0, 0, 0), Point(1, 1, 1), col=(0, 0, 255)),
+            Triangle(Point(5, 5, 5), Point(5, 5, 6), Point(5, 4, 5), col=(255, 0, 0)),
+            Sphere(5, 2.5, 2, 2, col=(255, 0, 155)),
+            PointCloud(np.arange(12, dtype=float).reshape(4, 3), col=(9, 9, 9), size=3),
+            sheet, cube, lod, Instances(cube, np.array([[0, 2, 0], [0, -2, 3]], dtype=float),
+                                        col=np.array([[0, 0, 255], [255, 255, 0]], dtype=np.uint8))]
+    objs[1].setModel(np.diag([2.0, 1.0, 1.0, 1.0]))
+
+    scene = Scene(*objs, background=(10, 20, 30), headless=True)
+    scene.offset, scene.rot = [1.0, 2.0, 3.0], [0.5, -0.25]
+
+    return scene
+
+
+def testSceneRoundTrip(tmp_path):
+    scene = _scene()
+    path = str(tmp_path / 'scene.bin')
+    saveScene(scene, path)
+    loaded = loadScene(path, headless=True)
+
+    assert tuple(loaded.background) == scene.background
+    assert loaded.offset == scene.offset and loaded.rot == scene.rot
+    assert [type(x) for x in loaded.objs] == [type(x) for x in scene.objs]
+
+    for old, new in zip(scene.objs, loaded.objs):
+        assert np.array_equal(new.worldVertices(), old.worldVertices())
+        assert (np.asarray(new.col) == np.asarray(old.col)).all()  # Point clouds store one colour per point
+
+        if isinstance(old, Mesh):
+            assert np.array_equal(new.faces, old.faces)
+            assert new.shading == old.shading
+
+
+def testTruncatedSceneHeader():
+    data = sceneBytes(_scene())
+
+    for size in (12, 40):
+        with pytest.raises(FileFormatError, match='Truncated header'):
+            readScene(data[:size])
+
+    with pytest.raises(FileFormatError, match='Truncated table of contents'):
+        readScene(data[:100])
+
+
+def testTruncatedSceneArray():
+    with pytest.raises(FileFormatError, match='Truncated array'):
+        readScene(sceneBytes(_scene())[:-1])